@@ -2,7 +2,10 @@
 # -*- coding: utf-8 -*-
 #
 
+import distutils.ccompiler
 import distutils.cmd
+import distutils.errors
+import distutils.sysconfig
 import platform
 import os
 import setuptools.command.build_py
@@ -16,6 +19,81 @@ version = "2.0"
 description = "STORM microscope control code."
 long_description = ""
 
+#
+# The C helper libraries, (library name, source files, libraries to link against
+# and whether or not the library is required). These end up in storm_control/c_libraries.
+#
+c_libraries = [["c_image_manipulation", ["storm_control/hal4000/halLib/c_image_manipulation.c"], [], True],
+               ["focus_quality", ["storm_control/hal4000/focusLock/focus_quality.c"], [], True],
+               ["LMMoment", ["storm_control/hal4000/spotCounter/LMMoment.c"], ["m"], True],
+               ["corr_2d_gauss", ["storm_control/sc_hardware/utility/corr_2d_gauss.c"], ["m"], True],
+               ["af_lock", ["storm_control/sc_hardware/utility/af_lock.c"], ["fftw3", "m"], False]]
+
+
+class BuildC(distutils.cmd.Command):
+    """
+    Build the C helper libraries (.so on Linux, .dylib on OS-X). On
+    Windows the pre-compiled DLLs in storm_control/c_libraries are
+    used instead, or you can build them with scons.
+
+    $ python setup.py build_c
+    """
+    description = "build the C helper libraries"
+    user_options = [("debug", "g", "compile with debugging information")]
+
+    def initialize_options(self):
+        self.debug = False
+
+    def finalize_options(self):
+        pass
+
+    def run(self):
+        if (sys.platform == "win32"):
+            print("Using the pre-compiled Windows DLLs.")
+            return
+
+        compiler = distutils.ccompiler.new_compiler()
+        distutils.sysconfig.customize_compiler(compiler)
+
+        if self.debug:
+            cflags = ["-Og", "-g", "-Wall"]
+        else:
+            cflags = ["-O3", "-Wall"]
+        ldflags = []
+        if (sys.platform == "darwin"):
+            lib_ext = ".dylib"
+            ldflags.append("-dynamiclib")
+        else:
+            lib_ext = ".so"
+            ldflags.append("-Wl,-z,defs")
+
+        c_lib_path = os.path.join("storm_control", "c_libraries")
+        for [name, sources, libraries, required] in c_libraries:
+            lib_name = os.path.join(c_lib_path, "lib" + name + lib_ext)
+            print("Building", lib_name)
+            try:
+                objects = compiler.compile(sources,
+                                           output_dir = os.path.join("build", "temp_c"),
+                                           extra_postargs = cflags + ["-fPIC"])
+                compiler.link_shared_object(objects,
+                                            lib_name,
+                                            libraries = libraries,
+                                            extra_postargs = ldflags)
+            except (distutils.errors.CompileError, distutils.errors.LinkError) as err:
+                if required:
+                    raise
+                print(">> Warning! Could not build", lib_name, "(" + str(err) + ") <<")
+
+
+class BuildPy(setuptools.command.build_py.build_py):
+    """
+    Build the C helper libraries before the Python modules.
+    """
+    def run(self):
+        self.run_command("build_c")
+        super().run()
+
+
 setup(
     name='storm_control',
     version=version,
@@ -25,10 +103,15 @@ setup(
     author_email='hbabcock at fas.harvard.edu',
     url='https://github.com/ZhuangLab/storm-control',
 
+    cmdclass={'build_c' : BuildC,
+              'build_py' : BuildPy},
+
     zip_safe=False,
     packages=find_packages(),
 
-    package_data={},
+    package_data={'storm_control' : ['c_libraries/*.dll',
+                                     'c_libraries/*.dylib',
+                                     'c_libraries/*.so']},
     exclude_package_data={},
     include_package_data=True,
 
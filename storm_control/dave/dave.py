@@ -27,6 +27,7 @@ from PyQt5 import QtCore, QtGui, QtWidgets
 import storm_control.sc_library.hdebug as hdebug
 
 # General
+import storm_control.dave.daveActions as daveActions
 import storm_control.dave.notifications as notifications
 import storm_control.dave.sequenceGenerator as sequenceGenerator
 import storm_control.dave.sequenceViewer as sequenceViewer
@@ -170,6 +171,10 @@ class Dave(QtWidgets.QMainWindow):
         self.skip_warning = False
         self.needs_hal = False
         self.needs_kilroy = False
+        self.validation_batches = None
+
+        # The maximum number of actions to validate with a single TCP message.
+        self.validation_batch_size = parameters.get("validation_batch_size", 500)
 
         # UI setup.
         self.ui = daveUi.Ui_MainWindow()
@@ -404,6 +409,11 @@ class Dave(QtWidgets.QMainWindow):
     #
     @hdebug.debug
     def handleDone(self):
+        # Handle the completion of a batch of validations.
+        if self.validation_batches is not None:
+            self.handleValidationBatchDone()
+            return
+        
         # Handle updating usage information if in test mode
         if self.test_mode:
             self.ui.commandSequenceTreeView.updateEstimates()
@@ -413,24 +423,7 @@ class Dave(QtWidgets.QMainWindow):
 
         # Handle last command in list.
         if next_command is None:
-            self.ui.runButton.setText("Start")
-            self.ui.runButton.setEnabled(True)
-            self.ui.abortButton.setEnabled(False)
-            self.ui.validateSequenceButton.setEnabled(True)
-            self.ui.commandSequenceTreeView.resetItemIndex()
-            
-            self.running = False
-            if self.test_mode:
-                self.sequence_validated = True
-                self.test_mode = False
-                self.ui.commandSequenceTreeView.setTestMode(False)
-                self.updateEstimates()
-
-            # Stop TCP communication
-            if self.needs_hal:
-                self.command_engine.HALClient.stopCommunication()
-            if self.needs_kilroy:
-                self.command_engine.kilroyClient.stopCommunication()
+            self.sequenceDone()
 
         # Continue with next command.
         else: 
@@ -688,15 +681,90 @@ class Dave(QtWidgets.QMainWindow):
             self.updateRunStatusDisplay()
             self.ui.commandSequenceTreeView.setTestMode(True)
 
-            # Send first command.
-            self.command_engine.startCommand(self.ui.commandSequenceTreeView.getCurrentItem().getDaveAction(),
-                                             self.test_mode)
+            #
+            # Validate the HAL and Kilroy actions in batches, instead of
+            # sending the actions one at a time.
+            #
+            self.validation_batches = []
+            items = self.ui.commandSequenceTreeView.getItems()
+            for action_type in ["hal", "kilroy"]:
+                type_items = [x for x in items if (x.getDaveAction().getActionType() == action_type)]
+                for i in range(0, len(type_items), self.validation_batch_size):
+                    batch_items = type_items[i:i+self.validation_batch_size]
+                    batch = daveActions.DAValidateSequence(action_type,
+                                                           [x.getDaveAction() for x in batch_items])
+                    self.validation_batches.append([batch, batch_items])
+
+            if (len(self.validation_batches) > 0):
+                self.command_engine.startCommand(self.validation_batches[0][0], self.test_mode)
+            else:
+                self.validation_batches = None
+                self.sequenceDone()
 
         # Mark all commands as invalid
         else: 
             self.ui.commandSequenceTreeView.setAllValid(False)
             self.updateEstimates()
 
+    ## handleValidationBatchDone
+    #
+    # Handles the completion of a batch of validations, updates the items in the
+    # batch and starts the next batch.
+    #
+    @hdebug.debug
+    def handleValidationBatchDone(self):
+        [batch, batch_items] = self.validation_batches.pop(0)
+
+        # Check for abort.
+        if not self.test_mode:
+            self.validation_batches = None
+            self.sequenceDone()
+            return
+        
+        # If HAL or Kilroy don't support batches, validate the actions one at a time.
+        results = batch.getResults()
+        if results is None:
+            print("Batch validation failed (" + str(batch.getMessage().getErrorMessage()) + "), validating one action at a time.")
+            self.validation_batches = None
+            self.ui.commandSequenceTreeView.resetItemIndex()
+            self.updateRunStatusDisplay()
+            self.command_engine.startCommand(self.ui.commandSequenceTreeView.getCurrentItem().getDaveAction(),
+                                             self.test_mode)
+            return
+
+        # Update the items.
+        problems = []
+        for [item, [dave_action, message]] in zip(batch_items, results):
+            self.ui.commandSequenceTreeView.setItemValid(item, dave_action.isValid())
+            self.ui.commandSequenceTreeView.updateItemEstimates(item)
+            if not dave_action.isValid():
+                print("Invalid command: " + dave_action.getDescriptor())
+                problems.append(dave_action.getDescriptor() + "\n" + str(message.getErrorMessage()))
+
+        if (len(problems) > 0) and not self.skip_warning:
+            message_str = "\n".join(problems[:10])
+            if (len(problems) > 10):
+                message_str += "\n.. and " + str(len(problems) - 10) + " more"
+            message_str += "\nSuppress remaining warnings?"
+            messageBox = QtWidgets.QMessageBox(parent = self)
+            messageBox.setWindowTitle("Invalid Commands")
+            messageBox.setText(message_str)
+            messageBox.setStandardButtons(QtWidgets.QMessageBox.No |
+                                          QtWidgets.QMessageBox.YesToAll)
+            messageBox.setIcon(QtWidgets.QMessageBox.Warning)
+            messageBox.setDefaultButton(QtWidgets.QMessageBox.YesToAll)
+            button_ID = messageBox.exec_()
+            if button_ID == QtWidgets.QMessageBox.YesToAll:
+                self.skip_warning = True # Skip additional warnings
+
+        # Start the next batch.
+        if (len(self.validation_batches) > 0):
+            self.command_engine.startCommand(self.validation_batches[0][0], self.test_mode)
+        else:
+            self.validation_batches = None
+            self.sequenceDone()
+        self.updateRunStatusDisplay()
+            
     ## handleWarning
     #
     # Handles the warning signal from the command engine and determines if Dave should pause
@@ -795,6 +863,30 @@ class Dave(QtWidgets.QMainWindow):
                 self.ui.abortButton.setEnabled(False)
                 self.ui.validateSequenceButton.setEnabled(True)
 
+    ## sequenceDone
+    #
+    # Handles the end of the command sequence.
+    #
+    def sequenceDone(self):
+        self.ui.runButton.setText("Start")
+        self.ui.runButton.setEnabled(True)
+        self.ui.abortButton.setEnabled(False)
+        self.ui.validateSequenceButton.setEnabled(True)
+        self.ui.commandSequenceTreeView.resetItemIndex()
+            
+        self.running = False
+        if self.test_mode:
+            self.sequence_validated = True
+            self.test_mode = False
+            self.ui.commandSequenceTreeView.setTestMode(False)
+            self.updateEstimates()
+
+        # Stop TCP communication
+        if self.needs_hal:
+            self.command_engine.HALClient.stopCommunication()
+        if self.needs_kilroy:
+            self.command_engine.kilroyClient.stopCommunication()
+
     ## updateEstimates
     #
     # Update disk and duration estimates
@@ -216,6 +216,23 @@ class DaveAction(QtCore.QObject):
         else: # Correct message and no error
             self.completeAction(message)
 
+    ## handleValidation
+    #
+    # Handle the reply to this action's message when it was validated as part
+    # of a DAValidateSequence action.
+    #
+    # @param message A TCP message object (in test mode).
+    #
+    def handleValidation(self, message):
+        if not (message.getID() == self.message.getID()):
+            message.setError(True, "Communication Error: Incorrect Message Returned")
+        elif not message.hasError():
+            time = message.getResponse("duration")
+            if time is not None: self.duration = time
+            space = message.getResponse("disk_usage")
+            if space is not None: self.disk_usage = space
+        self.valid = not message.hasError()
+
     ## handleTimerDone
     #
     # Handle a timer done signal
@@ -1209,6 +1226,84 @@ class DATakeMovie(DaveAction):
         if message_data["parameters"] is not None:
             self.id = str(message_data["parameters"])
 
+## DAValidateSequence
+#
+# Validate the messages of several actions with a single message. This is
+# a lot faster than validating the actions one at a time when there are
+# thousands of actions in a sequence.
+#
+class DAValidateSequence(DaveAction):
+
+    ## __init__
+    #
+    # @param action_type The type of the actions, i.e. "hal" or "kilroy".
+    # @param dave_actions A list of DaveActions.
+    #
+    def __init__(self, action_type, dave_actions):
+        DaveAction.__init__(self)
+
+        self.action_type = action_type
+        self.dave_actions = dave_actions
+        self.lost_message_delay = 0
+
+        messages = []
+        for dave_action in self.dave_actions:
+            dave_action.getMessage().setTestMode(True)
+            messages.append(dave_action.getMessage().toDict())
+            self.lost_message_delay += dave_action.lost_message_delay
+
+        self.message = tcpMessage.TCPMessage(message_type = "Validate Sequence",
+                                             message_data = {"messages" : messages})
+
+    ## completeActionWithError
+    #
+    # Errors are handled by whoever started the validation, so this
+    # completes normally. Check the message for an error.
+    #
+    # @param message A TCP message object
+    #
+    def completeActionWithError(self, message):
+        self.completeAction(message)
+
+    ## getDescriptor
+    #
+    # @return A string that describes the action.
+    #
+    def getDescriptor(self):
+        return "validate " + str(len(self.dave_actions)) + " " + self.action_type + " actions"
+
+    ## getResults
+    #
+    # @return A list of [DaveAction, TCP message] for each of the actions, or
+    #         None if the validation failed, i.e. HAL or Kilroy did not
+    #         recognize the message.
+    #
+    def getResults(self):
+        results = self.message.getResponse("results")
+        if results is None:
+            return None
+        
+        dave_results = []
+        for [dave_action, json_dict] in zip(self.dave_actions, results):
+            dave_results.append([dave_action, tcpMessage.TCPMessage.fromDict(json_dict)])
+        return dave_results
+
+    ## handleReply
+    #
+    # Pass the results on to the individual actions.
+    #
+    # @param message A TCP message object
+    #
+    def handleReply(self, message):
+        if (message.getID() == self.message.getID()):
+            self.message = message
+            results = self.getResults()
+            if results is not None:
+                for [dave_action, a_message] in results:
+                    dave_action.handleValidation(a_message)
+        DaveAction.handleReply(self, message)
+
+
 ## DAValveProtocol
 #
 # The fluidics protocol action. Send commands to Kilroy.
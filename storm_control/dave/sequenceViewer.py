@@ -164,6 +164,16 @@ class DaveCommandTreeViewer(QtWidgets.QTreeView):
         else:
             return [0, 0]
 
+    ## getItems
+    #
+    # @return The list of the current DaveActionStandardItems.
+    #
+    def getItems(self):
+        if self.dv_model is not None:
+            return self.dv_model.getItems()
+        else:
+            return []
+
     ## getNextItem
     #
     # @param (Optional) skip_invalid True/False to skip invalid commands. Defaults to True.
@@ -301,6 +311,15 @@ class DaveCommandTreeViewer(QtWidgets.QTreeView):
         if self.dv_model is not None:
             self.dv_model.setCurrentItemValid(is_valid)
 
+    ## setItemValid
+    #
+    # @param item A DaveActionStandardItem.
+    # @param is_valid True/False determines the validity of the item(s)
+    #
+    def setItemValid(self, item, is_valid):
+        if self.dv_model is not None:
+            self.dv_model.setItemValid(item, is_valid)
+
     ## setModel
     #
     # @param qt_model The DaveStandardItemModel associated with the tree.
@@ -323,6 +342,14 @@ class DaveCommandTreeViewer(QtWidgets.QTreeView):
     def updateEstimates(self):
         if self.dv_model is not None:
             self.dv_model.updateEstimates()
+
+    ## updateItemEstimates
+    #
+    # @param item A DaveActionStandardItem.
+    #
+    def updateItemEstimates(self, item):
+        if self.dv_model is not None:
+            self.dv_model.updateItemEstimates(item)
         
     ## viewportUpdate
     #
@@ -406,6 +433,13 @@ class DaveStandardItemModel(QtGui.QStandardItemModel):
     def getCurrentItem(self):
         return self.dave_actions_cur[self.dave_action_index]
 
+    ## getItems
+    #
+    # @return The list of the current DaveActionStandardItems.
+    #
+    def getItems(self):
+        return self.dave_actions_cur
+
     ## getNextItem
     #
     # @param skip_invalid True/False to skip invalid commands.
@@ -513,20 +547,24 @@ class DaveStandardItemModel(QtGui.QStandardItemModel):
     # @param is_Valid True/False determines the validity of the currentItem(s)
     #
     def setCurrentItemValid(self, is_valid):
+        current_item = self.dave_actions_cur[self.dave_action_index]
         if self.test_mode:
-            # Find current id
-            current_item = self.dave_actions_cur[self.dave_action_index]
-            current_action = current_item.getDaveAction()
-            current_id = current_action.getID()
+            print(current_item.getDaveActionID(), is_valid)
+        self.setItemValid(current_item, is_valid)
 
-            print(current_id, is_valid)
-            
+    ## setItemValid
+    #
+    # @param item A DaveActionStandardItem.
+    # @param is_valid True/False determines the validity of the item, and in
+    #                 test mode all the items that have the same id.
+    #
+    def setItemValid(self, item, is_valid):
+        if self.test_mode:
             # Change validity of all actions that have this id
-            for item in self.dave_actions_test_dict[current_id]:
-                item.setValid(is_valid)
+            for an_item in self.dave_actions_test_dict[item.getDaveActionID()]:
+                an_item.setValid(is_valid)
                 
         else: # Not used
-            item = self.dave_actions_cur[self.dave_action_index]
             item.setValid(is_valid)
                     
     ## setTestMode
@@ -548,18 +586,23 @@ class DaveStandardItemModel(QtGui.QStandardItemModel):
     ## updateEstimates
     #
     def updateEstimates(self):
+        self.updateItemEstimates(self.dave_actions_cur[self.dave_action_index])
+
+    ## updateItemEstimates
+    #
+    # @param item A DaveActionStandardItem.
+    #
+    def updateItemEstimates(self, item):
         if self.test_mode: # Only needed in test mode
 
-            # Find current id and the current disk usage and duration.
-            current_item = self.dave_actions_cur[self.dave_action_index]
-            current_action = current_item.getDaveAction()
-            current_id = current_action.getID()
-            disk_usage = current_action.getUsage()
-            duration = current_action.getDuration()
+            # Find the disk usage and duration of this item.
+            dave_action = item.getDaveAction()
+            disk_usage = dave_action.getUsage()
+            duration = dave_action.getDuration()
             
             # Update usage estimated for all actions that have this id.
-            for item in self.dave_actions_test_dict[current_id]:
-                item.setUsageEstimates(disk_usage, duration)
+            for an_item in self.dave_actions_test_dict[item.getDaveActionID()]:
+                an_item.setUsageEstimates(disk_usage, duration)
 
 ## parseSequenceFile
 #
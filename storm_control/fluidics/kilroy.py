@@ -19,6 +19,7 @@ from storm_control.fluidics.valves.valveChain import ValveChain
 import storm_control.fluidics.pumps.pumpControl as pumpControl
 from storm_control.fluidics.kilroyProtocols import KilroyProtocols
 from storm_control.sc_library.tcpServer import TCPServer
+import storm_control.sc_library.tcpMessage as tcpMessage
 import storm_control.sc_library.parameters as params
 
 # ----------------------------------------------------------------------------------------
@@ -134,25 +135,42 @@ class Kilroy(QtWidgets.QMainWindow):
             self.received_message = None # Reset the received_message
 
     # ----------------------------------------------------------------------------------------
-    # Handle protocol request sent via TCP server
+    # Check a protocol request, returns True if the protocol should be started
     # ----------------------------------------------------------------------------------------
-    def handleTCPData(self, message):        
+    def checkTCPData(self, message):
         # Confirm that message is a protocol message
         if not message.getType() == "Kilroy Protocol":
             message.setError(True, "Wrong message type sent to Kilroy: " + message.getType())
-            self.tcpServer.sendMessage(message)
         elif not self.kilroyProtocols.isValidProtocol(message.getData("name")):
             message.setError(True, "Invalid Kilroy Protocol")
-            self.tcpServer.sendMessage(message)
         elif message.isTest():
             required_time = self.kilroyProtocols.requiredTime(message.getData("name"))
             message.addResponse("duration", required_time)
+        else: # Valid, non-test message
+            return True
+        return False
+
+    # ----------------------------------------------------------------------------------------
+    # Handle protocol request sent via TCP server
+    # ----------------------------------------------------------------------------------------
+    def handleTCPData(self, message):        
+        # Validate a list of protocol messages (in test mode) with a single response
+        if message.isType("Validate Sequence"):
+            results = []
+            for json_dict in message.getData("messages", []):
+                test_message = tcpMessage.TCPMessage.fromDict(json_dict)
+                test_message.setTestMode(True)
+                self.checkTCPData(test_message)
+                results.append(test_message.toDict())
+            message.addResponse("results", results)
             self.tcpServer.sendMessage(message)
-        else: # Valid, non-test message                                    
+        elif self.checkTCPData(message):
             # Keep track of valid messages issued via TCP 
             self.received_message = message
             # Start the protocol
             self.kilroyProtocols.startProtocolRemotely(message)
+        else:
+            self.tcpServer.sendMessage(message)
             
     # ----------------------------------------------------------------------------------------
     # Redirect commands from kilroy protocol class to valves or pump
@@ -30,6 +30,7 @@ import storm_control.hal4000.camera.cameraFunctionality as cameraFunctionality
 import storm_control.hal4000.camera.frame as frame
 import storm_control.hal4000.halLib.halMessage as halMessage
 import storm_control.hal4000.halLib.halModule as halModule
+import storm_control.hal4000.settings.settings as settings
 
 
 class Camera(halModule.HalModule):
@@ -54,6 +55,16 @@ class Camera(halModule.HalModule):
         self.camera_control.cleanUp()
         super().cleanUp(qt_settings)
 
+    def getLane(self, message):
+        """
+        'get functionality' is answered immediately from the camera
+        functionality object, so it does not need to wait for a (slow)
+        parameter change or other worker task to finish.
+        """
+        if message.isType("get functionality"):
+            return "functionality"
+        return None
+
     def processMessage(self, message):
 
         if message.isType("configuration"):
@@ -87,10 +98,19 @@ class Camera(halModule.HalModule):
                                                                   data = {"functionality" : self.camera_control.getCameraFunctionality()}))
 
         elif message.isType("new parameters"):
-            # This message comes from settings.settings
-            halModule.runWorkerTask(self,
-                                    message,
-                                    lambda : self.updateParameters(message))
+            # This message comes from settings.settings. If none of our
+            # parameters changed then there is no need to re-configure
+            # (and possibly stop and re-start) the camera.
+            if settings.parametersChanged(message, self.module_name, self.camera_control.getParameters()):
+                halModule.runWorkerTask(self,
+                                        message,
+                                        lambda : self.updateParameters(message))
+            else:
+                p = self.camera_control.getParameters()
+                message.addResponse(halMessage.HalMessageResponse(source = self.module_name,
+                                                                  data = {"old parameters" : p.copy()}))
+                message.addResponse(halMessage.HalMessageResponse(source = self.module_name,
+                                                                  data = {"new parameters" : p}))
 
         elif message.isType("shutter clicked"):
             # This message comes from the shutter button.
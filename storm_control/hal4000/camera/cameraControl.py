@@ -16,6 +16,7 @@ import storm_control.sc_library.halExceptions as halExceptions
 import storm_control.sc_library.parameters as params
 
 import storm_control.hal4000.camera.frame as frame
+import storm_control.hal4000.camera.framePool as framePool
 
 
 class CameraException(halExceptions.HardwareException):
@@ -50,9 +51,23 @@ class CameraControl(QtCore.QThread):
         # The current frame number, this gets reset by startCamera().
         self.frame_number = 0
 
+        # Pool of frame buffers for cameras that copy the frame data. This
+        # is sized based on 'bytes_per_frame' when the camera is started.
+        self.frame_pool = framePool.FramePool(n_buffers = config.get("frame_pool_size", 10))
+
         # The camera parameters.
         self.parameters = params.StormXMLObject()
 
+        # What to do when the camera thread gets ahead of the main thread
+        # by more than backpressure_limit frames. The options are 'never'
+        # (never drop frames) and 'display' (only send the most recent
+        # frame of each batch to live consumers like the display). Frames
+        # are never dropped for the other consumers (image writers, etc.).
+        self.backpressure_limit = config.get("backpressure_limit", 0)
+        self.backpressure_policy = config.get("backpressure_policy", "never")
+        if not self.backpressure_policy in ["display", "never"]:
+            raise CameraException("Unknown backpressure policy '" + self.backpressure_policy + "'")
+
         # This is how we tell the thread that is handling actually talking
         # to the camera hardware to stop.
         self.running = False
@@ -217,6 +232,9 @@ class CameraControl(QtCore.QThread):
         self.camera_functionality.shutter_state = False
         self.camera_functionality.shutter.emit(False)
 
+    def getFramePoolStats(self):
+        return self.frame_pool.getStats()
+
     def getCameraFunctionality(self):
         if (self.camera_functionality.parameters != self.parameters):
             msg = "The parameters in the camera functionality are different from the actual camera parameters."
@@ -243,15 +261,24 @@ class CameraControl(QtCore.QThread):
         Data from the camera should go through this method on it's
         way to the camera functionality object.
         """
-        for frame in frames:
-            if self.film_length is not None:
+        if self.film_length is not None:
+
+            # This keeps us from emitting more than the expected number
+            # of newFrame signals.
+            frames = [x for x in frames if (x.frame_number < self.film_length)]
 
-                # This keeps us from emitting more than the expected number
-                # of newFrame signals.
-                if (frame.frame_number >= self.film_length):
-                    break
-                
-            self.camera_functionality.newFrame.emit(frame)
+        if (len(frames) == 0):
+            return
+
+        # Check how far behind the camera thread we are. This is the
+        # number of frames that the camera has created that are still
+        # waiting to be handled.
+        drop_live = False
+        if (self.backpressure_policy == "display") and (self.backpressure_limit > 0):
+            backlog = self.frame_number - frames[-1].frame_number - 1
+            drop_live = (backlog > self.backpressure_limit)
+
+        self.camera_functionality.emitFrames(frames, drop_live = drop_live)
 
     def newParameters(self, parameters):
         """
@@ -321,6 +348,9 @@ class CameraControl(QtCore.QThread):
         
         self.frame_number = 0
 
+        # Update the frame pool in case the frame size changed.
+        self.frame_pool.setFrameSize(self.parameters.get("bytes_per_frame"))
+
         # Start the thread to handle data from the camera.
         self.thread_started = False
         self.start(QtCore.QThread.NormalPriority)
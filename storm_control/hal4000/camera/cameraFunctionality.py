@@ -24,9 +24,22 @@ class CameraFunctionality(halFunctionality.HalFunctionality):
 
     During a parameter change feed.feed and display.display disconnect
     from camera functionalities and then request new ones.
+
+    Frames are available in three ways:
+      newFrame - One signal per frame.
+      newFrames - One signal per batch of frames (a list), this is
+                  more efficient for consumers that can handle batches.
+      newLiveFrames - Like newFrames, but for consumers that only need
+                      to keep up with the camera, like the display. If
+                      the main thread falls behind the camera these
+                      will only get the most recent frame in each batch.
+
+    newFrame and newFrames never drop frames.
     """
     emccdGain = QtCore.pyqtSignal(int)
     newFrame = QtCore.pyqtSignal(object)
+    newFrames = QtCore.pyqtSignal(object)
+    newLiveFrames = QtCore.pyqtSignal(object)
     parametersChanged = QtCore.pyqtSignal()
     shutter = QtCore.pyqtSignal(bool)
     started = QtCore.pyqtSignal()
@@ -65,6 +78,12 @@ class CameraFunctionality(halFunctionality.HalFunctionality):
         # Camera parameters.
         self.parameters = parameters
 
+        # True if the live frames of the current batch are being dropped.
+        self.dropping_live_frames = False
+
+        # The number of frames that were not sent to live consumers.
+        self.live_frames_dropped = 0
+
         # Current state of the camera shutter.
         self.shutter_state = False
 
@@ -72,6 +91,24 @@ class CameraFunctionality(halFunctionality.HalFunctionality):
         # Not used, kept because it may be useful for enforcing invalid functionalities?
         return copy.deepcopy(self)
 
+    def emitFrames(self, frames, drop_live = False):
+        """
+        Emit a batch of frames. If drop_live is True only the most
+        recent frame is sent to the live consumers.
+        """
+        if (len(frames) == 0):
+            return
+
+        self.dropping_live_frames = drop_live
+        for frame in frames:
+            self.newFrame.emit(frame)
+        self.newFrames.emit(frames)
+        if drop_live:
+            self.live_frames_dropped += len(frames) - 1
+            self.newLiveFrames.emit(frames[-1:])
+        else:
+            self.newLiveFrames.emit(frames)
+
     def getCameraName(self):
         return self.camera_name
 
@@ -112,6 +149,9 @@ class CameraFunctionality(halFunctionality.HalFunctionality):
     def getParameterObject(self, pname):
         return self.parameters.getp(pname)
 
+    def getLiveFramesDropped(self):
+        return self.live_frames_dropped
+
     def getShutterState(self):
         return self.shutter_state
     
@@ -132,6 +172,9 @@ class CameraFunctionality(halFunctionality.HalFunctionality):
 
     def isCamera(self):
         return True
+
+    def isDroppingLiveFrames(self):
+        return self.dropping_live_frames
     
     def isMaster(self):
         return self.is_master
@@ -6,10 +6,108 @@ or the data from a feed and it's meta-information.
 Notes: 
  (1) The numpy data field (np_data) is expected to
      be of type numpy.uint16.
+ (2) Statistics such as the minimum and maximum of a frame
+     are computed when they are first requested, and then
+     stored in the frame's FrameStats object, so they are
+     only computed once no matter how many modules use them.
  
 Hazen 3/17
 """
+import numpy
+import threading
 
+
+# This is used to make sure that a frame only has one FrameStats object.
+stats_lock = threading.Lock()
+
+
+def stackFrames(frames):
+    """
+    Returns the data from a list of frames (which must all be the
+    same size) as a single numpy array of shape (frames, y, x).
+    """
+    stack = numpy.empty((len(frames), frames[0].image_y, frames[0].image_x), dtype = numpy.uint16)
+    for i, aframe in enumerate(frames):
+        stack[i,:,:] = numpy.reshape(aframe.np_data, (aframe.image_y, aframe.image_x))
+    return stack
+
+
+class FrameStats(object):
+    """
+    The statistics of a single frame. Frames are used by several threads
+    (display, spot counter, etc.) so this is thread safe, if two threads
+    request the same statistic at the same time one of them will wait for
+    the other to compute it.
+
+    Note that this does not keep a reference to the Frame as this would
+    create a reference cycle, which would delay the release of the frame
+    buffer back to the camera's frame pool.
+    """
+    def __init__(self, np_data = None, **kwds):
+        super().__init__(**kwds)
+        self.lock = threading.RLock()
+        self.np_data = np_data
+        self.values = {}
+
+    def getHistogram(self, n_bins = 256):
+        """
+        Returns the histogram of the frame as a numpy array of n_bins
+        counts covering the range 0 - 65535. n_bins must be a power of 2.
+        """
+        def histogram():
+            return numpy.bincount(numpy.ravel(self.np_data)//(65536//n_bins), minlength = n_bins)
+        return self.getValue(("histogram", n_bins), histogram)
+
+    def getMax(self):
+        return self.getMinMax()[1]
+
+    def getMean(self):
+        return self.getValue("mean", lambda : float(numpy.mean(self.np_data)))
+    
+    def getMin(self):
+        return self.getMinMax()[0]
+
+    def getMinMax(self):
+        """
+        Returns [minimum, maximum], these are computed together.
+        """
+        return self.getValue("min max", lambda : [int(numpy.min(self.np_data)), int(numpy.max(self.np_data))])
+
+    def getSaturated(self, saturated_value):
+        """
+        Returns the number of pixels whose value is saturated_value or more.
+        """
+        def saturated():
+            if ("min max" in self.values) and (self.values["min max"][1] < saturated_value):
+                return 0
+            return int(numpy.count_nonzero(self.np_data >= saturated_value))
+        return self.getValue(("saturated", saturated_value), saturated)
+
+    def getValue(self, name, function):
+        """
+        Returns the statistic 'name', calling function() to compute it if
+        nobody has requested it before. This can be used for statistics that
+        are not built in, for example the focus lock uses it to store the
+        image gradient.
+        """
+        with self.lock:
+            if not name in self.values:
+                self.values[name] = function()
+            return self.values[name]
+
+    def setMinMax(self, image_min, image_max):
+        """
+        This is for modules that compute the minimum and maximum of the
+        frame anyway, for example the display does this when it rescales
+        the image.
+        """
+        self.setValue("min max", [image_min, image_max])
+
+    def setValue(self, name, value):
+        with self.lock:
+            self.values[name] = value
+
+        
 class Frame(object):
     """
     Class for the storage of a single frame of camera data
@@ -31,6 +129,7 @@ class Frame(object):
         self.image_y = image_y
         self.np_data = np_data
         self.frame_number = frame_number
+        self.stats = None
         self.which_camera = which_camera
 
     def getData(self):
@@ -46,6 +145,16 @@ class Frame(object):
         """
         return self.np_data.ctypes.data
 
+    def getStats(self):
+        """
+        Returns the FrameStats object for this frame.
+        """
+        if self.stats is None:
+            with stats_lock:
+                if self.stats is None:
+                    self.stats = FrameStats(np_data = self.np_data)
+        return self.stats
+
 
 #
 # The MIT License
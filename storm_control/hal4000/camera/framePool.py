@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+"""
+A pool of pre-allocated frame buffers.
+
+Cameras that copy their data out of the camera driver can fill
+one of these buffers in place instead of allocating a new numpy
+array for every frame.
+
+A buffer is 'in use' as long as anything other than the pool has
+a reference to it. This includes numpy views of the buffer, so a
+buffer will not be re-used while a consumer (image writer, display,
+feed, spot counter, etc.) still has the frame or a slice of it.
+"""
+
+import numpy
+import sys
+
+from PyQt5 import QtCore
+
+
+class FramePool(object):
+    """
+    Frame buffer pool, there is one of these per camera.
+    """
+    def __init__(self, max_buffers = 100, n_buffers = 10, **kwds):
+        """
+        max_buffers - The maximum number of buffers to keep in the pool.
+        n_buffers - The number of buffers to allocate when the frame size changes.
+        """
+        super().__init__(**kwds)
+        self.buffers = []
+        self.frame_size = 0
+        self.free_refcount = None
+        self.max_buffers = max_buffers
+        self.mutex = QtCore.QMutex()
+        self.n_buffers = n_buffers
+        self.n_misses = 0
+        self.next_index = 0
+
+    def allocateBuffer(self):
+        return numpy.zeros(self.frame_size, dtype = numpy.uint16)
+
+    def getBuffer(self):
+        """
+        Returns a numpy.uint16 array that is not currently in use. The
+        contents of the array are whatever the last user put there.
+        """
+        self.mutex.lock()
+
+        # Start looking at the oldest buffer, this is usually the
+        # one that is most likely to be free.
+        n_buffers = len(self.buffers)
+        for i in range(n_buffers):
+            index = (self.next_index + i) % n_buffers
+            if self.isFree(index):
+                self.next_index = (index + 1) % n_buffers
+                np_buffer = self.buffers[index]
+                self.mutex.unlock()
+                return np_buffer
+
+        # No free buffers, allocate a new one. This is added to the pool
+        # unless the pool is already at it's maximum size.
+        self.n_misses += 1
+        np_buffer = self.allocateBuffer()
+        if (n_buffers < self.max_buffers):
+            self.buffers.append(np_buffer)
+            self.next_index = 0
+        self.mutex.unlock()
+        return np_buffer
+
+    def getFrameSize(self):
+        return self.frame_size
+
+    def getStats(self):
+        """
+        Returns a dictionary with the number of buffers in the pool,
+        the number that are in use and the number of allocation misses.
+        """
+        self.mutex.lock()
+        in_use = 0
+        for i in range(len(self.buffers)):
+            if not self.isFree(i):
+                in_use += 1
+        stats = {"buffers" : len(self.buffers),
+                 "in use" : in_use,
+                 "misses" : self.n_misses}
+        self.mutex.unlock()
+        return stats
+
+    def isFree(self, index):
+        """
+        A buffer is free when the only reference to it is the pool's.
+        """
+        return (sys.getrefcount(self.buffers[index]) <= self.free_refcount)
+
+    def setFrameSize(self, bytes_per_frame):
+        """
+        (Re)allocate the pool if the frame size has changed. Buffers
+        of the old size that are still in use are simply forgotten.
+        """
+        frame_size = int(bytes_per_frame/2)
+        if (frame_size == self.frame_size):
+            return
+
+        self.mutex.lock()
+        self.frame_size = frame_size
+        self.buffers = []
+        self.next_index = 0
+        self.n_misses = 0
+        for i in range(self.n_buffers):
+            self.buffers.append(self.allocateBuffer())
+
+        # Calibrate the reference count of a buffer that is not in use.
+        if (len(self.buffers) > 0):
+            self.free_refcount = sys.getrefcount(self.buffers[0])
+        self.mutex.unlock()
+
+
+#
+# The MIT License
+#
+# Copyright (c) 2026 Zhuang Lab, Harvard University
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
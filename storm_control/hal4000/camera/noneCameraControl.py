@@ -2,6 +2,12 @@
 """
 This class provides software emulation of a camera for testing purposes.
 
+The camera can optionally cycle through a pre-generated bank of frames
+instead of creating a new frame each time. The bank frames are passed
+on as is (without copying), which makes it possible to emulate cameras
+with very high frame rates. The bank can contain either the usual test
+pattern or simulated blinking fluorophores.
+
 Hazen 02/17
 """
 
@@ -17,6 +23,53 @@ import storm_control.hal4000.camera.cameraFunctionality as cameraFunctionality
 import storm_control.hal4000.camera.frame as frame
 
 
+def blinkingFrames(n_frames, size_x, size_y,
+                   background = 10.0,
+                   n_emitters = 100,
+                   off_probability = 0.2,
+                   on_probability = 0.05,
+                   photons = 500.0,
+                   sigma = 1.5):
+    """
+    Returns a list of n_frames numpy.uint16 arrays (flattened) containing
+    randomly located Gaussian emitters that blink on and off with
+    Poisson noise.
+
+    The emitters are a two state (on / off) Markov model, off_probability
+    and on_probability are the per frame switching probabilities.
+    """
+    rng = numpy.random.default_rng()
+
+    # Emitter locations and the pixels (and weights) in the image
+    # that each emitter covers.
+    offsets = numpy.arange(-int(numpy.ceil(3.0 * sigma)), int(numpy.ceil(3.0 * sigma)) + 1)
+    cx = rng.uniform(0, size_x - 1, n_emitters)
+    cy = rng.uniform(0, size_y - 1, n_emitters)
+    px = numpy.round(cx).astype(numpy.int64)[:,None] + offsets[None,:]
+    py = numpy.round(cy).astype(numpy.int64)[:,None] + offsets[None,:]
+    gx = numpy.exp(-(px - cx[:,None])**2/(2.0 * sigma * sigma))
+    gy = numpy.exp(-(py - cy[:,None])**2/(2.0 * sigma * sigma))
+    weights = gy[:,:,None] * gx[:,None,:]
+    weights *= photons/numpy.sum(weights, axis = (1,2))[:,None,None]
+    indices = numpy.clip(py, 0, size_y - 1)[:,:,None] * size_x + numpy.clip(px, 0, size_x - 1)[:,None,:]
+
+    # Start with the emitters in their steady state.
+    is_on = (rng.random(n_emitters) < on_probability/(on_probability + off_probability))
+
+    frames = []
+    for i in range(n_frames):
+        image = numpy.bincount(indices[is_on].ravel(),
+                               weights = weights[is_on].ravel(),
+                               minlength = size_x * size_y)
+        image += background
+        frames.append(numpy.minimum(rng.poisson(image), 65535).astype(numpy.uint16))
+
+        switch = rng.random(n_emitters)
+        is_on = numpy.where(is_on, (switch >= off_probability), (switch < on_probability))
+
+    return frames
+
+
 class NoneCameraControl(cameraControl.CameraControl):
 
     def __init__(self, config = None, is_master = False, **kwds):
@@ -25,8 +78,21 @@ class NoneCameraControl(cameraControl.CameraControl):
         
         self.fake_frame = 0
         self.fake_frame_size = [0,0]
+        self.frame_bank = None
+        self.frame_bank_size = config.get("frame_bank_size", 0)
+        self.frame_bank_type = config.get("frame_bank_type", "pattern")
+        self.max_frames_per_event = config.get("max_frames_per_event", 10)
+        self.min_exposure_time = config.get("min_exposure_time", 0.01)
         self.pause_time = config.get("mean_pause", 0.1)
 
+        # Blinking emitter settings.
+        self.blinking = {"background" : config.get("background", 10.0),
+                         "n_emitters" : config.get("emitters", 100),
+                         "off_probability" : config.get("emitter_off_probability", 0.2),
+                         "on_probability" : config.get("emitter_on_probability", 0.05),
+                         "photons" : config.get("emitter_photons", 500.0),
+                         "sigma" : config.get("emitter_sigma", 1.5)}
+
         #
         # The camera functionality. Note the connection to self.parameters
         # which should not be changed to point to some other parameters
@@ -52,7 +118,7 @@ class NoneCameraControl(cameraControl.CameraControl):
         self.parameters.set("exposure_time", params.ParameterRangeFloat(description = "Exposure time (seconds)", 
                                                                         name = "exposure_time", 
                                                                         value = 0.02,
-                                                                        min_value = 0.01,
+                                                                        min_value = self.min_exposure_time,
                                                                         max_value = 10.0))
         self.parameters.setv("max_intensity", 512)
         
@@ -126,21 +192,70 @@ class NoneCameraControl(cameraControl.CameraControl):
 
             # Configure camera.
             p = self.parameters
-            if (p.get("exposure_time") < 0.010):
-                p.set("exposure_time", 0.010)
+            if (p.get("exposure_time") < self.min_exposure_time):
+                p.set("exposure_time", self.min_exposure_time)
 
             p.set("fps", 1.0/p.get("exposure_time"))
 
             self.fake_frame_size = [size_x, size_y]
-            self.fake_frame = numpy.zeros(size_x * size_y, dtype = numpy.uint16)
-            for i in range(size_x):
-                for j in range(size_y):
-                    self.fake_frame[j*size_x+i] = i % 128 + j % 128
+            x_pattern = numpy.arange(size_x, dtype = numpy.uint16) % 128
+            y_pattern = numpy.arange(size_y, dtype = numpy.uint16) % 128
+            self.fake_frame = (y_pattern[:,None] + x_pattern[None,:]).ravel()
+
+            self.makeFrameBank()
 
             if running:
                 self.startCamera()
 
             self.camera_functionality.parametersChanged.emit()
+
+    def makeFrame(self):
+        """
+        Roll the fake frame into a buffer from the frame pool, or
+        use the next frame from the frame bank.
+        """
+        if self.frame_bank is not None:
+            np_data = self.frame_bank[self.frame_number % len(self.frame_bank)]
+        else:
+            np_data = self.rollFakeFrame(self.frame_pool.getBuffer(), self.frame_number)
+
+        aframe = frame.Frame(np_data,
+                             self.frame_number,
+                             self.fake_frame_size[0],
+                             self.fake_frame_size[1],
+                             self.camera_name)
+        self.frame_number += 1
+        return aframe
+
+    def makeFrameBank(self):
+        """
+        Create the frame bank (if we are using one). The frames are
+        read only as they are shared by everything that gets them.
+        """
+        self.frame_bank = None
+        if (self.frame_bank_size <= 0):
+            return
+        
+        [size_x, size_y] = self.fake_frame_size
+        if (self.frame_bank_type == "blinking"):
+            self.frame_bank = blinkingFrames(self.frame_bank_size, size_x, size_y, **self.blinking)
+        else:
+            self.frame_bank = []
+            for i in range(self.frame_bank_size):
+                self.frame_bank.append(self.rollFakeFrame(numpy.zeros(size_x * size_y, dtype = numpy.uint16), i))
+
+        for np_data in self.frame_bank:
+            np_data.setflags(write = False)
+
+    def rollFakeFrame(self, np_data, frame_number):
+        """
+        Copy the fake frame into np_data, rolled by an amount that
+        depends on the frame number.
+        """
+        shift = int(frame_number * self.parameters.get("roll")) % self.fake_frame.size
+        np_data[shift:] = self.fake_frame[:self.fake_frame.size - shift]
+        np_data[:shift] = self.fake_frame[self.fake_frame.size - shift:]
+        return np_data
         
     def run(self):
         
@@ -149,25 +264,34 @@ class NoneCameraControl(cameraControl.CameraControl):
         
         self.running = True
         self.thread_started = True
+
+        # We keep to the frame rate using the time when the next frame is
+        # due. If we fall behind then all the frames that are due are sent
+        # together, like a real camera would do.
+        exposure_time = self.parameters.get("exposure_time")
+        next_time = time.perf_counter()
         while(self.running):
-            aframe = frame.Frame(numpy.roll(self.fake_frame,
-                                            int(self.frame_number * self.parameters.get("roll"))),
-                                 self.frame_number,
-                                 self.fake_frame_size[0],
-                                 self.fake_frame_size[1],
-                                 self.camera_name)
-            self.frame_number += 1
-
-            if self.film_length is not None:
-                if (self.frame_number == self.film_length):
-                    self.running = False
+            frames = []
+            while (len(frames) < self.max_frames_per_event):
+                frames.append(self.makeFrame())
+                next_time += exposure_time
+
+                if self.film_length is not None:
+                    if (self.frame_number == self.film_length):
+                        self.running = False
+                        break
+
+                if (next_time > time.perf_counter()):
+                    break
 
             # Emit new data signal.
-            self.newData.emit([aframe])
+            self.newData.emit(frames)
 
             # Sleep if we're still running.
             if self.running:
-                self.msleep(int(1000.0 * self.parameters.get("exposure_time")))
+                delay = next_time - time.perf_counter()
+                if (delay > 0.0):
+                    time.sleep(delay)
 
         # Also pause on stop.
         #time.sleep(random.expovariate(1.0/self.pause_time))
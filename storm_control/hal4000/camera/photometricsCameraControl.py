@@ -42,6 +42,7 @@ class PhotometricsCameraControl(cameraControl.HWCameraControl):
             raise halExceptions.HardwareException(msg)
             
         self.camera = pvcam.PVCAMCamera(camera_name = config.get("camera_name"))
+        self.camera.setFramePool(self.frame_pool)
         
         # Create the camera functionality.
         #
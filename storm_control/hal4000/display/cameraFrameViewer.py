@@ -11,9 +11,18 @@ frame display. This includes:
 6. Handling the changing the feed.
 7. Handling information, target, and grid.
 
+The conversion of the frames to QImages is done in a QThreadPool
+thread so that it does not slow down the main thread. Only the
+most recent frame is rendered, any frames that arrive while a
+frame is being rendered or is waiting to be displayed are skipped.
+The rendered frames are displayed at (at most) the refresh rate
+of the monitor, but the pixmaps for the bluetooth module are still
+only grabbed (at most) every 100ms.
+
 Hazen 2/17
 """
 import os
+import traceback
 
 from PyQt5 import QtCore, QtGui, QtWidgets
 
@@ -23,6 +32,7 @@ import storm_control.sc_library.parameters as params
 import storm_control.hal4000.colorTables.colorTables as colorTables
 import storm_control.hal4000.halLib.halFunctionality as halFunctionality
 import storm_control.hal4000.halLib.halMessage as halMessage
+import storm_control.hal4000.halLib.halModule as halModule
 
 import storm_control.hal4000.qtWidgets.qtCameraGraphicsScene as qtCameraGraphicsScene
 import storm_control.hal4000.qtWidgets.qtColorGradient as qtColorGradient
@@ -40,12 +50,21 @@ class CameraFrameViewerFunctionality(halFunctionality.HalFunctionality):
     and disconnect() methods. We do it this way so that we know
     whether or not anybody is actually listening. If no one is
     listening then we don't need to generate QPixmaps().
+
+    The frameDisplayed signal is emitted with the frame each
+    time the display is updated.
+
+    This also keeps track of how many of the frames that the
+    viewer received were rendered and how many were skipped.
     """
+    frameDisplayed = QtCore.pyqtSignal(object)
     newPixmap = QtCore.pyqtSignal(object)
 
     def __init__(self, **kwds):
         super().__init__(**kwds)
         self.connections = 0
+        self.frames_rendered = 0
+        self.frames_skipped = 0
 
     def connect(self, slot_fn):
         self.newPixmap.connect(slot_fn)
@@ -55,12 +74,56 @@ class CameraFrameViewerFunctionality(halFunctionality.HalFunctionality):
         self.newPixmap.disconnect(slot_fn)
         self.connections -= 1
 
+    def getRenderStats(self):
+        """
+        Returns a dictionary with the number of frames that were
+        rendered and the number that were skipped.
+        """
+        return {"rendered" : self.frames_rendered,
+                "skipped" : self.frames_skipped}
+
     def handleNewPixmap(self, pixmap):
         self.newPixmap.emit(pixmap)
         
     def isConnected(self):
         return (self.connections > 0)
-    
+
+    def resetRenderStats(self):
+        self.frames_rendered = 0
+        self.frames_skipped = 0
+
+        
+class FrameRenderer(QtCore.QRunnable):
+    """
+    Runnable for converting a frame to a QImage.
+    """
+    def __init__(self, camera_widget = None, **kwds):
+        super().__init__(**kwds)
+        self.camera_widget = camera_widget
+        self.fr_signaler = FrameRendererSignaler()
+        self.frame = None
+
+    def run(self):
+        try:
+            render = self.camera_widget.renderFrame(self.frame)
+        except Exception:
+            self.fr_signaler.renderError.emit(traceback.format_exc())
+            render = None
+        self.frame = None
+        self.fr_signaler.renderDone.emit(render)
+
+    def setFrame(self, frame):
+        self.frame = frame
+
+
+class FrameRendererSignaler(QtCore.QObject):
+    """
+    Signal class used by the FrameRenderer to indicate that
+    the frame has been rendered.
+    """
+    renderDone = QtCore.pyqtSignal(object)
+    renderError = QtCore.pyqtSignal(str)
+
 
 class CameraFrameViewer(QtWidgets.QFrame):
     """
@@ -108,10 +171,17 @@ class CameraFrameViewer(QtWidgets.QFrame):
         self.default_colortable = default_colortable
         self.default_parameters = params.StormXMLObject(validate = False) 
         self.display_name = display_name
+        self.closed = False
         self.display_timer = QtCore.QTimer(self)
         self.filming = False
         self.frame = False
+        self.new_frame = False
         self.parameters = False
+        self.pixmap_needed = False
+        self.pixmap_timer = QtCore.QTimer(self)
+        self.render = None
+        self.render_needed = False
+        self.rendering = False
         self.rubber_band_rect = None
         self.show_grid = False
         self.show_info = True
@@ -143,6 +213,12 @@ class CameraFrameViewer(QtWidgets.QFrame):
         self.camera_scene.addItem(self.camera_widget)
         self.camera_view.setScene(self.camera_scene)
         self.camera_view.setBackgroundBrush(QtGui.QBrush(QtGui.QColor(0,0,0)))
+
+        # Frame renderer.
+        self.renderer = FrameRenderer(camera_widget = self.camera_widget)
+        self.renderer.setAutoDelete(False)
+        self.renderer.fr_signaler.renderDone.connect(self.handleRenderDone)
+        self.renderer.fr_signaler.renderError.connect(self.handleRenderError)
         
         # Display range slider.
         self.ui.rangeSlider = qtRangeSlider.QVRangeSlider()
@@ -193,11 +269,29 @@ class CameraFrameViewer(QtWidgets.QFrame):
         self.ui.syncSpinBox.valueChanged.connect(self.handleSync)
         self.ui.targetAct.triggered.connect(self.handleTarget)
 
-        # Display timer, the display updates at approximately 10Hz.
-        self.display_timer.setInterval(100)
+        # Display timer, the display updates at (up to) the refresh rate of the monitor.
+        refresh_rate = 60.0
+        screen = QtGui.QGuiApplication.primaryScreen()
+        if (screen is not None) and (screen.refreshRate() > 1.0):
+            refresh_rate = screen.refreshRate()
+        self.display_timer.setInterval(int(1000.0/refresh_rate))
         self.display_timer.timeout.connect(self.handleDisplayTimer)
         self.display_timer.start()
 
+        # Pixmap timer, grabbing the display is slow so this is done less often.
+        self.pixmap_timer.setInterval(100)
+        self.pixmap_timer.timeout.connect(self.handlePixmapTimer)
+        self.pixmap_timer.start()
+
+    def cleanUp(self):
+        """
+        Called when HAL is closing, stop displaying and don't
+        start rendering any new frames.
+        """
+        self.closed = True
+        self.display_timer.stop()
+        self.pixmap_timer.stop()
+
     def contextMenuEvent(self, event):
         menu = QtWidgets.QMenu(self)
         menu.addAction(self.ui.infoAct)
@@ -324,15 +418,22 @@ class CameraFrameViewer(QtWidgets.QFrame):
         color_table = self.color_tables.getTableByName(self.getParameter("colortable"))
         self.camera_widget.newColorTable(color_table)
         self.color_gradient.newColorTable(color_table)
+        self.rerender()
 
     def handleDisplayTimer(self):
-        if self.frame:
-            self.camera_widget.updateImageWithFrame(self.frame)
+        """
+        Display the most recently rendered frame (if any), then
+        start rendering the next frame.
+        """
+        if self.render is not None:
+            render = self.render
+            self.render = None
+            self.camera_widget.setRender(render)
+            self.cfv_functionality.frameDisplayed.emit(render["frame"])
             if self.show_info:
                 self.handleIntensityInfo(*self.camera_widget.getIntensityInfo())
-            if self.cfv_functionality.isConnected():
-                q_pixmap = self.camera_view.grab()
-                self.cfv_functionality.handleNewPixmap(q_pixmap)
+            self.pixmap_needed = True
+            self.startRender()
 
     def handleDragMove(self, dx, dy):
         self.stage_functionality.dragMove(dx, dy)
@@ -361,7 +462,7 @@ class CameraFrameViewer(QtWidgets.QFrame):
             # disconnect with the try / except TypeError.
             #
             try:
-                self.cam_fn.newFrame.disconnect(self.handleNewFrame)
+                self.cam_fn.newLiveFrames.disconnect(self.handleNewFrames)
             except TypeError:
                 pass
             
@@ -376,6 +477,7 @@ class CameraFrameViewer(QtWidgets.QFrame):
             self.show_grid = True
             self.ui.gridAct.setText("Hide Grid")
         self.camera_widget.setShowGrid(self.show_grid)
+        self.camera_widget.update()
 
     def handleInfo(self, boolean):
         if self.show_info:
@@ -397,16 +499,34 @@ class CameraFrameViewer(QtWidgets.QFrame):
         self.setParameter("center_x", cx)
         self.setParameter("center_y", cy)
         self.camera_widget.setClickPos(*self.cam_fn.transformChipToFrame(cx, cy))
+        self.rerender()
 
     def handleNewFrame(self, frame):
         if self.filming and (self.getParameter("sync") != 0):
             if((frame.frame_number % self.cycle_length) == (self.getParameter("sync") - 1)):
-                self.frame = frame
+                self.setNewFrame(frame)
         else:
-            self.frame = frame
+            self.setNewFrame(frame)
+
+    def handleNewFrames(self, frames):
+        for frame in frames:
+            self.handleNewFrame(frame)
+        self.startRender()
 
     def handleNewScale(self, scale):
         self.setParameter("scale", scale)
+        self.camera_widget.newScale(scale)
+        self.rerender()
+
+    def handlePixmapTimer(self):
+        """
+        Send a pixmap of the display if a new frame was displayed.
+        """
+        if self.pixmap_needed:
+            self.pixmap_needed = False
+            if self.cfv_functionality.isConnected():
+                q_pixmap = self.camera_view.grab()
+                self.cfv_functionality.handleNewPixmap(q_pixmap)
 
     def handleRangeChange(self, scale_min, scale_max):
         if (scale_max == scale_min):
@@ -418,6 +538,17 @@ class CameraFrameViewer(QtWidgets.QFrame):
         self.setParameter("display_min", int(scale_min))
         self.updateRange()
 
+    def handleRenderDone(self, render):
+        self.rendering = False
+        if self.closed:
+            return
+        if render is not None:
+            self.render = render
+        self.startRender()
+
+    def handleRenderError(self, stack_trace):
+        raise halExceptions.HalException("Rendering failed in display '" + str(self.display_name) + "'\n" + stack_trace)
+        
     def handleRubberBandChanged(self, rubber_band_rect, from_scene_point, to_scene_point):
         print(">hrbc", rubber_band_rect)
         print(">hrbc", from_scene_point)
@@ -437,6 +568,7 @@ class CameraFrameViewer(QtWidgets.QFrame):
             self.show_target = True
             self.ui.targetAct.setText("Hide Target")
         self.camera_widget.setShowTarget(self.show_target)
+        self.camera_widget.update()
 
     def newParameters(self, parameters):
         """
@@ -466,6 +598,14 @@ class CameraFrameViewer(QtWidgets.QFrame):
             if not self.parameters.has(attr):
                 self.parameters.add(attr, self.default_parameters.getp(attr).copy())
 
+    def rerender(self):
+        """
+        Render the current frame again, for example because the
+        display range changed.
+        """
+        self.render_needed = True
+        self.startRender()
+
     def setCameraFunctionality(self, camera_functionality):
         """
         This method gets called when the view changes it's current feed. The
@@ -486,7 +626,7 @@ class CameraFrameViewer(QtWidgets.QFrame):
         # A sanity check that the old camera functionality is disconnected.
         if self.cam_fn is not None:
             try:
-                self.cam_fn.newFrame.disconnect(self.handleNewFrame)
+                self.cam_fn.newLiveFrames.disconnect(self.handleNewFrames)
             except TypeError:
                 pass
             else:
@@ -495,7 +635,7 @@ class CameraFrameViewer(QtWidgets.QFrame):
                 
         # Connect new camera functionality.
         self.cam_fn = camera_functionality
-        self.cam_fn.newFrame.connect(self.handleNewFrame)
+        self.cam_fn.newLiveFrames.connect(self.handleNewFrames)
 
         #
         # Add a sub-section for this camera / feed if we don't already have one.
@@ -587,6 +727,15 @@ class CameraFrameViewer(QtWidgets.QFrame):
         # Switch to the correct feed.
         self.handleFeedChange(self.getFeedName())
 
+    def setNewFrame(self, frame):
+        """
+        If the previous frame was never rendered then it is skipped.
+        """
+        if self.new_frame:
+            self.cfv_functionality.frames_skipped += 1
+        self.frame = frame
+        self.new_frame = True
+
     def setParameter(self, pname, pvalue):
         """
         Wrapper to make it easier to set the appropriate parameter value.
@@ -607,6 +756,26 @@ class CameraFrameViewer(QtWidgets.QFrame):
 
     def showRecord(self, show):
         self.ui.recordButton.setVisible(show)
+
+    def startRender(self):
+        """
+        Start rendering the most recent frame, unless we are already
+        rendering a frame or a rendered frame is waiting to be displayed.
+        """
+        if self.closed or self.rendering or (self.render is not None):
+            return
+        if not self.frame:
+            return
+        if (not self.new_frame) and (not self.render_needed):
+            return
+
+        if self.new_frame:
+            self.cfv_functionality.frames_rendered += 1
+        self.new_frame = False
+        self.render_needed = False
+        self.rendering = True
+        self.renderer.setFrame(self.frame)
+        halModule.threadpool.start(self.renderer)
         
     def startFilm(self, film_settings):
         self.filming = True
@@ -637,6 +806,7 @@ class CameraFrameViewer(QtWidgets.QFrame):
         self.ui.scaleMax.setText(str(self.getParameter("display_max")))
         self.ui.scaleMin.setText(str(self.getParameter("display_min")))
         self.camera_widget.newRange(self.getParameter("display_min"), self.getParameter("display_max"))
+        self.rerender()
 
 
 #
@@ -181,6 +181,25 @@ class Display(halModule.HalModule):
                 message.addResponse(halMessage.HalMessageResponse(source = viewer.getViewerName(),
                                                                   data = {"parameters" : viewer.getParameters()}))
 
+        elif message.isType("tcp message"):
+            tcp_message = message.getData()["tcp message"]
+
+            #
+            # film.film adds the frame, we add the display range of the
+            # camera so that the frame can be shown with the same contrast.
+            #
+            if tcp_message.isType("Get Snapshot"):
+                if not tcp_message.isTest():
+                    camera = tcp_message.getData("camera", "camera1")
+                    for viewer in self.viewers:
+                        if viewer.getParameters().has(camera):
+                            feed_params = viewer.getParameters().get(camera)
+                            tcp_message.addResponse("display_max", feed_params.get("display_max"))
+                            tcp_message.addResponse("display_min", feed_params.get("display_min"))
+                            break
+                message.addResponse(halMessage.HalMessageResponse(source = self.module_name,
+                                                                  data = {"handled" : True}))
+
 #        elif message.isType("updated parameters"):
 #            for viewer in self.viewers:
 #                viewer.updatedParameters(message.getData()["parameters"])
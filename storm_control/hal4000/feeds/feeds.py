@@ -3,16 +3,28 @@
 This module enables the processing of camera frame(s) with
 operations like averaging, slicing, etc..
 
+The source of a feed can also be another feed, so feeds can be
+combined into a graph, for example a slice of the camera image
+that is then averaged. A feed that is the source of several
+other feeds is only computed once.
+
 It is also responsible for keeping tracking of how many
 different cameras / feeds are available for each parameter
 file, whether the cameras / feeds should be saved when
 filming and what extension to use when saving.
 
+The frames are processed in a QThreadPool thread (one
+thread at a time per feed) so that this does not slow
+down the main thread.
+
 Hazen 03/17
 """
 
 import copy
 import numpy
+import traceback
+
+from collections import deque
 
 from PyQt5 import QtCore
 
@@ -39,27 +51,100 @@ def checkParameters(parameters):
     # the feed ROI area is a multiple of 4.
     #
     feed_parameters = parameters.get("feeds")
-    for feed_name in feed_parameters.getAttrs():
+    feed_sizes = {}
+    for feed_name in feedOrder(feed_parameters):
         fp = feed_parameters.get(feed_name)
-        cp = parameters.get(fp.get("source"))
+        if fp.get("source") in feed_sizes:
+            [source_x, source_y] = feed_sizes[fp.get("source")]
+        else:
+            cp = parameters.get(fp.get("source"))
+            source_x = cp.get("x_pixels")
+            source_y = cp.get("y_pixels")
 
         x_start = fp.get("x_start", 1)
-        x_end = fp.get("x_end", cp.get("x_pixels"))
+        x_end = fp.get("x_end", source_x)
         x_pixels = x_end - x_start + 1
 
         y_start = fp.get("y_start", 1)
-        y_end = fp.get("y_end", cp.get("y_pixels"))
+        y_end = fp.get("y_end", source_y)
         y_pixels = y_end - y_start + 1
         
         # Check that the feed size is a multiple of 4 in x.
         if not ((x_pixels % 4) == 0):
             raise FeedException("The x size of the feed ROI must be a multiple of 4 in " + feed_name)
 
+        feed_sizes[feed_name] = [x_pixels, y_pixels]
+
+
+def feedOrder(feed_parameters):
+    """
+    Returns the names of the feeds ordered so that every feed comes
+    after the feed that is it's source (if it's source is a feed).
+
+    Throw an exception if a feed is (indirectly) it's own source.
+    """
+    feed_names = feed_parameters.getAttrs()
+    ordered = []
+
+    def addFeed(feed_name, path):
+        if feed_name in ordered:
+            return
+        if feed_name in path:
+            raise FeedException("Feed '" + feed_name + "' is derived from itself.")
+        source = feed_parameters.get(feed_name).get("source", "")
+        if source in feed_names:
+            addFeed(source, path + [feed_name])
+        ordered.append(feed_name)
+
+    for feed_name in feed_names:
+        addFeed(feed_name, [])
+    return ordered
+
+
+# Feeds whose worker is running. This keeps the feed and it's worker from
+# being garbage collected before the worker is done, for example when the
+# feeds are re-created because the parameters changed.
+busy_feeds = set()
+
 
 class FeedException(halExceptions.HalException):
     pass
 
 
+class FeedWorker(QtCore.QRunnable):
+    """
+    Runnable for processing a batch of frames for a feed.
+    """
+    def __init__(self, feed = None, **kwds):
+        super().__init__(**kwds)
+        self.drop_live = False
+        self.feed = feed
+        self.fw_signaler = FeedWorkerSignaler()
+        self.new_frames = None
+
+    def run(self):
+        try:
+            feed_frames = self.feed.processFrames(self.new_frames)
+        except Exception:
+            self.fw_signaler.processingError.emit(traceback.format_exc())
+            feed_frames = []
+        self.new_frames = None
+        self.fw_signaler.processingDone.emit(feed_frames, self.drop_live)
+
+    def setFrames(self, new_frames, drop_live):
+        self.drop_live = drop_live
+        self.new_frames = new_frames
+
+
+class FeedWorkerSignaler(QtCore.QObject):
+    """
+    Signal class used by the FeedWorker to indicate that
+    the processing of a batch of frames is complete.
+    """
+    processingDone = QtCore.pyqtSignal(object, bool)
+    processingError = QtCore.pyqtSignal(str)
+
+
 class FeedFunctionality(cameraFunctionality.CameraFunctionality):
     """
     Feed functionality in a form that other modules can interact with. These have
@@ -70,12 +155,27 @@ class FeedFunctionality(cameraFunctionality.CameraFunctionality):
 
     Some functionality is explicitly blocked so we get an error if we accidentally
     try and use this exactly like a camera functionality.
+
+    The frames are processed by a FeedWorker. The camera's frames and its
+    started / stopped signals, as well as resets, are queued as events and
+    handled in order so that for example the 'stopped' signal is not emitted
+    until all of the frames that the camera sent before it stopped have been
+    processed.
+
+    When we are not filming, and the camera is dropping live frames because
+    it is falling behind, a new batch of frames replaces the previous batch
+    if that is still waiting to be processed, so the queue can't keep growing.
     """
     def __init__(self, feed_name = None, **kwds):
         super().__init__(**kwds)
+        self.busy = False
         self.cam_fn = None
+        self.closed = False
+        self.events = deque()
+        self.feed_frames = []
         self.feed_name = feed_name
         self.feed_parameters = self.parameters
+        self.filming = False
         self.frame_number = 0
         self.frame_slice = None
         self.number_connections = 0
@@ -88,6 +188,19 @@ class FeedFunctionality(cameraFunctionality.CameraFunctionality):
         #
         self.parameters = self.feed_parameters.copy()
 
+        self.worker = FeedWorker(feed = self)
+        self.worker.setAutoDelete(False)
+        self.worker.fw_signaler.processingDone.connect(self.handleProcessingDone)
+        self.worker.fw_signaler.processingError.connect(self.handleProcessingError)
+
+    def cleanUp(self):
+        """
+        Called when HAL is closing. Discard any queued events and don't
+        start any new workers.
+        """
+        self.closed = True
+        self.events.clear()
+        
     def connectCameraFunctionality(self):
         """
         Connect the feed to it's camera functionality
@@ -96,7 +209,7 @@ class FeedFunctionality(cameraFunctionality.CameraFunctionality):
         assert(self.number_connections == 0)
         self.number_connections += 1
         
-        self.cam_fn.newFrame.connect(self.handleNewFrame)
+        self.cam_fn.newFrames.connect(self.handleNewFrames)
         self.cam_fn.started.connect(self.handleStarted)
         self.cam_fn.stopped.connect(self.handleStopped)
 
@@ -109,7 +222,7 @@ class FeedFunctionality(cameraFunctionality.CameraFunctionality):
         self.number_connections += 1
         
         if self.cam_fn is not None:
-            self.cam_fn.newFrame.disconnect(self.handleNewFrame)
+            self.cam_fn.newFrames.disconnect(self.handleNewFrames)
             self.cam_fn.started.disconnect(self.handleStarted)
             self.cam_fn.stopped.disconnect(self.handleStopped)
 
@@ -126,18 +239,46 @@ class FeedFunctionality(cameraFunctionality.CameraFunctionality):
         return self.feed_name
 
     def handleNewFrame(self, new_frame):
+        """
+        Sub-classes should override this and add the frames that they
+        create to self.feed_frames.
+
+        Note that this is called in a FeedWorker thread.
+        """
         sliced_data = self.sliceFrame(new_frame)
-        self.newFrame.emit(frame.Frame(sliced_data,
-                                       new_frame.frame_number,
-                                       self.x_pixels,
-                                       self.y_pixels,
-                                       self.camera_name))
+        self.feed_frames.append(frame.Frame(sliced_data,
+                                            new_frame.frame_number,
+                                            self.x_pixels,
+                                            self.y_pixels,
+                                            self.camera_name))
+
+    def handleNewFrames(self, new_frames):
+        """
+        Queue a batch of frames from the camera for processing, the
+        resulting feed frames are also sent as a batch.
+        """
+        self.queueEvent(["frames", new_frames, self.cam_fn.isDroppingLiveFrames()])
+
+    def handleProcessingDone(self, feed_frames, drop_live):
+        self.busy = False
+        busy_feeds.discard(self)
+        self.emitFrames(feed_frames, drop_live = drop_live)
+        self.nextEvent()
+
+    def handleProcessingError(self, stack_trace):
+        raise FeedException("Processing failed in feed '" + self.feed_name + "'\n" + stack_trace)
+    
+    def handleReset(self):
+        """
+        Sub-classes that have state should override this.
+        """
+        self.frame_number = 0
 
     def handleStarted(self):
-        self.started.emit()
+        self.queueEvent(["started"])
 
     def handleStopped(self):
-        self.stopped.emit()
+        self.queueEvent(["stopped"])
 
     def hasEMCCD(self):
         assert False
@@ -160,8 +301,49 @@ class FeedFunctionality(cameraFunctionality.CameraFunctionality):
     def isMaster(self):
         return False
 
+    def nextEvent(self):
+        """
+        Handle queued events until we get to a batch of frames,
+        which is processed by the worker.
+        """
+        while (not self.busy) and (len(self.events) > 0):
+            event = self.events.popleft()
+            if (event[0] == "frames"):
+                self.busy = True
+                busy_feeds.add(self)
+                self.worker.setFrames(event[1], event[2])
+                halModule.threadpool.start(self.worker)
+            elif (event[0] == "reset"):
+                self.handleReset()
+            elif (event[0] == "started"):
+                self.started.emit()
+            elif (event[0] == "stopped"):
+                self.stopped.emit()
+
+    def processFrames(self, new_frames):
+        """
+        Process a batch of frames from the camera and return the
+        feed frames. This is called in a FeedWorker thread.
+        """
+        self.feed_frames = []
+        for new_frame in new_frames:
+            self.handleNewFrame(new_frame)
+        feed_frames = self.feed_frames
+        self.feed_frames = []
+        return feed_frames
+
+    def queueEvent(self, event):
+        if self.closed:
+            return
+        if (event[0] == "frames") and event[2] and not self.filming and (len(self.events) > 0):
+            last_event = self.events[-1]
+            if (last_event[0] == "frames") and last_event[2]:
+                self.events.pop()
+        self.events.append(event)
+        self.nextEvent()
+        
     def reset(self):
-        self.frame_number = 0
+        self.queueEvent(["reset"])
 
     def setCameraFunctionality(self, camera_functionality):
         self.cam_fn = camera_functionality
@@ -224,9 +406,17 @@ class FeedFunctionality(cameraFunctionality.CameraFunctionality):
         # these through.
         self.connectCameraFunctionality()
 
+    def setFilming(self, filming):
+        """
+        Batches of frames are never dropped while filming.
+        """
+        self.filming = filming
+
     def sliceFrame(self, new_frame):
         """
-        Slices out a part of the frame based on self.frame_slice.
+        Slices out a part of the frame based on self.frame_slice. This
+        is a view of the frame data if the slice is contiguous (i.e. it
+        covers the full width of the frame), otherwise it is a copy.
         """
         if self.frame_slice is None:
             return new_frame.np_data
@@ -234,6 +424,8 @@ class FeedFunctionality(cameraFunctionality.CameraFunctionality):
             w = new_frame.image_x
             h = new_frame.image_y
             sliced_frame = numpy.reshape(new_frame.np_data, (h,w))[self.frame_slice]
+            if sliced_frame.flags.c_contiguous:
+                return sliced_frame
             return numpy.ascontiguousarray(sliced_frame)
 
     def toggleShutter(self):
@@ -243,6 +435,9 @@ class FeedFunctionality(cameraFunctionality.CameraFunctionality):
 class FeedFunctionalityAverage(FeedFunctionality):
     """
     The feed functionality for averaging frames together.
+
+    The frames are summed in place in a buffer that is allocated
+    once, so the only new array per average is the result.
     """
     def __init__(self, **kwds):
         super().__init__(**kwds)
@@ -254,28 +449,95 @@ class FeedFunctionalityAverage(FeedFunctionality):
     def handleNewFrame(self, new_frame):
         sliced_data = self.sliceFrame(new_frame)
 
-        if self.average_frame is None:
-            self.average_frame = sliced_data.astype(numpy.uint32)
+        if (self.average_frame is None) or (self.average_frame.shape != sliced_data.shape):
+            self.average_frame = numpy.empty(sliced_data.shape, dtype = numpy.uint32)
+            self.counts = 0
+            
+        if (self.counts == 0):
+            numpy.copyto(self.average_frame, sliced_data)
         else:
-            self.average_frame += sliced_data
+            numpy.add(self.average_frame, sliced_data, out = self.average_frame)
         self.counts += 1
 
         if (self.counts == self.frames_to_average):
-            average_frame = self.average_frame/self.frames_to_average
-            self.newFrame.emit(frame.Frame(average_frame.astype(numpy.uint16),
-                                           self.frame_number,
-                                           self.x_pixels,
-                                           self.y_pixels,
-                                           self.camera_name))
-            self.average_frame = None
+            numpy.floor_divide(self.average_frame, self.frames_to_average, out = self.average_frame)
+            self.feed_frames.append(frame.Frame(self.average_frame.astype(numpy.uint16),
+                                                self.frame_number,
+                                                self.x_pixels,
+                                                self.y_pixels,
+                                                self.camera_name))
             self.counts = 0
             self.frame_number += 1
 
-    def reset(self):
-        super().reset()
-        self.average_frame = None
+    def handleReset(self):
+        super().handleReset()
         self.counts = 0
-        
+
+
+class FeedFunctionalityBackground(FeedFunctionality):
+    """
+    The feed functionality for background subtraction.
+
+    The background is the average of the last 'background_frames'
+    frames, this is subtracted from each frame before the frame is
+    added to the background. The first frame is its own background.
+    Pixels that would be negative are set to zero.
+
+    The frames in the background are kept in a ring buffer along
+    with their (integer) sum, so the oldest frame can be removed
+    from the sum exactly.
+    """
+    def __init__(self, **kwds):
+        super().__init__(**kwds)
+
+        self.background_frames = max(1, self.parameters.get("background_frames"))
+        self.background_sum = None
+        self.counts = 0
+        self.frames = None
+        self.index = 0
+        self.offset = self.parameters.get("offset")
+        self.temp = None
+
+    def handleNewFrame(self, new_frame):
+        sliced_data = self.sliceFrame(new_frame)
+
+        if (self.frames is None) or (self.frames.shape[1:] != sliced_data.shape):
+            self.frames = numpy.empty((self.background_frames,) + sliced_data.shape, dtype = sliced_data.dtype)
+            self.background_sum = numpy.empty(sliced_data.shape, dtype = numpy.int64)
+            self.temp = numpy.empty(sliced_data.shape, dtype = numpy.float64)
+            self.counts = 0
+
+        if (self.counts == 0):
+            self.background_sum.fill(0)
+            self.index = 0
+            numpy.copyto(self.temp, sliced_data)
+        else:
+            numpy.divide(self.background_sum, self.counts, out = self.temp)
+
+        # Subtract the background.
+        numpy.subtract(sliced_data, self.temp, out = self.temp)
+        numpy.add(self.temp, self.offset, out = self.temp)
+        numpy.clip(self.temp, 0, 65535, out = self.temp)
+        self.feed_frames.append(frame.Frame(self.temp.astype(numpy.uint16),
+                                            self.frame_number,
+                                            self.x_pixels,
+                                            self.y_pixels,
+                                            self.camera_name))
+        self.frame_number += 1
+
+        # Update the background, replacing the oldest frame once the buffer is full.
+        if (self.counts == self.background_frames):
+            numpy.subtract(self.background_sum, self.frames[self.index], out = self.background_sum)
+        else:
+            self.counts += 1
+        numpy.copyto(self.frames[self.index], sliced_data)
+        numpy.add(self.background_sum, sliced_data, out = self.background_sum)
+        self.index = (self.index + 1) % self.background_frames
+
+    def handleReset(self):
+        super().handleReset()
+        self.counts = 0
+
     
 class FeedFunctionalityInterval(FeedFunctionality):
     """
@@ -292,20 +554,114 @@ class FeedFunctionalityInterval(FeedFunctionality):
         sliced_data = self.sliceFrame(new_frame)
         
         if (new_frame.frame_number % self.cycle_length) in self.capture_frames:
-            self.newFrame.emit(frame.Frame(sliced_data,
-                                           self.frame_number,
-                                           self.x_pixels,
-                                           self.y_pixels,
-                                           self.camera_name))
+            self.feed_frames.append(frame.Frame(sliced_data,
+                                                self.frame_number,
+                                                self.x_pixels,
+                                                self.y_pixels,
+                                                self.camera_name))
             self.frame_number += 1
 
 
+class FeedFunctionalityMax(FeedFunctionality):
+    """
+    The feed functionality for a rolling maximum projection, each
+    frame is the maximum of the last 'frames_to_max' frames.
+
+    The last frames are kept in a ring buffer that is allocated once.
+    """
+    def __init__(self, **kwds):
+        super().__init__(**kwds)
+
+        self.counts = 0
+        self.frames_to_max = self.parameters.get("frames_to_max")
+        self.max_frames = None
+
+    def handleNewFrame(self, new_frame):
+        sliced_data = self.sliceFrame(new_frame)
+
+        if (self.max_frames is None) or (self.max_frames.shape[1:] != sliced_data.shape):
+            self.max_frames = numpy.empty((self.frames_to_max,) + sliced_data.shape,
+                                          dtype = numpy.uint16)
+            self.counts = 0
+
+        numpy.copyto(self.max_frames[self.counts % self.frames_to_max], sliced_data)
+        self.counts += 1
+
+        n_frames = min(self.counts, self.frames_to_max)
+        self.feed_frames.append(frame.Frame(numpy.max(self.max_frames[:n_frames], axis = 0),
+                                            self.frame_number,
+                                            self.x_pixels,
+                                            self.y_pixels,
+                                            self.camera_name))
+        self.frame_number += 1
+
+    def handleReset(self):
+        super().handleReset()
+        self.counts = 0
+
+
 class FeedFunctionalitySlice(FeedFunctionality):
     """
     The feed functionality for slicing out sub-sets of frames.
     """
     pass
 
+
+class FeedFunctionalityStd(FeedFunctionality):
+    """
+    The feed functionality for the running standard deviation of
+    each pixel, since the feed was last reset.
+
+    This uses Welford's algorithm with buffers that are allocated once.
+    """
+    def __init__(self, **kwds):
+        super().__init__(**kwds)
+
+        self.counts = 0
+        self.delta = None
+        self.m2 = None
+        self.mean = None
+        self.temp = None
+
+    def handleNewFrame(self, new_frame):
+        sliced_data = self.sliceFrame(new_frame)
+
+        if (self.mean is None) or (self.mean.shape != sliced_data.shape):
+            self.delta = numpy.empty(sliced_data.shape)
+            self.m2 = numpy.empty(sliced_data.shape)
+            self.mean = numpy.empty(sliced_data.shape)
+            self.temp = numpy.empty(sliced_data.shape)
+            self.counts = 0
+
+        if (self.counts == 0):
+            self.m2.fill(0.0)
+            self.mean.fill(0.0)
+        self.counts += 1
+
+        # mean = mean + (x - mean)/n
+        numpy.subtract(sliced_data, self.mean, out = self.delta)
+        numpy.divide(self.delta, self.counts, out = self.temp)
+        numpy.add(self.mean, self.temp, out = self.mean)
+
+        # m2 = m2 + (x - old mean)*(x - new mean)
+        numpy.subtract(sliced_data, self.mean, out = self.temp)
+        numpy.multiply(self.delta, self.temp, out = self.temp)
+        numpy.add(self.m2, self.temp, out = self.m2)
+
+        # std = sqrt(m2/n)
+        numpy.divide(self.m2, self.counts, out = self.temp)
+        numpy.sqrt(self.temp, out = self.temp)
+        self.feed_frames.append(frame.Frame(self.temp.astype(numpy.uint16),
+                                            self.frame_number,
+                                            self.x_pixels,
+                                            self.y_pixels,
+                                            self.camera_name))
+        self.frame_number += 1
+
+    def handleReset(self):
+        super().handleReset()
+        self.counts = 0
+
         
 class FeedController(object):
     """
@@ -318,12 +674,15 @@ class FeedController(object):
         super().__init__(**kwds)
 
         self.feeds = {}
+        self.sources = {}
         if parameters is None:
             return
 
-        # Create the feeds.
+        # Create the feeds, feeds that are derived from other
+        # feeds are created after the feed that they are derived from.
         self.parameters = parameters
-        for feed_name in self.parameters.getAttrs():
+        camera_names = {}
+        for feed_name in feedOrder(self.parameters):
             file_params = self.parameters.get(feed_name)
             
             # Create default feed parameters.
@@ -392,8 +751,30 @@ class FeedController(object):
                                                        name = "capture_frames",
                                                        value = "1"))
 
+            elif (feed_type == "background"):
+                fclass = FeedFunctionalityBackground
+
+                feed_params.add(params.ParameterInt(description = "Number of frames to average for the background.",
+                                                    name = "background_frames",
+                                                    value = 10))
+
+                feed_params.add(params.ParameterInt(description = "Offset to add after subtracting the background.",
+                                                    name = "offset",
+                                                    value = 0))
+
+            elif (feed_type == "max"):
+                fclass = FeedFunctionalityMax
+
+                feed_params.add(params.ParameterInt(description = "Number of frames in the max projection.",
+                                                    name = "frames_to_max",
+                                                    value = 1))
+
             elif (feed_type == "slice"):
                 fclass = FeedFunctionalitySlice
+
+            elif (feed_type == "std"):
+                fclass = FeedFunctionalityStd
+                
             else:
                 raise FeedException("Unknown feed type '" + feed_type + "' in feed '" + feed_name + "'")
 
@@ -408,7 +789,16 @@ class FeedController(object):
             # Replace the values in the parameters that were read from a file with these values.
             self.parameters.addSubSection(feed_name, feed_params, overwrite = True)
 
-            camera_name = feed_params.get("source") + "." + feed_name
+            # Feeds that are derived from another feed are named after that feed.
+            source = feed_params.get("source")
+            if source in camera_names:
+                camera_name = camera_names[source] + "." + feed_name
+                self.sources[camera_name] = camera_names[source]
+            else:
+                camera_name = source + "." + feed_name
+                self.sources[camera_name] = None
+            camera_names[feed_name] = camera_name
+            
             self.feeds[camera_name] = fclass(feed_name = feed_name,
                                              camera_name = camera_name,
                                              parameters = feed_params)
@@ -419,6 +809,10 @@ class FeedController(object):
                 return False
         return True
 
+    def cleanUp(self):
+        for feed in self.getFeeds():
+            feed.cleanUp()
+
     def disconnectFeeds(self):
         """
         Disconnect the feeds from their camera functionalities.
@@ -426,6 +820,12 @@ class FeedController(object):
         for feed in self.getFeeds():
             feed.disconnectCameraFunctionality()
 
+    def getCameraFeeds(self):
+        """
+        Return the feeds whose source is a camera.
+        """
+        return list(filter(lambda x: self.sources[x.getCameraName()] is None, self.getFeeds()))
+
     def getFeed(self, feed_name):
         return self.feeds[feed_name]
         
@@ -441,6 +841,21 @@ class FeedController(object):
     def resetFeeds(self):
         for feed in self.getFeeds():
             feed.reset()
+
+    def setFilming(self, filming):
+        for feed in self.getFeeds():
+            feed.setFilming(filming)
+
+    def setCameraFunctionality(self, feed_name, camera_functionality):
+        """
+        Set the camera functionality of a feed, this also sets the
+        camera functionality of the feeds that are derived from it.
+        """
+        feed = self.feeds[feed_name]
+        feed.setCameraFunctionality(camera_functionality)
+        for name in self.getFeedNames():
+            if (self.sources[name] == feed_name):
+                self.setCameraFunctionality(name, feed)
             
 
 class Feeds(halModule.HalModule):
@@ -459,6 +874,17 @@ class Feeds(halModule.HalModule):
                               validator = {"data" : {"extra data" : [False, str]},
                                            "resp" : {"feed names" : [True, list]}})
         
+    def cleanUp(self, qt_settings):
+        """
+        Stop the feeds so that they don't start new workers after
+        HAL has waited for the QThreadPool. This includes busy feeds
+        from previous parameters.
+        """
+        if self.feed_controller is not None:
+            self.feed_controller.cleanUp()
+        for feed in list(busy_feeds):
+            feed.cleanUp()
+
     def broadcastCurrentFeeds(self):
         """
         Send a 'configuration' message with the current feed names.
@@ -474,8 +900,8 @@ class Feeds(halModule.HalModule):
 
     def handleResponse(self, message, response):
         if message.isType("get functionality"):
-            feed = self.feed_controller.getFeed(message.getData()["extra data"])
-            feed.setCameraFunctionality(response.getData()["functionality"])
+            self.feed_controller.setCameraFunctionality(message.getData()["extra data"],
+                                                        response.getData()["functionality"])
 
         #
         # If we have camera functionality for all the feeds then it is safe to
@@ -535,6 +961,7 @@ class Feeds(halModule.HalModule):
             if self.feed_controller is not None:
                 for feed in self.feed_controller.getFeeds():
                     self.feed_names.append(feed.getCameraName())
+                for feed in self.feed_controller.getCameraFeeds():
                     self.sendMessage(halMessage.HalMessage(m_type = "get functionality",
                                                            data = {"name" : feed.getParameter("source"),
                                                                    "extra data" : feed.getCameraName()}))
@@ -545,9 +972,11 @@ class Feeds(halModule.HalModule):
         elif message.isType("start film"):
             if self.feed_controller is not None:
                 self.feed_controller.resetFeeds()
+                self.feed_controller.setFilming(True)
         
         elif message.isType("stop film"):
             if self.feed_controller is not None:
+                self.feed_controller.setFilming(False)
                 message.addResponse(halMessage.HalMessageResponse(source = self.module_name,
                                                                   data = {"parameters" : self.feed_controller.getParameters()}))
 
@@ -18,19 +18,80 @@ import os
 
 from PyQt5 import QtCore, QtWidgets
 
+import storm_control.sc_library.hdebug as hdebug
 import storm_control.sc_library.hgit as hgit
 import storm_control.sc_library.halExceptions as halExceptions
 import storm_control.sc_library.parameters as params
 
 import storm_control.hal4000.film.filmRequest as filmRequest
 import storm_control.hal4000.film.filmSettings as filmSettings
+import storm_control.hal4000.film.frameMetadata as frameMetadata
 import storm_control.hal4000.halLib.halMessage as halMessage
 import storm_control.hal4000.halLib.halMessageBox as halMessageBox
 import storm_control.hal4000.halLib.halModule as halModule
 import storm_control.hal4000.halLib.imagewriters as imagewriters
+import storm_control.hal4000.settings.settings as settings
 import storm_control.hal4000.qtdesigner.film_ui as filmUi
 
 
+class SnapshotHandler(QtCore.QObject):
+    """
+    Handles the 'Get Snapshot' TCP message. This stores the HAL message
+    until we get the next frame from the camera (or feed), then adds the
+    frame to the TCP message as binary data.
+    """
+    def __init__(self,
+                 camera_functionality = None,
+                 done_fn = None,
+                 frame_metadata = None,
+                 hal_message = None,
+                 pixel_size = None,
+                 timeout = None,
+                 **kwds):
+        super().__init__(**kwds)
+        self.camera_functionality = camera_functionality
+        self.done_fn = done_fn
+        self.frame_metadata = frame_metadata
+        self.hal_message = hal_message
+        self.pixel_size = pixel_size
+        self.tcp_message = hal_message.getData()["tcp message"]
+
+        self.timeout_timer = QtCore.QTimer(self)
+        self.timeout_timer.timeout.connect(self.handleTimeout)
+        self.timeout_timer.setSingleShot(True)
+        self.timeout_timer.start(timeout)
+
+        self.camera_functionality.newFrame.connect(self.handleNewFrame)
+
+        # Don't let HAL finalize the message until we have a frame.
+        self.hal_message.incRefCount()
+
+    def done(self):
+        self.timeout_timer.stop()
+        self.camera_functionality.newFrame.disconnect(self.handleNewFrame)
+        self.hal_message.decRefCount()
+        self.done_fn(self)
+
+    def handleNewFrame(self, frame):
+        metadata = self.frame_metadata.getMetadata(frame.frame_number)
+        [stage_x, stage_y] = self.frame_metadata.getStagePosition()
+        np_data = frame.getData()
+        self.tcp_message.addResponse("camera", self.camera_functionality.getCameraName())
+        self.tcp_message.addResponse("dtype", np_data.dtype.str)
+        self.tcp_message.addResponse("frame_number", frame.frame_number)
+        self.tcp_message.addResponse("pixel_size", self.pixel_size)
+        self.tcp_message.addResponse("shape", [frame.image_y, frame.image_x])
+        self.tcp_message.addResponse("stage_x", stage_x)
+        self.tcp_message.addResponse("stage_y", stage_y)
+        self.tcp_message.addResponse("stage_z", metadata["stage_z"])
+        self.tcp_message.setBinaryData(np_data.tobytes())
+        self.done()
+
+    def handleTimeout(self):
+        self.tcp_message.setError(True, "Timed out waiting for a frame from " + self.camera_functionality.getCameraName())
+        self.done()
+
+        
 def truncateFilename(filename):
     max_len = 25
     if (len(filename) > max_len):
@@ -280,6 +341,13 @@ class FilmBox(QtWidgets.QGroupBox):
             self.will_overwrite = False
             self.ui.filenameLabel.setStyleSheet("QLabel { color: black}")
         
+    def showDroppedFrames(self, dropped):
+        """
+        Warn the user that some of the frames were not saved.
+        """
+        self.ui.sizeText.setText(self.ui.sizeText.text() + " ({0:d} dropped)".format(dropped))
+        self.ui.sizeText.setStyleSheet("QLabel { color: red}")
+
     def updateFrames(self, new_number):
         self.ui.framesText.setText(str(new_number))
 
@@ -289,6 +357,17 @@ class FilmBox(QtWidgets.QGroupBox):
         else:
             self.ui.sizeText.setText("{0:.1f} GB".format(new_size * 0.00097656))
 
+    def updateWriterStats(self, queued, pending, dropped):
+        """
+        Show the state of the image writer queues as a tooltip on the size
+        label, the label turns red if any frames were dropped.
+        """
+        self.ui.sizeText.setToolTip("queued: {0:d} frames\npending: {1:.1f} MB\ndropped: {2:d} frames".format(queued, pending, dropped))
+        if (dropped > 0):
+            self.ui.sizeText.setStyleSheet("QLabel { color: red}")
+        else:
+            self.ui.sizeText.setStyleSheet("")
+
 
 class Film(halModule.HalModule):
     """
@@ -330,20 +409,57 @@ class Film(halModule.HalModule):
         super().__init__(**kwds)
 
         self.camera_functionalities = []
+        self.cameras_for_snapshots = False
+        self.dax_block_size = 0
+        self.dropped_frames = 0
         self.feed_names = None
         self.film_settings = None
         self.film_state = "idle"
+        self.frame_metadata = frameMetadata.FrameMetadata()
+        self.hdf5_chunk_frames = 1
+        self.hdf5_compression = "lz4"
         self.locked_out = False
         self.number_frames = 0
         self.number_fn_requested = 0
         self.parameter_change = False
         self.pixel_size = 1.0
+        self.snapshot_handlers = []
+        self.snapshot_timeout = 5000
+        self.tiff_compression = "none"
+        self.tiff_compression_workers = 0
         self.timing_functionality = None
         self.wait_for = []
         self.waiting_on = []
+        self.writer_queue_size = 0
         self.writers = None
         self.writers_stopped_timer = QtCore.QTimer(self)
 
+        # If writer_queue_size is greater than zero the image writers will
+        # save the frames in their own threads, buffering up to this many
+        # frames per writer.
+        #
+        # If dax_block_size is greater than zero then .dax files are saved
+        # in blocks of (at least) this many MB.
+        #
+        # hdf5_chunk_frames and hdf5_compression set the chunk size (in
+        # frames) and the compression of .hdf5 files.
+        #
+        # tiff_compression and tiff_compression_workers set the compression
+        # of .tif and .big.tif files and the number of threads to use.
+        #
+        # snapshot_timeout is how long to wait (in milliseconds) for a frame
+        # for the 'Get Snapshot' TCP message.
+        #
+        configuration = module_params.get("configuration", False)
+        if configuration:
+            self.dax_block_size = configuration.get("dax_block_size", 0)
+            self.hdf5_chunk_frames = configuration.get("hdf5_chunk_frames", 1)
+            self.hdf5_compression = configuration.get("hdf5_compression", "lz4")
+            self.snapshot_timeout = configuration.get("snapshot_timeout", 5000)
+            self.tiff_compression = configuration.get("tiff_compression", "none")
+            self.tiff_compression_workers = configuration.get("tiff_compression_workers", 0)
+            self.writer_queue_size = configuration.get("writer_queue_size", 0)
+
         try:
             self.logfile_fp = open(module_params.get("directory") + "image_log.txt", "a")
         except FileNotFoundError:
@@ -426,6 +542,59 @@ class Film(halModule.HalModule):
         if self.logfile_fp is not None:
             self.logfile_fp.close()
 
+    def getWriterStats(self):
+        """
+        Returns the total number of queued frames, pending bytes and 
+        dropped frames for all of the image writers.
+        """
+        queued = 0
+        pending = 0
+        dropped = 0
+        for writer in self.writers:
+            stats = writer.getStats()
+            queued += stats["queued"]
+            pending += stats["bytes pending"]
+            dropped += stats["dropped"]
+        return [queued, pending, dropped]
+        
+    def getSnapshot(self, message):
+        """
+        Handle the 'Get Snapshot' TCP message. If the cameras are not
+        running we start them and stop them again once we have the frame.
+
+        Note: This is not a film so the shutters sequence is not run, even
+              if 'auto_shutters' is set. The frame is taken with whatever
+              illumination is on at the time, as in live mode.
+        """
+        tcp_message = message.getData()["tcp message"]
+        camera_name = tcp_message.getData("camera", "camera1")
+
+        camera_fn = None
+        for elt in self.camera_functionalities:
+            if (elt.getCameraName() == camera_name):
+                camera_fn = elt
+
+        if camera_fn is None:
+            tcp_message.setError(True, "No camera or feed called '" + camera_name + "'")
+            return
+
+        if tcp_message.isTest():
+            tcp_message.addResponse("shape", [camera_fn.getParameter("y_pixels"),
+                                              camera_fn.getParameter("x_pixels")])
+            return
+
+        self.snapshot_handlers.append(SnapshotHandler(camera_functionality = camera_fn,
+                                                      done_fn = self.handleSnapshotDone,
+                                                      frame_metadata = self.frame_metadata,
+                                                      hal_message = message,
+                                                      pixel_size = self.pixel_size,
+                                                      timeout = self.snapshot_timeout,
+                                                      parent = self))
+
+        if (self.film_state == "idle") and not self.view.amInLiveMode() and not self.cameras_for_snapshots:
+            self.cameras_for_snapshots = True
+            self.startCameras()
+
     def handleLiveModeChange(self, state):
         if state:
             self.startCameras()
@@ -445,10 +614,30 @@ class Film(halModule.HalModule):
         for writer in self.writers:
             total_size += writer.getSize()
         self.view.updateSize(total_size)
+
+        # Update display of the image writer queues.
+        if (self.writer_queue_size > 0):
+            [queued, pending, dropped] = self.getWriterStats()
+            self.view.updateWriterStats(queued, pending * 0.000000953674, dropped)
+        
+    def handleSnapshotDone(self, snapshot_handler):
+        self.snapshot_handlers.remove(snapshot_handler)
+        if (len(self.snapshot_handlers) == 0) and self.cameras_for_snapshots:
+            self.cameras_for_snapshots = False
+            if (self.film_state == "idle") and not self.view.amInLiveMode():
+                self.stopCameras()
         
     def handleResponses(self, message):
 
         if message.isType("get functionality"):
+
+            # These are the functionalities that provide the per frame metadata.
+            if "extra data" in message.getData():
+                for response in message.getResponses():
+                    self.frame_metadata.setFunctionality(message.getData()["extra data"],
+                                                         response.getData()["functionality"])
+                return
+
             assert (len(message.getResponses()) == 1)
             for response in message.getResponses():
                 self.camera_functionalities.append(response.getData()["functionality"])
@@ -529,10 +718,21 @@ class Film(halModule.HalModule):
                                                            data = {"name" : name}))
                     self.number_fn_requested += 1
 
+            elif message.sourceIs("focuslock"):
+                properties = message.getData()["properties"]
+                self.sendMessage(halMessage.HalMessage(m_type = "get functionality",
+                                                       data = {"name" : properties["qpd functionality name"],
+                                                               "extra data" : "qpd_fn"}))
+                self.sendMessage(halMessage.HalMessage(m_type = "get functionality",
+                                                       data = {"name" : properties["z stage functionality name"],
+                                                               "extra data" : "z_stage_fn"}))
+
             elif message.sourceIs("illumination"):
                 properties = message.getData()["properties"]
                 if "shutters filename" in properties:
                     self.view.setShutters(properties["shutters filename"])
+                if "shutters info" in properties:
+                    self.frame_metadata.setShuttersInfo(properties["shutters info"])
 
             elif message.sourceIs("mosaic"):
                 #
@@ -540,6 +740,12 @@ class Film(halModule.HalModule):
                 # we can save this in the tif images / stacks.
                 #
                 self.pixel_size = message.getData()["properties"]["pixel_size"]
+
+            elif message.sourceIs("stage"):
+                stage_fn_name = message.getData()["properties"]["stage functionality name"]
+                self.sendMessage(halMessage.HalMessage(m_type = "get functionality",
+                                                       data = {"name" : stage_fn_name,
+                                                               "extra data" : "stage_fn"}))
                     
             elif message.sourceIs("timing"):
                 #
@@ -576,7 +782,8 @@ class Film(halModule.HalModule):
             message.addResponse(halMessage.HalMessageResponse(source = self.module_name,
                                                               data = {"old parameters" : self.view.getParameters().copy()}))
             # Update parameters.
-            self.view.newParameters(message.getData()["parameters"].get(self.module_name))
+            if settings.parametersChanged(message, self.module_name, self.view.getParameters()):
+                self.view.newParameters(message.getData()["parameters"].get(self.module_name))
             message.addResponse(halMessage.HalMessageResponse(source = self.module_name,
                                                               data = {"new parameters" : self.view.getParameters()}))
 
@@ -618,11 +825,25 @@ class Film(halModule.HalModule):
             message.addResponse(halMessage.HalMessageResponse(source = self.module_name,
                                                               data = {"parameters" : self.view.getParameters()}))
 
+            # Record how many frames the image writers dropped.
+            if (self.writer_queue_size > 0):
+                dropped = params.ParameterInt(name = "dropped_frames",
+                                              value = self.dropped_frames)
+                message.addResponse(halMessage.HalMessageResponse(source = self.module_name,
+                                                                  data = {"acquisition" : [dropped]}))
+
         elif message.isType("stop film request"):
             if (self.film_state != "run"):
                 raise halExceptions.HalException("Stop film request received while not filming.")
             self.stopFilmingLevel1()
 
+        elif message.isType("tcp message"):
+            tcp_message = message.getData()["tcp message"]
+            if tcp_message.isType("Get Snapshot"):
+                self.getSnapshot(message)
+                message.addResponse(halMessage.HalMessageResponse(source = self.module_name,
+                                                                  data = {"handled" : True}))
+
         elif message.isType("updated parameters"):
             self.parameter_change = True
 
@@ -691,7 +912,15 @@ class Film(halModule.HalModule):
         if self.film_settings.isSaved():
             for camera in self.camera_functionalities:
                 if camera.getParameter("saved"):
-                    self.writers.append(imagewriters.createFileWriter(camera, self.film_settings))
+                    self.writers.append(imagewriters.createFileWriter(camera,
+                                                                      self.film_settings,
+                                                                      dax_block_size = self.dax_block_size,
+                                                                      frame_metadata = self.frame_metadata,
+                                                                      hdf5_chunk_frames = self.hdf5_chunk_frames,
+                                                                      hdf5_compression = self.hdf5_compression,
+                                                                      queue_size = self.writer_queue_size,
+                                                                      tiff_compression = self.tiff_compression,
+                                                                      tiff_compression_workers = self.tiff_compression_workers))
         if (len(self.writers) == 0):
             self.view.updateSize(0.0)
         
@@ -751,6 +980,15 @@ class Film(halModule.HalModule):
         for writer in self.writers:
             writer.closeWriter()
 
+        # Check if any frames were dropped.
+        [queued, pending, self.dropped_frames] = self.getWriterStats()
+        if (self.dropped_frames > 0):
+            warning = "Warning " + str(self.dropped_frames) + " frames were not saved!"
+            print(">> " + warning)
+            hdebug.logText(warning)
+            self.view.updateWriterStats(queued, pending * 0.000000953674, self.dropped_frames)
+            self.view.showDroppedFrames(self.dropped_frames)
+
         # Enable the UI.
         self.view.enableUI(True)
         
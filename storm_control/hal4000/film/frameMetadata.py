@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+"""
+The frameMetadata object. This keeps track of the current stage
+position, focus lock offset and illumination sequence so that
+they can be saved with each frame by image writers that support
+per frame metadata (i.e. HDF5File).
+"""
+
+from PyQt5 import QtCore
+
+
+class FrameMetadata(QtCore.QObject):
+
+    def __init__(self, **kwds):
+        super().__init__(**kwds)
+        self.color_data = None
+        self.lock_offset = float("nan")
+        self.stage_fn = None
+        self.stage_x = float("nan")
+        self.stage_y = float("nan")
+        self.stage_z = float("nan")
+
+    def getMetadata(self, frame_number):
+        """
+        Returns a dictionary with the current values. The illumination color
+        is [r, g, b] (0 - 255), or [-1, -1, -1] if no color is specified for
+        this frame.
+        """
+        color = None
+        if self.color_data is not None:
+            color = self.color_data[frame_number % len(self.color_data)]
+        if color is None:
+            color = [-1, -1, -1]
+        return {"illumination_color" : color,
+                "lock_offset" : self.lock_offset,
+                "stage_x" : self.stage_x,
+                "stage_y" : self.stage_y,
+                "stage_z" : self.stage_z}
+
+    def getStagePosition(self):
+        """
+        Returns the current stage position as [x, y]. Some stages only
+        report their position periodically, so we ask the stage
+        functionality as this is where it is supposed to be after a move.
+        """
+        if self.stage_fn is not None:
+            pos_dict = self.stage_fn.getCurrentPosition()
+            if pos_dict is not None:
+                return [pos_dict["x"], pos_dict["y"]]
+        return [self.stage_x, self.stage_y]
+
+    def handleQPDUpdate(self, qpd_dict):
+        if "offset" in qpd_dict:
+            self.lock_offset = qpd_dict["offset"]
+
+    def handleStagePosition(self, pos_dict):
+        self.stage_x = pos_dict["x"]
+        self.stage_y = pos_dict["y"]
+
+    def handleZStagePosition(self, z_pos):
+        self.stage_z = z_pos
+
+    def setFunctionality(self, name, functionality):
+        if (name == "qpd_fn"):
+            functionality.qpdUpdate.connect(self.handleQPDUpdate)
+        elif (name == "stage_fn"):
+            self.stage_fn = functionality
+            functionality.stagePosition.connect(self.handleStagePosition)
+            if functionality.getCurrentPosition() is not None:
+                self.handleStagePosition(functionality.getCurrentPosition())
+        elif (name == "z_stage_fn"):
+            functionality.zStagePosition.connect(self.handleZStagePosition)
+            self.handleZStagePosition(functionality.getCurrentPosition())
+
+    def setShuttersInfo(self, shutters_info):
+        color_data = shutters_info.getColorData()
+        if (len(color_data) > 0):
+            self.color_data = color_data
+        else:
+            self.color_data = None
+
+
+#
+# The MIT License
+#
+# Copyright (c) 2026 Zhuang Lab, Harvard University
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
@@ -17,6 +17,7 @@ import storm_control.hal4000.halLib.halModule as halModule
 import storm_control.hal4000.focusLock.lockControl as lockControl
 import storm_control.hal4000.focusLock.lockDisplay as lockDisplay
 import storm_control.hal4000.focusLock.lockModes as lockModes
+import storm_control.hal4000.settings.settings as settings
 
 # UI.
 import storm_control.hal4000.qtdesigner.focuslock_ui as focuslockUi
@@ -292,7 +293,8 @@ class FocusLock(halModule.HalModule):
             p = message.getData()["parameters"]
             message.addResponse(halMessage.HalMessageResponse(source = self.module_name,
                                                               data = {"old parameters" : self.view.getParameters().copy()}))
-            self.view.newParameters(p.get(self.module_name))
+            if settings.parametersChanged(message, self.module_name, self.view.getParameters()):
+                self.view.newParameters(p.get(self.module_name))
             message.addResponse(halMessage.HalMessageResponse(source = self.module_name,
                                                               data = {"new parameters" : self.view.getParameters()}))
 
@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 """
-Python interface to the focus_quality library.
+Python interface to the focus_quality library. There is also
+a numpy version, which is used if the C library is not available.
 
 Hazen 10/13
 """
@@ -13,24 +14,42 @@ import sys
 
 import storm_control.c_libraries.loadclib as loadclib
 
-focus_quality = loadclib.loadCLibrary("focus_quality")
+try:
+    focus_quality = loadclib.loadCLibrary("focus_quality")
 
-c_imageGradient = focus_quality.imageGradient
-c_imageGradient.argtypes = [ndpointer(dtype=numpy.uint16),
-                            ctypes.c_int,
-                            ctypes.c_int]
-c_imageGradient.restype = ctypes.c_float
+    c_imageGradient = focus_quality.imageGradient
+    c_imageGradient.argtypes = [ndpointer(dtype=numpy.uint16),
+                                ctypes.c_int,
+                                ctypes.c_int]
+    c_imageGradient.restype = ctypes.c_float
+
+except OSError:
+    print("C focus quality library not found, reverting to numpy.")
+    focus_quality = None
 
 
 def imageGradient(frame):
     """
     Returns the magnitude of the image gradient in the x direction.
     """
+    if focus_quality is None:
+        return imageGradientPy(frame)
+    
     return c_imageGradient(frame.getData(),
                            frame.image_x,
                            frame.image_y)
 
 
+def imageGradientPy(frame):
+    """
+    numpy version of imageGradient().
+    """
+    # The C library treats the image as signed 16 bit integers.
+    image = numpy.reshape(frame.getData(), (frame.image_y, frame.image_x)).view(numpy.int16).astype(numpy.int64)
+    diff = numpy.sum(numpy.abs(numpy.diff(image, axis = 1)))
+    return numpy.float32(diff)/numpy.float32(numpy.sum(image[:,:-1]))
+
+
 
 #
 # The MIT License
@@ -755,7 +755,7 @@ class OptimalLockMode(AlwaysOnLockMode):
         the focus quality of the frame and moves the piezo to its next position.
         """
         if (self.olm_mode == "optimizing"):
-            quality = focusQuality.imageGradient(frame)
+            quality = frame.getStats().getValue("gradient", lambda : focusQuality.imageGradient(frame))
             if (quality > self.olm_quality_threshold):
                 self.olm_zvalues[self.olm_counter] = LockMode.qpd_state["offset"]
                 self.olm_fvalues[self.olm_counter] = quality
@@ -35,6 +35,7 @@ import storm_control.sc_library.parameters as params
 import storm_control.hal4000.halLib.halDialog as halDialog
 import storm_control.hal4000.halLib.halMessage as halMessage
 import storm_control.hal4000.halLib.halMessageBox as halMessageBox
+import storm_control.hal4000.halLib.halMetrics as halMetrics
 import storm_control.hal4000.halLib.halModule as halModule
 import storm_control.hal4000.qtWidgets.qtAppIcon as qtAppIcon
 
@@ -383,6 +384,8 @@ class HalCore(QtCore.QObject):
                  **kwds):
         super().__init__(**kwds)
 
+        self.message_fan_out = {}
+        self.message_routes = {}
         self.modules = []
         self.module_name = "core"
         self.qt_settings = QtCore.QSettings("storm-control", "hal4000" + config.get("setup_name").lower())
@@ -551,6 +554,7 @@ class HalCore(QtCore.QObject):
             module.cleanUp(self.qt_settings)
         print("Waiting for QThreadPool to finish.")
         halModule.threadpool.waitForDone()
+        self.printFanOut()
         self.running = False
         print(" Dave? What are you doing Dave?")
         print("  ...")
@@ -567,6 +571,29 @@ class HalCore(QtCore.QObject):
                 return m_child
         assert False, "UI element " + name + " not found."
 
+    def getFanOut(self):
+        """
+        Returns a dictionary keyed by message type with how many messages
+        of each type were sent, and how many modules they were sent to and
+        how many modules were skipped.
+        """
+        return self.message_fan_out
+
+    def getMessageRoute(self, m_type):
+        """
+        Returns the list of modules that messages of type m_type should
+        be sent to. Modules that did not say which messages they handle
+        get every message.
+        """
+        if not m_type in self.message_routes:
+            route = []
+            for module in self.modules:
+                m_types = module.getMessageTypes()
+                if (m_types is None) or (m_type in m_types):
+                    route.append(module)
+            self.message_routes[m_type] = route
+        return self.message_routes[m_type]
+
     def handleErrors(self, message):
         """
         Handle errors in messages from 'core'
@@ -599,6 +626,7 @@ class HalCore(QtCore.QObject):
             halMessage.validateData(validator, message)
             
         message.logEvent("queued")
+        message.queued_time = time.perf_counter()
 
         self.queued_messages.append(message)
 
@@ -616,6 +644,12 @@ class HalCore(QtCore.QObject):
 
         # Disconnect messages processed signal.
         message.processed.disconnect(self.handleProcessed)
+
+        # Record how long it took for all the modules to process the message.
+        halMetrics.metrics.add(self.module_name,
+                               message.m_type,
+                               "process",
+                               time.perf_counter() - message.sent_time)
         
         # Call message finalizer.
         message.finalize()
@@ -701,17 +735,53 @@ class HalCore(QtCore.QObject):
                     # Otherwise send the message.
                     else:
                         cur_message.logEvent("sent")
+                        cur_message.sent_time = time.perf_counter()
+                        halMetrics.metrics.add(self.module_name,
+                                               cur_message.m_type,
+                                               "queue",
+                                               cur_message.sent_time - cur_message.queued_time)
 
                         cur_message.processed.connect(self.handleProcessed)
                         self.sent_messages.append(cur_message)
-                        for module in self.modules:
+
+                        route = self.getMessageRoute(cur_message.m_type)
+                        for module in route:
                             cur_message.ref_count += 1
                             module.handleMessage(cur_message)
 
+                        # Update fan out statistics.
+                        if not cur_message.m_type in self.message_fan_out:
+                            self.message_fan_out[cur_message.m_type] = {"messages" : 0,
+                                                                        "sent" : 0,
+                                                                        "skipped" : 0}
+                        fan_out = self.message_fan_out[cur_message.m_type]
+                        fan_out["messages"] += 1
+                        fan_out["sent"] += len(route)
+                        fan_out["skipped"] += len(self.modules) - len(route)
+
+                        # If no module handles this message it is already processed.
+                        if (len(route) == 0):
+                            cur_message.processed.emit(cur_message)
+
                     # Process any remaining messages with immediate timeout.
                     if (len(self.queued_messages) > 0):
                         self.startMessageTimer()
 
+    def printFanOut(self):
+        """
+        Print how many modules each message type was sent to.
+        """
+        if (len(self.message_fan_out) == 0):
+            return
+
+        print("Message fan out (messages, sent, skipped):")
+        for m_type in sorted(self.message_fan_out):
+            fan_out = self.message_fan_out[m_type]
+            text = "  '" + m_type + "' " + ", ".join(map(str, [fan_out["messages"], fan_out["sent"], fan_out["skipped"]]))
+            print(text)
+            hdebug.logText(",".join(["fan out", m_type, str(fan_out["messages"]), str(fan_out["sent"]), str(fan_out["skipped"])]))
+        print("")
+
     def startMessageTimer(self, interval = 0):
         if not self.queued_messages_timer.isActive():
             self.queued_messages_timer.setInterval(interval)
@@ -36,6 +36,7 @@ void rescaleImage100(uint8_t*, unsigned short *, int, int, int, int, int, double
 void rescaleImage101(uint8_t*, unsigned short *, int, int, int, int, int, double, int *, int *);
 void rescaleImage110(uint8_t*, unsigned short *, int, int, int, int, int, double, int *, int *);
 void rescaleImage111(uint8_t*, unsigned short *, int, int, int, int, int, double, int *, int *);
+void rescaleImageTile(uint8_t*, unsigned short *, uint8_t *, int, int, int, int, int, int, int, int, int *, int *);
 
 /* 
  * Functions 
@@ -435,6 +436,100 @@ void rescaleImage111(uint8_t *scaled_image, unsigned short *image, int image_wid
   *image_max = cur_max;
 }
 
+/* rescaleImageTile
+ *
+ * Rescale a tile (a range of rows) of an image using a look up table,
+ * with optional downsampling, flipping and transposing. Different tiles
+ * can be done in parallel by different threads.
+ *
+ * The output image is (rows/downsample, cols/downsample), or the reverse
+ * if it is transposed. The flips are done before the transpose.
+ *
+ * @param scaled_image The output image.
+ * @param image The input image (rows x cols).
+ * @param lut The 65536 element look up table.
+ * @param rows The number of rows in the input image.
+ * @param cols The number of columns in the input image.
+ * @param downsample The downsampling factor, only every n-th pixel is used.
+ * @param out_start The first output row (before flipping / transposing) in this tile.
+ * @param out_end The last output row (exclusive) in this tile.
+ * @param flip_h Flip horizontal.
+ * @param flip_v Flip vertical.
+ * @param transpose Transpose.
+ * @param image_min The minimum of all the input image pixels in this tile.
+ * @param image_max The maximum of all the input image pixels in this tile.
+ */
+void rescaleImageTile(uint8_t *scaled_image, unsigned short *image, uint8_t *lut, int rows, int cols, int downsample, int out_start, int out_end, int flip_h, int flip_v, int transpose, int *image_min, int *image_max)
+{
+  int cur_min,cur_max,i,j,oi,oj,out_cols,out_rows,row_end,row_start;
+  unsigned short *row;
+  uint8_t *dest;
+
+  out_rows = rows/downsample;
+  out_cols = cols/downsample;
+
+  /* Minimum and maximum, this includes the pixels that are skipped by the downsampling. */
+  row_start = out_start*downsample;
+  if (out_end == out_rows){
+    row_end = rows;
+  }
+  else{
+    row_end = out_end*downsample;
+  }
+  cur_min = image[row_start*cols];
+  cur_max = image[row_start*cols];
+  for(i=row_start;i<row_end;i++){
+    row = image + i*cols;
+    for(j=0;j<cols;j++){
+      if(row[j]<cur_min){
+	cur_min = row[j];
+      }
+      else if(row[j]>cur_max){
+	cur_max = row[j];
+      }
+    }
+  }
+
+  /* Rescale. */
+  for(i=out_start;i<out_end;i++){
+    row = image + i*downsample*cols;
+    if(flip_v){
+      oi = out_rows - 1 - i;
+    }
+    else{
+      oi = i;
+    }
+
+    if(transpose){
+      for(j=0;j<out_cols;j++){
+	if(flip_h){
+	  oj = out_cols - 1 - j;
+	}
+	else{
+	  oj = j;
+	}
+	scaled_image[oj*out_rows + oi] = lut[row[j*downsample]];
+      }
+    }
+    else{
+      dest = scaled_image + oi*out_cols;
+      if(flip_h){
+	for(j=0;j<out_cols;j++){
+	  dest[out_cols - 1 - j] = lut[row[j*downsample]];
+	}
+      }
+      else{
+	for(j=0;j<out_cols;j++){
+	  dest[j] = lut[row[j*downsample]];
+	}
+      }
+    }
+  }
+
+  *image_min = cur_min;
+  *image_max = cur_max;
+}
+
 /*
  * The MIT License
  *
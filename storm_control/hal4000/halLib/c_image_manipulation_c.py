@@ -6,9 +6,14 @@ is used to speed up the rendering of the image in the UI. My experience
 was that for large images, such as those from a sCMOS camera, using numpy
 to do the image scaling and type conversion was not fast enough.
 
+ImageRescaler is a multi-threaded version of rescaleImage() for the live
+display that uses a look up table, re-uses it's output buffers and can
+downsample the image.
+
 Hazen 09/15
 """
 
+import concurrent.futures
 import ctypes
 import math
 import numpy
@@ -50,6 +55,36 @@ except OSError:
     print("C image manipulation library not found, reverting to numpy.")
     image_manip = None
 
+# Older versions of the library (i.e. the Windows DLL) might not have this.
+have_tile_fn = False
+if image_manip is not None:
+    try:
+        image_manip.rescaleImageTile.argtypes = [ndpointer(dtype=numpy.uint8),
+                                                 ndpointer(dtype=numpy.uint16),
+                                                 ndpointer(dtype=numpy.uint8),
+                                                 ctypes.c_int,
+                                                 ctypes.c_int,
+                                                 ctypes.c_int,
+                                                 ctypes.c_int,
+                                                 ctypes.c_int,
+                                                 ctypes.c_int,
+                                                 ctypes.c_int,
+                                                 ctypes.c_int,
+                                                 ctypes.c_void_p,
+                                                 ctypes.c_void_p]
+        have_tile_fn = True
+    except AttributeError:
+        print("C image manipulation library is out of date, ImageRescaler will use numpy.")
+
+# This thread pool is shared by all the ImageRescaler objects.
+thread_pool = None
+
+def getThreadPool():
+    global thread_pool
+    if thread_pool is None:
+        thread_pool = concurrent.futures.ThreadPoolExecutor(max_workers = os.cpu_count())
+    return thread_pool
+
 
 def compare(image1, image2):
     """
@@ -156,6 +191,138 @@ def rescaleImage(image, flip_h, flip_v, transpose, display_range, saturated_valu
 
     return [rescaled, image_min, image_max]
 
+
+class ImageRescaler(object):
+    """
+    Multi-threaded version of rescaleImage(). The image is divided into
+    tiles (ranges of rows) which are rescaled in parallel using the
+    C library. The C library does not hold the GIL, so this can use
+    multiple cores.
+
+    Note that the rescaled image is only valid until the next time
+    rescaleImage() is called after that, as the output buffers are
+    re-used.
+    """
+    def __init__(self, n_buffers = 2, n_threads = None, tile_rows = 128, **kwds):
+        """
+        n_buffers - The number of output buffers to cycle through.
+        n_threads - The number of tiles to divide each image into, this
+                    defaults to the number of CPUs.
+        tile_rows - The minimum number of (output) rows in a tile.
+        """
+        super().__init__(**kwds)
+
+        self.buffer_index = 0
+        self.buffers = [None] * n_buffers
+        self.lut = None
+        self.lut_key = None
+        self.n_threads = n_threads
+        self.tile_rows = tile_rows
+
+        if self.n_threads is None:
+            self.n_threads = os.cpu_count()
+
+    def getBuffer(self, shape):
+        """
+        Returns the next output buffer, (re)allocating it if it is
+        not the right shape.
+        """
+        self.buffer_index = (self.buffer_index + 1) % len(self.buffers)
+        if (self.buffers[self.buffer_index] is None) or (self.buffers[self.buffer_index].shape != shape):
+            self.buffers[self.buffer_index] = numpy.empty(shape, dtype = numpy.uint8)
+        return self.buffers[self.buffer_index]
+
+    def getLUT(self, display_range, saturated_value):
+        """
+        Returns the look up table for converting from numpy.uint16 to numpy.uint8. This
+        matches the scaling in the C library rescaleImage functions.
+        """
+        key = (display_range[0], display_range[1], saturated_value)
+        if (key != self.lut_key):
+            if saturated_value is not None:
+                max_range = 254.0
+            else:
+                saturated_value = 65536
+                max_range = 255.0
+
+            scale = max_range/float(display_range[1] - display_range[0])
+            values = numpy.arange(65536, dtype = numpy.float64)
+            lut = numpy.clip((values - display_range[0]) * scale, 0.0, max_range)
+            self.lut = (lut + 0.5).astype(numpy.uint8)
+            self.lut[saturated_value:] = 255
+            self.lut_key = key
+            
+        return self.lut
+
+    def rescaleImage(self, image, flip_h, flip_v, transpose, display_range, saturated_value, downsample = 1, use_numpy = False):
+        """
+        The arguments are the same as for rescaleImage() with the
+        addition of:
+
+        downsample - Only use every n-th pixel in x and y, for example when
+                     the display is zoomed out. The minimum and maximum are
+                     still those of the entire image.
+        use_numpy - (optional) Use numpy even if the C library exists.
+
+        return [numpy.uint8 image, original image minimum, original image maximum]
+        """
+        image = numpy.ascontiguousarray(image, dtype = numpy.uint16)
+        [rows, cols] = image.shape
+        downsample = max(1, min(downsample, rows, cols))
+        out_rows = int(rows/downsample)
+        out_cols = int(cols/downsample)
+        
+        lut = self.getLUT(display_range, saturated_value)
+        if transpose:
+            rescaled = self.getBuffer((out_cols, out_rows))
+        else:
+            rescaled = self.getBuffer((out_rows, out_cols))
+
+        # Use numpy if we don't have the C library.
+        if use_numpy or (not have_tile_fn):
+            sampled = image[:out_rows*downsample:downsample, :out_cols*downsample:downsample]
+            if flip_h:
+                sampled = numpy.fliplr(sampled)
+            if flip_v:
+                sampled = numpy.flipud(sampled)
+            if transpose:
+                sampled = numpy.transpose(sampled)
+            numpy.take(lut, sampled, out = rescaled)
+            return [rescaled, int(numpy.min(image)), int(numpy.max(image))]
+
+        # Divide the image into tiles.
+        tile_rows = max(self.tile_rows, int(math.ceil(out_rows/self.n_threads)))
+        tiles = []
+        for out_start in range(0, out_rows, tile_rows):
+            tiles.append([out_start, min(out_start + tile_rows, out_rows)])
+        tile_min = numpy.zeros(len(tiles), dtype = numpy.int32)
+        tile_max = numpy.zeros(len(tiles), dtype = numpy.int32)
+
+        def rescaleTile(index):
+            image_manip.rescaleImageTile(rescaled,
+                                         image,
+                                         lut,
+                                         rows,
+                                         cols,
+                                         downsample,
+                                         tiles[index][0],
+                                         tiles[index][1],
+                                         int(flip_h),
+                                         int(flip_v),
+                                         int(transpose),
+                                         tile_min[index:].ctypes.data,
+                                         tile_max[index:].ctypes.data)
+
+        # Do the last tile in this thread while we wait for the others.
+        futures = []
+        for i in range(len(tiles) - 1):
+            futures.append(getThreadPool().submit(rescaleTile, i))
+        rescaleTile(len(tiles) - 1)
+        for future in futures:
+            future.result()
+
+        return [rescaled, int(numpy.min(tile_min)), int(numpy.max(tile_max))]
+
             
 #
 # The MIT License
@@ -276,6 +276,10 @@ class HalMessage(QtCore.QObject):
         self.source = source
         self.sync = sync
 
+        # These are set by HalCore for the message timing metrics.
+        self.queued_time = None
+        self.sent_time = None
+
         global message_id
         self.m_id = message_id
         message_id += 1
@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+"""
+In memory message timing metrics for HAL.
+
+HalCore, HalModule and HalWorker record how long messages wait in
+the queues, how long processMessage() takes and how long workers
+take for each module and message type. These are stored in
+histograms with logarithmically spaced bins so that the memory use
+does not grow with the number of messages.
+
+All the times are recorded in the main (GUI) thread.
+"""
+import math
+
+
+# Histogram bins are powers of 2 times this value (in milliseconds).
+min_bin = 0.01
+
+# Number of bins, with 24 bins at 0.01 ms the top bin edge is 0.01 * 2^23 ms,
+# about 84 seconds. Longer times are counted in the last bin.
+n_bins = 24
+
+
+class Histogram(object):
+    """
+    A histogram of times in milliseconds.
+    """
+    def __init__(self, **kwds):
+        super().__init__(**kwds)
+        self.bins = [0] * n_bins
+        self.count = 0
+        self.max_time = 0.0
+        self.total_time = 0.0
+
+    def add(self, time_ms):
+        self.count += 1
+        self.total_time += time_ms
+        if (time_ms > self.max_time):
+            self.max_time = time_ms
+        self.bins[self.getBin(time_ms)] += 1
+
+    def getBin(self, time_ms):
+        if (time_ms <= min_bin):
+            return 0
+        return min(int(math.log2(time_ms/min_bin)) + 1, n_bins - 1)
+
+    def getPercentile(self, fraction):
+        """
+        Returns the upper edge of the bin containing the requested
+        percentile, or the maximum time if this is smaller.
+        """
+        if (self.count == 0):
+            return 0.0
+
+        target = fraction * self.count
+        total = 0
+        for i, counts in enumerate(self.bins):
+            total += counts
+            if (total >= target):
+                break
+        return min(min_bin * 2**i, self.max_time)
+
+    def getSummary(self):
+        """
+        Returns a dictionary with the summary statistics, all the
+        times are in milliseconds.
+        """
+        mean = 0.0
+        if (self.count > 0):
+            mean = self.total_time/self.count
+        return {"n" : self.count,
+                "max" : self.max_time,
+                "mean" : mean,
+                "p50" : self.getPercentile(0.5),
+                "p90" : self.getPercentile(0.9),
+                "p99" : self.getPercentile(0.99),
+                "total" : self.total_time}
+
+
+class HalMetrics(object):
+    """
+    Histograms of message timing keyed by module name, message
+    type and the kind of time ("queue", "process" or "worker").
+    """
+    def __init__(self, **kwds):
+        super().__init__(**kwds)
+        self.histograms = {}
+
+    def add(self, module_name, m_type, kind, time_s):
+        """
+        Add a time (in seconds) to the appropriate histogram.
+        """
+        key = (module_name, m_type, kind)
+        if not key in self.histograms:
+            self.histograms[key] = Histogram()
+        self.histograms[key].add(1000.0 * time_s)
+
+    def getSummary(self, module_name = None):
+        """
+        Returns a dictionary of summary statistics, these are keyed by
+        module name, then by message type and then by the kind of time.
+
+        If module_name is specified only the statistics for this module
+        are returned.
+        """
+        summary = {}
+        for key in sorted(self.histograms):
+            [m_name, m_type, kind] = key
+            if (module_name is not None) and (module_name != m_name):
+                continue
+            if not m_name in summary:
+                summary[m_name] = {}
+            if not m_type in summary[m_name]:
+                summary[m_name][m_type] = {}
+            summary[m_name][m_type][kind] = self.histograms[key].getSummary()
+        return summary
+
+    def reset(self):
+        self.histograms = {}
+
+
+#
+# There is a single instance of this class that all of HAL uses.
+#
+metrics = HalMetrics()
+
+
+#
+# The MIT License
+#
+# Copyright (c) 2026 Zhuang Lab, Harvard University
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
@@ -7,6 +7,7 @@ Hazen 01/17
 """
 
 import faulthandler
+import time
 import traceback
 
 from collections import deque
@@ -17,6 +18,7 @@ import storm_control.sc_library.halExceptions as halExceptions
 
 import storm_control.hal4000.halLib.halMessage as halMessage
 import storm_control.hal4000.halLib.halMessageBox as halMessageBox
+import storm_control.hal4000.halLib.halMetrics as halMetrics
 
 
 threadpool = QtCore.QThreadPool.globalInstance()
@@ -33,8 +35,9 @@ def runWorkerTask(module, message, task, job_time_ms = None):
 
     This will also handle errors in manner that HAL expects.
 
-    Note: Only one of these can be run at a time (per module) in order 
-          to gaurantee that messages are handled serially.
+    Note: Only one of these can be run at a time (per module lane) in
+          order to gaurantee that messages are handled serially. Modules
+          that don't override HalModule.getLane() only have one lane.
     """
     if job_time_ms is None:
         job_time_ms = max_job_time
@@ -42,6 +45,9 @@ def runWorkerTask(module, message, task, job_time_ms = None):
     # Increment the count because once this message is handed off
     # HalModule will automatically decrement the count.
     message.incRefCount()
+    lane = module.current_lane
+    assert not (lane in module.workers), "Lane '" + str(lane) + "' of " + module.module_name + " already has a worker."
+
     ct_task = HalWorker(job_time_ms = job_time_ms,
                         message = message,
                         task = task)
@@ -52,7 +58,7 @@ def runWorkerTask(module, message, task, job_time_ms = None):
     # We need to manage the tasks ourselves because otherwise we'll
     # experience strange/sporadic errors like the GUI freezing.
     ct_task.setAutoDelete(False)
-    module.worker = ct_task
+    module.workers[lane] = ct_task
 
     # Run worker.
     threadpool.start(ct_task)
@@ -83,6 +89,7 @@ class HalWorker(QtCore.QRunnable):
         self.message = message
         self.task = task
         self.task_complete = False
+        self.task_time = 0.0
             
         self.hwsignaler = HalWorkerSignaler()
 
@@ -92,14 +99,18 @@ class HalWorker(QtCore.QRunnable):
     def run(self):
         self.hwsignaler.workerStarted.emit(self.message,
                                            self.job_time_ms)
-        
+
+        start_time = time.perf_counter()
         try:
             self.task()
         except Exception as exception:
+            # Set this before signaling as the error is handled in another thread.
+            self.task_time = time.perf_counter() - start_time
             self.hwsignaler.workerError.emit(self.message,
                                              exception,
                                              traceback.format_exc())
         finally:
+            self.task_time = time.perf_counter() - start_time
             self.task_complete = True
             
         self.hwsignaler.workerDone.emit(self.message)
@@ -124,6 +135,16 @@ class HalModule(QtCore.QObject):
     the order they were received. If a worker is started the next message 
     will get passed to processMessage() until the worker finishes.
 
+    Sub-classes can override getLane() to split their messages into
+    independent lanes, for example one per hardware device. Messages are
+    still processed in order within a lane, but a running worker only
+    blocks the messages in its own lane, so workers in different lanes
+    can run at the same time on the shared thread pool.
+
+    Sub-classes that only handle a few message types should list them in
+    self.message_types. HAL core will then only send these message types
+    to the module. The default (None) is to send the module every message.
+
     Conventions:
        1. self.view is the GUI view, if any that is associated with this module.
        2. self.control is the controller, if any.
@@ -133,15 +154,16 @@ class HalModule(QtCore.QObject):
 
     def __init__(self, module_name = "", **kwds):
         super().__init__(**kwds)
+        self.message_types = None
         self.module_name = module_name
 
+        # The queue entries are [message, lane, time queued].
         self.queued_messages = deque()
-        self.worker = None
 
-        # Timer for workers.
-        self.worker_timer = QtCore.QTimer(self)
-        self.worker_timer.timeout.connect(self.handleWorkerTimer)
-        self.worker_timer.setSingleShot(True)
+        # The currently running workers and their timers, keyed by lane.
+        self.current_lane = None
+        self.workers = {}
+        self.worker_timers = {}
 
         # Timer for handling messages from HAL core.
         self.queued_messages_timer = QtCore.QTimer(self)
@@ -158,21 +180,25 @@ class HalModule(QtCore.QObject):
         """
         pass
 
-    def cleanUpWorker(self):
+    def cleanUpWorker(self, lane):
         """
-        Disconnects any workers that have finished and discard them.
+        Disconnects the worker for this lane and discards it.
         """
-        self.worker.hwsignaler.workerDone.disconnect(self.handleWorkerDone)
-        self.worker.hwsignaler.workerError.disconnect(self.handleWorkerError)
-        self.worker.hwsignaler.workerStarted.disconnect(self.handleWorkerStarted)
-        self.worker = None
+        worker = self.workers.pop(lane)
+        halMetrics.metrics.add(self.module_name,
+                               worker.message.m_type,
+                               "worker",
+                               worker.task_time)
+        worker.hwsignaler.workerDone.disconnect(self.handleWorkerDone)
+        worker.hwsignaler.workerError.disconnect(self.handleWorkerError)
+        worker.hwsignaler.workerStarted.disconnect(self.handleWorkerStarted)
 
         # Stop the worker timer.
-        if self.worker_timer.isActive():
-            self.worker_timer.stop()
+        if (lane in self.worker_timers) and self.worker_timers[lane].isActive():
+            self.worker_timers[lane].stop()
 
-        # Start the timer if we still have messages left.
-        if (len(self.queued_messages) > 0):
+        # Start the timer if we have messages that can be processed.
+        if self.getNextMessage() is not None:
             self.queued_messages_timer.start()
 
     def findChild(self, qt_type, name, options):
@@ -187,6 +213,21 @@ class HalModule(QtCore.QObject):
             else:
                 return self.view.findChild(qt_type, name, options)
 
+    def getLane(self, message):
+        """
+        Override to return the lane that a message should be processed
+        in. The lane can be any hashable object, messages in the same
+        lane are processed in order. The default is a single lane.
+        """
+        return None
+
+    def getMessageTypes(self):
+        """
+        Returns the list of message types that this module handles, or
+        None if the module should get all the messages.
+        """
+        return self.message_types
+
     def handleError(self, message, m_error):
         """
         Override this with class specific error handling.
@@ -214,16 +255,16 @@ class HalModule(QtCore.QObject):
         """
         # Use a queue and timer so that core doesn't
         # get hung up sending messages.
-        self.queued_messages.append(message)
+        lane = self.getLane(message)
+        self.queued_messages.append([message, lane, time.perf_counter()])
 
-        # Only start the timer if we have exactly one message and
-        # we don't have any workers running.
+        # Only start the timer if this is the only message for this lane
+        # and the lane doesn't have a worker running.
         #
-        # If we have more than one message or a running worker then
-        # the timer will get started when the handling of the previous
-        # message completes.
+        # Otherwise the timer will get started when the handling of the
+        # previous message (in this lane) completes.
         #
-        if (len(self.queued_messages) == 1) and self.worker is None:
+        if not self.queued_messages_timer.isActive() and (self.getNextMessage() is not None):
             self.queued_messages_timer.start()
  
     def handleResponse(self, message, response):
@@ -247,6 +288,29 @@ class HalModule(QtCore.QObject):
         """
         return False
 
+    def getNextMessage(self):
+        """
+        Returns the index in the queue of the oldest message whose lane
+        does not have a running worker, or None if there is no such message.
+        """
+        blocked = set(self.workers)
+        for i, [message, lane, queued_time] in enumerate(self.queued_messages):
+            if not (lane in blocked):
+                return i
+
+            # Any later messages in this lane have to wait for this one.
+            blocked.add(lane)
+        return None
+
+    def getWorkerLane(self, message):
+        """
+        Returns the lane of the worker that is handling message.
+        """
+        for lane in self.workers:
+            if self.workers[lane].message is message:
+                return lane
+        raise halExceptions.HalException("No worker for '" + message.m_type + "' in " + self.module_name)
+
     def handleWorkerDone(self, message):
         """
         You probably don't want to override this..
@@ -257,7 +321,7 @@ class HalModule(QtCore.QObject):
         message.logEvent("worker done")
 
         # Cleanup the worker.
-        self.cleanUpWorker()
+        self.cleanUpWorker(self.getWorkerLane(message))
         
     def handleWorkerError(self, message, exception, stack_trace):
         """
@@ -275,7 +339,7 @@ class HalModule(QtCore.QObject):
         message.logEvent("worker failed")
 
         # Cleanup the worker.
-        self.cleanUpWorker()
+        self.cleanUpWorker(self.getWorkerLane(message))
 
     def handleWorkerStarted(self, message, job_time_ms):
         """
@@ -283,10 +347,16 @@ class HalModule(QtCore.QObject):
         """
         message.logEvent("worker started {0:0d}".format(job_time_ms))
         if (job_time_ms > 0):
-            self.worker_timer.setInterval(job_time_ms)
-            self.worker_timer.start()
+            lane = self.getWorkerLane(message)
+            if not (lane in self.worker_timers):
+                worker_timer = QtCore.QTimer(self)
+                worker_timer.timeout.connect(lambda : self.handleWorkerTimer(lane))
+                worker_timer.setSingleShot(True)
+                self.worker_timers[lane] = worker_timer
+            self.worker_timers[lane].setInterval(job_time_ms)
+            self.worker_timers[lane].start()
 
-    def handleWorkerTimer(self):
+    def handleWorkerTimer(self, lane = None):
         """
         If this timer fires that means the worker took longer than
         expected to complete a task, so it is probably hung.
@@ -300,7 +370,7 @@ class HalModule(QtCore.QObject):
         faulthandler.dump_traceback()
         print("")
 
-        e_string = "HALWorker for '" + self.module_name + "' module timed out handling '" + self.worker.message.m_type + "'!"
+        e_string = "HALWorker for '" + self.module_name + "' module timed out handling '" + self.workers[lane].message.m_type + "'!"
         raise halExceptions.HalException(e_string)
         
     def processMessage(self, message):
@@ -316,9 +386,18 @@ class HalModule(QtCore.QObject):
         """
         Don't override..
         """
-        # Get the next message from the queue.
-        message = self.queued_messages.popleft()
-
+        # Get the next message that we can process from the queue.
+        index = self.getNextMessage()
+        if index is None:
+            return
+        [message, self.current_lane, queued_time] = self.queued_messages[index]
+        del self.queued_messages[index]
+
+        start_time = time.perf_counter()
+        halMetrics.metrics.add(self.module_name,
+                               message.m_type,
+                               "queue",
+                               start_time - queued_time)
         try:
             self.processMessage(message)
         except Exception as exception:
@@ -326,16 +405,17 @@ class HalModule(QtCore.QObject):
                                                         message = str(exception),
                                                         m_exception = exception,
                                                         stack_trace = traceback.format_exc()))
+        halMetrics.metrics.add(self.module_name,
+                               message.m_type,
+                               "process",
+                               time.perf_counter() - start_time)
         message.decRefCount(name = self.module_name)
+        self.current_lane = None
 
-        # Check if this is being handled by a worker. If it is then we
-        # wait until the worker is done before moving on to process the
-        # next message.
-        if self.worker is not None:
-            return
-            
-        # Start the timer if we still have messages left.
-        if (len(self.queued_messages) > 0):
+        # Start the timer if we still have messages that can be processed.
+        # If this message is being handled by a worker then any other
+        # messages in the same lane will wait until the worker is done.
+        if self.getNextMessage() is not None:
             self.queued_messages_timer.start()
 
     def sendMessage(self, message):
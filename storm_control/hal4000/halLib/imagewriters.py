@@ -5,17 +5,46 @@ Image file writers for various formats.
 Hazen 03/17
 """
 
+import collections
 import copy
 import datetime
+import math
+import numpy
+import os
+import shutil
 import struct
 import tifffile
 import time
+import traceback
+import zlib
 
 from PyQt5 import QtCore
 
 import storm_control.sc_library.halExceptions as halExceptions
 import storm_control.sc_library.parameters as params
 
+# HDF5 support is optional.
+h5py = None
+try:
+    import h5py
+except ModuleNotFoundError as mnfe:
+    print(">> Warning! h5py module not found, .hdf5 format is not available. <<")
+    pass
+
+# The HDF5 plugins provide the Blosc compressors.
+hdf5plugin = None
+try:
+    import hdf5plugin
+except ModuleNotFoundError as mnfe:
+    pass
+
+# Image codecs provide the zstd and LZW compressors for TIF files.
+imagecodecs = None
+try:
+    import imagecodecs
+except ModuleNotFoundError as mnfe:
+    pass
+
 
 class ImageWriterException(halExceptions.HalException):
     pass
@@ -31,75 +60,359 @@ def availableFileFormats(test_mode):
     #        extension.
     #
 
+    formats = [".dax", ".tif", ".big.tif"]
+    if h5py is not None:
+        formats.append(".hdf5")
     if test_mode:
-        return [".dax", ".tif", ".big.tif", ".test"]
-    else:
-        return [".dax", ".tif", ".big.tif"]
-
-def createFileWriter(camera_functionality, film_settings):
+        formats.append(".test")
+    return formats
+
+def createFileWriter(camera_functionality,
+                     film_settings,
+                     dax_block_size = 0,
+                     frame_metadata = None,
+                     hdf5_chunk_frames = 1,
+                     hdf5_compression = "lz4",
+                     queue_size = 0,
+                     tiff_compression = "none",
+                     tiff_compression_workers = 0):
     """
     This is convenience function which creates the appropriate file writer
     based on the filetype.
+
+    If dax_block_size is greater than zero .dax files are written in
+    blocks of (at least) this many MB using a BlockDaxFile.
+
+    frame_metadata, hdf5_chunk_frames and hdf5_compression are only
+    used by HDF5File, see that class for details.
+
+    tiff_compression and tiff_compression_workers are only used by
+    TIFFile, see that class for details.
+
+    If queue_size is greater than zero the writer will save the frames 
+    using a WriterThread with a queue of this many frames.
     """
     ft = film_settings.getFiletype()
     if (ft == ".dax"):
-        return DaxFile(camera_functionality = camera_functionality,
-                       film_settings = film_settings)
+        if (dax_block_size > 0):
+            return BlockDaxFile(block_size = dax_block_size,
+                                camera_functionality = camera_functionality,
+                                film_settings = film_settings,
+                                queue_size = queue_size)
+        else:
+            return DaxFile(camera_functionality = camera_functionality,
+                           film_settings = film_settings,
+                           queue_size = queue_size)
+    elif (ft == ".hdf5"):
+        return HDF5File(camera_functionality = camera_functionality,
+                        chunk_frames = hdf5_chunk_frames,
+                        compression = hdf5_compression,
+                        film_settings = film_settings,
+                        frame_metadata = frame_metadata,
+                        queue_size = queue_size)
     elif (ft == ".big.tif"):
         return TIFFile(bigtiff = True,
                        camera_functionality = camera_functionality,
-                       film_settings = film_settings)
+                       compression = tiff_compression,
+                       compression_workers = tiff_compression_workers,
+                       film_settings = film_settings,
+                       queue_size = queue_size)
     elif (ft == ".spe"):
         return SPEFile(camera_functionality = camera_functionality,
-                       film_settings = film_settings)
+                       film_settings = film_settings,
+                       queue_size = queue_size)
     elif (ft == ".test"):
         return TestFile(camera_functionality = camera_functionality,
-                       film_settings = film_settings)
+                        film_settings = film_settings,
+                        queue_size = queue_size)
     elif (ft == ".tif"):
         return TIFFile(camera_functionality = camera_functionality,
-                       film_settings = film_settings)
+                       compression = tiff_compression,
+                       compression_workers = tiff_compression_workers,
+                       film_settings = film_settings,
+                       queue_size = queue_size)
     else:
         raise ImageWriterException("Unknown output file format '" + ft + "'")
 
 
+class CompressionJob(QtCore.QRunnable):
+    """
+    Compresses a single frame in a QThreadPool thread.
+    """
+    def __init__(self, encode_fn = None, np_data = None, **kwds):
+        super().__init__(**kwds)
+        self.done = QtCore.QSemaphore(0)
+        self.encode_fn = encode_fn
+        self.encode_error = None
+        self.np_data = np_data
+        self.strip = None
+
+        # We keep a reference to this object until we have the strip.
+        self.setAutoDelete(False)
+
+    def getStrip(self):
+        """
+        Returns the compressed frame, this will block until the
+        frame has been compressed.
+        """
+        self.done.acquire()
+        if self.encode_error is not None:
+            raise ImageWriterException("Frame compression failed:\n" + self.encode_error)
+        return self.strip
+
+    def isDone(self):
+        return (self.done.available() > 0)
+    
+    def run(self):
+        try:
+            self.strip = self.encode_fn(self.np_data)
+        except Exception:
+            self.encode_error = traceback.format_exc()
+        self.np_data = None
+        self.done.release()
+
+
+class WriterThread(QtCore.QThread):
+    """
+    Saves frames in a separate thread so that slow disk I/O does
+    not stall HAL's main thread.
+
+    The frames are copied into a ring buffer that is allocated
+    once when the thread is created. If the ring buffer is full
+    the frame is dropped and the drop is counted.
+
+    There is one of these per file writer, the write_fn is
+    called (in this thread) with each frame as a flat numpy
+    array of type numpy.uint16.
+    """
+    def __init__(self, frame_size = None, queue_size = None, write_fn = None, **kwds):
+        """
+        frame_size - The size of a frame in pixels.
+        queue_size - The maximum number of frames to buffer.
+        write_fn - The function that actually saves a frame.
+        """
+        super().__init__(**kwds)
+        self.add_times = numpy.zeros(queue_size)
+        self.buffer = numpy.zeros((queue_size, frame_size), dtype = numpy.uint16)
+        self.buffer_mutex = QtCore.QMutex()
+        self.buffer_not_empty = QtCore.QWaitCondition()
+        self.frame_bytes = 2 * frame_size
+        self.latencies = None
+        self.n_dropped = 0
+        self.n_queued = 0
+        self.n_written = 0
+        self.queue_size = queue_size
+        self.read_index = 0
+        self.running = True
+        self.write_error = None
+        self.write_fn = write_fn
+
+    def addFrame(self, np_data):
+        """
+        Copy a frame into the ring buffer. This is called from the
+        main thread, returns False if the frame had to be dropped.
+        """
+        self.buffer_mutex.lock()
+        if (self.n_queued == self.queue_size) or (self.write_error is not None):
+            self.n_dropped += 1
+            self.buffer_mutex.unlock()
+            return False
+        write_index = (self.read_index + self.n_queued) % self.queue_size
+        self.buffer_mutex.unlock()
+
+        # There is only one producer and the writer won't look at this
+        # slot until n_queued is incremented, so the copy can be done
+        # without holding the lock.
+        numpy.copyto(self.buffer[write_index], numpy.ravel(np_data))
+        self.add_times[write_index] = time.perf_counter()
+
+        self.buffer_mutex.lock()
+        self.n_queued += 1
+        self.buffer_not_empty.wakeAll()
+        self.buffer_mutex.unlock()
+        return True
+
+    def getStats(self):
+        """
+        Returns a dictionary with the current queue depth, the number of
+        bytes that are waiting to be written and the number of frames
+        that were dropped.
+        """
+        self.buffer_mutex.lock()
+        stats = {"bytes pending" : self.n_queued * self.frame_bytes,
+                 "dropped" : self.n_dropped,
+                 "queued" : self.n_queued,
+                 "written" : self.n_written}
+        self.buffer_mutex.unlock()
+        return stats
+
+    def getWriteError(self):
+        return self.write_error
+    
+    def run(self):
+        while True:
+            self.buffer_mutex.lock()
+            while (self.n_queued == 0) and self.running:
+                self.buffer_not_empty.wait(self.buffer_mutex)
+
+            # Only exit once all the frames have been written.
+            if (self.n_queued == 0):
+                self.buffer_mutex.unlock()
+                break
+            index = self.read_index
+            self.buffer_mutex.unlock()
+
+            try:
+                self.write_fn(self.buffer[index])
+            except Exception:
+                self.buffer_mutex.lock()
+                self.write_error = traceback.format_exc()
+                self.n_queued = 0
+                self.buffer_mutex.unlock()
+                break
+
+            if self.latencies is not None:
+                self.latencies.append(time.perf_counter() - self.add_times[index])
+            
+            self.buffer_mutex.lock()
+            self.read_index = (self.read_index + 1) % self.queue_size
+            self.n_queued -= 1
+            self.n_written += 1
+            self.buffer_mutex.unlock()
+
+    def stopThread(self):
+        """
+        Wait for the thread to finish writing all of the queued frames.
+        """
+        self.buffer_mutex.lock()
+        self.running = False
+        self.buffer_not_empty.wakeAll()
+        self.buffer_mutex.unlock()
+        self.wait()
+
+
 class BaseFileWriter(object):
 
-    def __init__(self, camera_functionality = None, film_settings = None, **kwds):
+    def __init__(self, camera_functionality = None, film_settings = None, queue_size = 0, **kwds):
         super().__init__(**kwds)
         self.cam_fn = camera_functionality
         self.film_settings = film_settings
+        self.latencies = None
         self.stopped = False
+        self.writer_thread = None
 
         # This is the frame size in MB.
         self.frame_size = self.cam_fn.getParameter("bytes_per_frame") *  0.000000953674
         self.number_frames = 0
 
+        self.image_x = self.cam_fn.getParameter("x_pixels")
+        self.image_y = self.cam_fn.getParameter("y_pixels")
+
         # Figure out the filename.
         self.basename = self.film_settings.getBasename()
         if (len(self.cam_fn.getParameter("extension")) != 0):
             self.basename += "_" + self.cam_fn.getParameter("extension")
         self.filename = self.basename + self.film_settings.getFiletype()
 
+        # Start the writer thread. It will wait until there are frames
+        # to write, so it is fine if the sub-class opens the file after
+        # this.
+        if (queue_size > 0):
+            self.writer_thread = WriterThread(frame_size = self.image_x * self.image_y,
+                                              queue_size = queue_size,
+                                              write_fn = self.writeFrame)
+            self.writer_thread.start(QtCore.QThread.NormalPriority)
+            
         # Connect the camera functionality.
-        self.cam_fn.newFrame.connect(self.saveFrame)
+        self.cam_fn.newFrames.connect(self.saveFrames)
         self.cam_fn.stopped.connect(self.handleStopped)
 
     def closeWriter(self):
+        """
+        This blocks until any queued frames have been written, then
+        closes the file with closeFile(). The file is closed even if
+        writing one of the frames failed, the error is raised after.
+        """
         assert self.stopped
-        self.cam_fn.newFrame.disconnect(self.saveFrame)
+        self.cam_fn.newFrames.disconnect(self.saveFrames)
         self.cam_fn.stopped.disconnect(self.handleStopped)
 
+        if self.writer_thread is not None:
+            self.writer_thread.stopThread()
+
+        try:
+            self.closeFile()
+        finally:
+            if (self.writer_thread is not None) and (self.writer_thread.getWriteError() is not None):
+                raise ImageWriterException("Writing " + self.filename + " failed:\n" + self.writer_thread.getWriteError())
+
+    def closeFile(self):
+        """
+        Sub-classes should override this to finish writing and close their file.
+        """
+        pass
+
+    def getLatencies(self):
+        """
+        Returns a list with the time (in seconds) between the arrival
+        of each frame and it being written, or None if we are not
+        recording this.
+        """
+        return self.latencies
+        
     def getSize(self):
         return self.frame_size * self.number_frames
+
+    def getStats(self):
+        """
+        Returns the writer thread statistics, all zeros if we are not
+        using a writer thread.
+        """
+        if self.writer_thread is not None:
+            return self.writer_thread.getStats()
+        else:
+            return {"bytes pending" : 0,
+                    "dropped" : 0,
+                    "queued" : 0,
+                    "written" : self.number_frames}
     
     def handleStopped(self):
         self.stopped = True
 
     def isStopped(self):
         return self.stopped
+
+    def recordLatencies(self):
+        """
+        Start recording how long it takes to write each frame, this is
+        used for benchmarking. Call this before filming starts.
+        """
+        self.latencies = []
+        if self.writer_thread is not None:
+            self.writer_thread.latencies = self.latencies
         
-    def saveFrame(self):
-        self.number_frames += 1
+    def saveFrame(self, frame):
+        if self.writer_thread is not None:
+            if self.writer_thread.addFrame(frame.getData()):
+                self.number_frames += 1
+        elif self.latencies is not None:
+            self.number_frames += 1
+            start_time = time.perf_counter()
+            self.writeFrame(frame.getData())
+            self.latencies.append(time.perf_counter() - start_time)
+        else:
+            self.number_frames += 1
+            self.writeFrame(frame.getData())
+
+    def saveFrames(self, frames):
+        for frame in frames:
+            self.saveFrame(frame)
+
+    def writeFrame(self, np_data):
+        """
+        Sub-classes should override this to actually save the frame data.
+        """
+        pass
 
 
 class DaxFile(BaseFileWriter):
@@ -116,7 +429,6 @@ class DaxFile(BaseFileWriter):
         now stored in the .xml file that is saved with each recording.
         """
         super().closeWriter()
-        self.fp.close()
 
         w = str(self.cam_fn.getParameter("x_pixels"))
         h = str(self.cam_fn.getParameter("y_pixels"))
@@ -132,12 +444,190 @@ class DaxFile(BaseFileWriter):
                 inf_fp.write("y_end = " + h + "\n")
             inf_fp.close()
 
-    def saveFrame(self, frame):
-        super().saveFrame()
-        np_data = frame.getData()
+    def closeFile(self):
+        self.fp.close()
+        
+    def writeFrame(self, np_data):
         np_data.tofile(self.fp)
 
 
+class BlockDaxFile(DaxFile):
+    """
+    Dax file writing class for fast disks.
+
+    The frames are collected in a buffer of (at least) block_size MB
+    and written to disk as a single block when the buffer is full. This
+    uses far fewer system calls than writing frame by frame.
+
+    For fixed length films the file is pre-allocated to its final size
+    (if there is enough free disk space). If the film ends early, or 
+    some of the frames were dropped, the file is truncated to the size
+    of the frames that were actually saved.
+    """
+    def __init__(self, block_size = None, **kwds):
+        super().__init__(**kwds)
+
+        frame_pixels = self.image_x * self.image_y
+        frame_bytes = 2 * frame_pixels
+        block_frames = max(1, int(math.ceil(block_size * 1048576.0/frame_bytes)))
+        if self.film_settings.isFixedLength() and (self.film_settings.getFilmLength() > 0):
+            block_frames = min(block_frames, self.film_settings.getFilmLength())
+
+        self.block = numpy.zeros((block_frames, frame_pixels), dtype = numpy.uint16)
+        self.block_index = 0
+        self.bytes_written = 0
+
+        if self.film_settings.isFixedLength():
+            self.preallocate(self.film_settings.getFilmLength() * frame_bytes)
+
+    def closeFile(self):
+        try:
+            self.flushBlock()
+            self.fp.truncate(self.bytes_written)
+        finally:
+            super().closeFile()
+        
+    def flushBlock(self):
+        if (self.block_index > 0):
+            self.block[:self.block_index].tofile(self.fp)
+            self.bytes_written += self.block[:self.block_index].nbytes
+            self.block_index = 0
+
+    def preallocate(self, size):
+        """
+        Reserve space for the entire film on the disk.
+        """
+        directory = os.path.dirname(os.path.abspath(self.filename))
+        if (size > shutil.disk_usage(directory).free):
+            print(">> Warning not enough disk space to pre-allocate", self.filename)
+            return
+
+        try:
+            os.posix_fallocate(self.fp.fileno(), 0, size)
+        except (AttributeError, OSError):
+            self.fp.truncate(size)
+        
+    def writeFrame(self, np_data):
+        self.block[self.block_index,:] = np_data.ravel()
+        self.block_index += 1
+        if (self.block_index == self.block.shape[0]):
+            self.flushBlock()
+
+
+class HDF5File(BaseFileWriter):
+    """
+    HDF5 file writing class.
+
+    The movie is saved in the 'movie' dataset with shape (frames, y, x).
+    This is chunked in the frame dimension, chunk_frames frames per
+    chunk, and each chunk is compressed.
+
+    Compression options are:
+      "lz4", "zstd" - Blosc with bit-shuffle, this requires the
+                      hdf5plugin module. If it is not available we
+                      fall back to "lzf".
+      "lzf", "gzip" - Built in HDF5 compressors, with byte shuffle.
+      "none" - No compression.
+
+    If frame_metadata is not None then frame_metadata.getMetadata(frame_number)
+    is called for every frame that is saved. This should return a dictionary
+    with the current 'stage_x', 'stage_y', 'stage_z', 'lock_offset' and
+    'illumination_color' ([r, g, b]). These are saved in the 'frame_metadata' group
+    when the file is closed, one entry per frame in the movie.
+    """
+    metadata_fields = ["stage_x", "stage_y", "stage_z", "lock_offset"]
+
+    def __init__(self, chunk_frames = 1, compression = "lz4", frame_metadata = None, **kwds):
+        super().__init__(**kwds)
+        self.frame_metadata = frame_metadata
+        self.illumination_color = []
+        self.metadata = {}
+        for field in self.metadata_fields:
+            self.metadata[field] = []
+
+        chunk_frames = max(1, chunk_frames)
+        if self.film_settings.isFixedLength() and (self.film_settings.getFilmLength() > 0):
+            chunk_frames = min(chunk_frames, self.film_settings.getFilmLength())
+
+        # Frames are collected in a buffer until we have a complete chunk
+        # so that each chunk is only compressed once.
+        self.chunk = numpy.zeros((chunk_frames, self.image_y, self.image_x), dtype = numpy.uint16)
+        self.chunk_index = 0
+        self.frames_written = 0
+
+        self.h5 = h5py.File(self.filename, "w")
+        self.movie = self.h5.create_dataset("movie",
+                                            shape = (0, self.image_y, self.image_x),
+                                            maxshape = (None, self.image_y, self.image_x),
+                                            chunks = self.chunk.shape,
+                                            dtype = numpy.uint16,
+                                            **self.compressionOptions(compression))
+        self.movie.attrs["pixel_size"] = self.film_settings.getPixelSize()
+
+    def closeFile(self):
+        try:
+            self.flushChunk()
+
+            if self.frame_metadata is not None:
+                fm = self.h5.create_group("frame_metadata")
+                for field in self.metadata_fields:
+                    fm.create_dataset(field, data = numpy.array(self.metadata[field], dtype = numpy.float64))
+                fm.create_dataset("illumination_color",
+                                  data = numpy.array(self.illumination_color, dtype = numpy.int16).reshape((-1, 3)))
+        finally:
+            self.h5.close()
+
+    def compressionOptions(self, compression):
+        """
+        Returns the h5py.create_dataset() keyword arguments for compression.
+        """
+        if compression in ["lz4", "zstd"]:
+            if hdf5plugin is not None:
+                return dict(hdf5plugin.Blosc(cname = compression,
+                                             clevel = 5,
+                                             shuffle = hdf5plugin.Blosc.BITSHUFFLE))
+            print(">> Warning! hdf5plugin module not found, using lzf compression. <<")
+            compression = "lzf"
+
+        if (compression == "none"):
+            return {}
+        elif compression in ["gzip", "lzf"]:
+            return {"compression" : compression, "shuffle" : True}
+        else:
+            raise ImageWriterException("Unknown HDF5 compression '" + compression + "'")
+
+    def flushChunk(self):
+        if (self.chunk_index > 0):
+            self.movie.resize(self.frames_written + self.chunk_index, axis = 0)
+            self.movie[self.frames_written:] = self.chunk[:self.chunk_index]
+            self.frames_written += self.chunk_index
+            self.chunk_index = 0
+        
+    def saveFrame(self, frame):
+        """
+        The metadata is recorded here, in the main thread, as it needs
+        to be what it was when the frame arrived. Dropped frames don't
+        get an entry.
+        """
+        if self.frame_metadata is None:
+            super().saveFrame(frame)
+            return
+
+        number_frames = self.number_frames
+        metadata = self.frame_metadata.getMetadata(frame.frame_number)
+        super().saveFrame(frame)
+        if (self.number_frames > number_frames):
+            for field in self.metadata_fields:
+                self.metadata[field].append(metadata[field])
+            self.illumination_color.append(metadata["illumination_color"])
+            
+    def writeFrame(self, np_data):
+        self.chunk[self.chunk_index] = np_data.reshape((self.image_y, self.image_x))
+        self.chunk_index += 1
+        if (self.chunk_index == self.chunk.shape[0]):
+            self.flushChunk()
+
+
 class SPEFile(BaseFileWriter):
     """
     SPE file writing class.
@@ -173,15 +663,15 @@ class SPEFile(BaseFileWriter):
 
         self.fp.seek(4100)
 
-    def closeWriter(self):
-        super().closeWriter()
-        self.fp.seek(1446)
-        self.fp.write(struct.pack("i", self.number_frames))
+    def closeFile(self):
+        try:
+            self.fp.seek(1446)
+            self.fp.write(struct.pack("i", self.number_frames))
+        finally:
+            self.fp.close()
 
-    def saveFrame(self, frame):
-        super().saveFrame()
-        np_data = frame.getData()
-        np_data.tofile(self.file_ptrs[index])
+    def writeFrame(self, np_data):
+        np_data.tofile(self.fp)
 
 
 class TestFile(DaxFile):
@@ -206,10 +696,42 @@ class TestFile(DaxFile):
 class TIFFile(BaseFileWriter):
     """
     TIF file writing class. This supports both normal and 'big' tiff.
+
+    Frames can optionally be compressed, compression is one of "zlib",
+    "zstd" or "lzw" ("zstd" and "lzw" require the imagecodecs module).
+    The frames are compressed in parallel by a pool of compression_workers
+    threads (0 is one per core). The compressed frames are written to the
+    file, in order, by whichever thread calls writeFrame().
+
+    ImageJ does not support compressed files so in this case normal
+    tifs are saved as plain (not ImageJ) tifs.
     """
-    def __init__(self, bigtiff = False, **kwds):
+    encoders = {"lzw" : lambda x: imagecodecs.lzw_encode(x),
+                "zlib" : lambda x: zlib.compress(x, 6),
+                "zstd" : lambda x: imagecodecs.zstd_encode(x)}
+    
+    def __init__(self, bigtiff = False, compression = "none", compression_workers = 0, **kwds):
         super().__init__(**kwds)
+        self.compression = compression
+        self.jobs = collections.deque()
         self.metadata = {'unit' : 'um'}
+        self.thread_pool = None
+
+        if (self.compression != "none"):
+            if not self.compression in self.encoders:
+                raise ImageWriterException("Unknown TIF compression '" + self.compression + "'")
+            if (self.compression != "zlib") and (imagecodecs is None):
+                raise ImageWriterException("TIF compression '" + self.compression + "' requires the imagecodecs module.")
+
+            # We use our own thread pool so that we don't starve the
+            # rest of HAL of threads.
+            self.thread_pool = QtCore.QThreadPool()
+            if (compression_workers > 0):
+                self.thread_pool.setMaxThreadCount(compression_workers)
+
+            # Limit the number of frames that are waiting to be compressed.
+            self.max_jobs = 2 * self.thread_pool.maxThreadCount()
+
         if bigtiff:
             self.resolution = (25400.0/self.film_settings.getPixelSize(),
                                25400.0/self.film_settings.getPixelSize())
@@ -218,19 +740,49 @@ class TIFFile(BaseFileWriter):
         else:
             self.resolution = (1.0/self.film_settings.getPixelSize(), 1.0/self.film_settings.getPixelSize())
             self.tif = tifffile.TiffWriter(self.filename,
-                                           imagej = True)
-
-    def closeWriter(self):
-        super().closeWriter()
-        self.tif.close()
+                                           imagej = (self.thread_pool is None))
+
+    def closeFile(self):
+        try:
+            if self.thread_pool is not None:
+                self.writeStrips(max_pending = 0)
+        finally:
+            if self.thread_pool is not None:
+                self.thread_pool.waitForDone()
+            self.tif.close()
         
-    def saveFrame(self, frame):
-        super().saveFrame()
-        image = frame.getData()
-        self.tif.save(image.reshape((frame.image_y, frame.image_x)),
-                      metadata = self.metadata,
-                      resolution = self.resolution, 
-                      contiguous = True)
+    def writeFrame(self, np_data):
+        if self.thread_pool is None:
+            self.tif.write(np_data.reshape((self.image_y, self.image_x)),
+                           metadata = self.metadata,
+                           resolution = self.resolution, 
+                           contiguous = True)
+        else:
+            # The data is copied as np_data may be re-used once we return.
+            job = CompressionJob(encode_fn = self.encoders[self.compression],
+                                 np_data = numpy.copy(np_data))
+            self.jobs.append(job)
+            self.thread_pool.start(job)
+            self.writeStrips(max_pending = self.max_jobs)
+
+    def writeStrips(self, max_pending = 0):
+        """
+        Write all of the frames that have been compressed, stopping at
+        the first frame that is still being compressed so that the frames
+        are saved in order. This will wait for frames to be compressed
+        if there are more than max_pending frames in the queue.
+        """
+        while (len(self.jobs) > 0):
+            if not (self.jobs[0].isDone() or (len(self.jobs) > max_pending)):
+                break
+            strip = self.jobs.popleft().getStrip()
+            self.tif.write(iter([strip]),
+                           shape = (self.image_y, self.image_x),
+                           dtype = numpy.uint16,
+                           compression = self.compression,
+                           metadata = self.metadata,
+                           resolution = self.resolution,
+                           rowsperstrip = self.image_y)
 
 
 #
@@ -20,6 +20,7 @@ import storm_control.hal4000.halLib.halModule as halModule
 import storm_control.hal4000.illumination.illuminationChannel as illuminationChannel
 import storm_control.hal4000.illumination.illuminationParameters as illuminationParameters
 import storm_control.hal4000.illumination.xmlParser as xmlParser
+import storm_control.hal4000.settings.settings as settings
 
 # UI.
 import storm_control.hal4000.qtdesigner.illumination_ui as illuminationUi
@@ -360,7 +361,8 @@ class Illumination(halModule.HalModule):
             message.addResponse(halMessage.HalMessageResponse(source = self.module_name,
                                                               data = {"old parameters" : self.view.getParameters().copy()}))
             self.view.setXMLDirectory(os.path.dirname(p.get("parameters_file")))
-            self.view.newParameters(p.get(self.module_name))
+            if settings.parametersChanged(message, self.module_name, self.view.getParameters()):
+                self.view.newParameters(p.get(self.module_name))
             message.addResponse(halMessage.HalMessageResponse(source = self.module_name,
                                                               data = {"new parameters" : self.view.getParameters()}))
 
@@ -109,6 +109,7 @@ class Galvo(halModule.HalModule):
 
     def __init__(self, module_params = None, qt_settings = None, **kwds):
         super().__init__(**kwds)
+        self.message_types = ["configure1", "show", "start"]
         self.configuration = module_params.get("configuration")
 
         self.view = GalvoView(module_name = self.module_name,
@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+"""
+Displays the message timing metrics that HAL records (see
+halLib/halMetrics.py) and makes them available using the
+'Get Message Metrics' TCP message.
+
+This is useful for figuring out which module is slowing HAL
+down during a long Dave run.
+"""
+
+from PyQt5 import QtCore, QtWidgets
+
+import storm_control.hal4000.halLib.halDialog as halDialog
+import storm_control.hal4000.halLib.halMessage as halMessage
+import storm_control.hal4000.halLib.halMetrics as halMetrics
+import storm_control.hal4000.halLib.halModule as halModule
+
+# UI.
+import storm_control.hal4000.qtdesigner.hal_metrics_ui as halMetricsUi
+
+
+class MessageMetricsView(halDialog.HalDialog):
+    """
+    Manages the message metrics GUI.
+    """
+    def __init__(self, update_interval = 1000, **kwds):
+        super().__init__(**kwds)
+        self.columns = ["Module", "Message", "Time", "N", "Mean (ms)", "P90 (ms)", "Max (ms)", "Total (ms)"]
+
+        self.ui = halMetricsUi.Ui_Dialog()
+        self.ui.setupUi(self)
+
+        self.ui.metricsTableWidget.setColumnCount(len(self.columns))
+        self.ui.metricsTableWidget.setHorizontalHeaderLabels(self.columns)
+        self.ui.resetButton.clicked.connect(self.handleReset)
+
+        # Update the table periodically when the dialog is visible.
+        self.update_timer = QtCore.QTimer(self)
+        self.update_timer.setInterval(update_interval)
+        self.update_timer.timeout.connect(self.updateTable)
+
+    def hideEvent(self, event):
+        self.update_timer.stop()
+        super().hideEvent(event)
+
+    def handleReset(self, boolean):
+        halMetrics.metrics.reset()
+        self.updateTable()
+
+    def showEvent(self, event):
+        self.updateTable()
+        self.update_timer.start()
+        super().showEvent(event)
+
+    def updateTable(self):
+        rows = []
+        summary = halMetrics.metrics.getSummary()
+        for m_name in summary:
+            for m_type in summary[m_name]:
+                for kind in summary[m_name][m_type]:
+                    stats = summary[m_name][m_type][kind]
+                    rows.append([m_name, m_type, kind, stats["n"], stats["mean"], stats["p90"], stats["max"], stats["total"]])
+
+        table = self.ui.metricsTableWidget
+        table.setSortingEnabled(False)
+        table.setRowCount(len(rows))
+        for i, row in enumerate(rows):
+            for j, value in enumerate(row):
+                item = QtWidgets.QTableWidgetItem()
+                if isinstance(value, str):
+                    item.setText(value)
+                elif isinstance(value, int):
+                    item.setData(QtCore.Qt.DisplayRole, value)
+                else:
+                    item.setData(QtCore.Qt.DisplayRole, round(value, 3))
+                table.setItem(i, j, item)
+        table.setSortingEnabled(True)
+
+
+class MessageMetrics(halModule.HalModule):
+    """
+    Message timing metrics module.
+
+    This handles the 'Get Message Metrics' TCP message. The response
+    'metrics' is a dictionary keyed by module name, then message type
+    and then the kind of time ('queue', 'process' or 'worker'). The
+    optional 'module' data field restricts the response to a single
+    module.
+    """
+    def __init__(self, module_params = None, qt_settings = None, **kwds):
+        super().__init__(**kwds)
+        self.message_types = ["configure1", "show", "start", "tcp message"]
+        configuration = module_params.get("configuration", None)
+
+        update_interval = 1000
+        if configuration is not None:
+            update_interval = configuration.get("update_interval", update_interval)
+
+        self.view = MessageMetricsView(module_name = self.module_name,
+                                       update_interval = update_interval)
+        self.view.halDialogInit(qt_settings,
+                                module_params.get("setup_name") + " message metrics")
+
+    def cleanUp(self, qt_settings):
+        self.view.cleanUp(qt_settings)
+
+    def processMessage(self, message):
+
+        if message.isType("configure1"):
+            self.sendMessage(halMessage.HalMessage(m_type = "add to menu",
+                                                   data = {"item name" : "Message Metrics",
+                                                           "item data" : "message metrics"}))
+
+        elif message.isType("show"):
+            if (message.getData()["show"] == "message metrics"):
+                self.view.show()
+
+        elif message.isType("start"):
+            if message.getData()["show_gui"]:
+                self.view.showIfVisible()
+
+        elif message.isType("tcp message"):
+            tcp_message = message.getData()["tcp message"]
+            if tcp_message.isType("Get Message Metrics"):
+                if not tcp_message.isTest():
+                    tcp_message.addResponse("metrics",
+                                            halMetrics.metrics.getSummary(tcp_message.getData("module")))
+                message.addResponse(halMessage.HalMessageResponse(source = self.module_name,
+                                                                  data = {"handled" : True}))
+
+
+#
+# The MIT License
+#
+# Copyright (c) 2026 Zhuang Lab, Harvard University
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
@@ -64,7 +64,7 @@ class Calibrator(QtCore.QObject):
     def handleNewFrame(self, frame):
         frame_32 = frame.getData().astype(numpy.int32)
         frame_32 = numpy.reshape(frame_32, self.mean.shape)
-        self.frame_mean[self.accumulated] = numpy.mean(frame_32)
+        self.frame_mean[self.accumulated] = frame.getStats().getMean()
         self.mean += frame_32
         self.var += frame_32 * frame_32
 
@@ -250,6 +250,7 @@ class SCMOSCalibration(halModule.HalModule):
 
     def __init__(self, module_params = None, qt_settings = None, **kwds):
         super().__init__(**kwds)
+        self.message_types = ["change directory", "configuration", "configure1", "show", "start"]
         self.number_fn_requested = 0
 
         self.view = SCMOSCalibrationView(module_name = self.module_name)
@@ -114,6 +114,7 @@ class ZStage(halModule.HalModule):
 
     def __init__(self, module_params = None, qt_settings = None, **kwds):
         super().__init__(**kwds)
+        self.message_types = ["configure1", "new parameters", "show", "start"]
         self.configuration = module_params.get("configuration")
 
         self.view = ZStageView(module_name = self.module_name,
@@ -48,6 +48,7 @@ class Mosaic(halModule.HalModule):
     """
     def __init__(self, module_params = None, qt_settings = None, **kwds):
         super().__init__(**kwds)
+        self.message_types = ["configure1", "new parameters", "stop film", "tcp message"]
 
         self.parameters = module_params.get("parameters")
         for param in self.parameters.getAttrs():
@@ -117,6 +118,18 @@ class Mosaic(halModule.HalModule):
                 message.addResponse(halMessage.HalMessageResponse(source = self.module_name,
                                                                   data = {"handled" : True}))
 
+            #
+            # film.film adds the frame, we add what is needed to position
+            # and orient the frame in a mosaic.
+            #
+            elif tcp_message.isType("Get Snapshot"):
+                if not tcp_message.isTest():
+                    tcp_message.addResponse("objective", getObjectiveName(self.parameters))
+                    for pname in ["flip_horizontal", "flip_vertical", "transpose"]:
+                        tcp_message.addResponse(pname, self.parameters.get(pname, False))
+                message.addResponse(halMessage.HalMessageResponse(source = self.module_name,
+                                                                  data = {"handled" : True}))
+
     def sendPixelSize(self, pixel_size):
         props = {"pixel_size" : pixel_size}
         self.sendMessage(halMessage.HalMessage(m_type = "configuration",
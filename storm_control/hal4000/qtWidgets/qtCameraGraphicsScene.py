@@ -23,6 +23,14 @@ class QtCameraGraphicsItem(QtWidgets.QGraphicsItem):
 
     If the image is binned then the rendered image needs to be
     up-sampled appropriately to compensate for the binning.
+
+    If the view is zoomed out then the image is downsampled before
+    it is rescaled as there is no point in rescaling pixels that
+    won't be visible.
+
+    The rescaler uses three output buffers, one for the image that
+    is displayed, one for an image that is waiting to be displayed
+    and one for an image that is being rendered (see renderFrame()).
     """
     def __init__(self, **kwds):
         super().__init__(**kwds)
@@ -41,11 +49,14 @@ class QtCameraGraphicsItem(QtWidgets.QGraphicsItem):
         self.frame_y_offset = 0
         self.image_max = 0
         self.image_min = 0
+        self.image_rect = None
         self.intensity_info = 0
         self.max_intensity = None
         self.q_image = None
+        self.rescaler = c_image.ImageRescaler(n_buffers = 3)
         self.scale_x = 1
         self.scale_y = 1
+        self.zoom_out = 1
 
     def boundingRect(self):
         chip_rect = QtCore.QRectF(0, 0, self.chip_x, self.chip_y)
@@ -88,13 +99,26 @@ class QtCameraGraphicsItem(QtWidgets.QGraphicsItem):
     def newRange(self, d_min, d_max):
         self.display_range = [d_min, d_max]
 
+    def newScale(self, scale):
+        """
+        This is the scale of the QtCameraGraphicsView, negative
+        values mean that we are zoomed out.
+        """
+        if (scale < 0):
+            self.zoom_out = -scale + 1
+        else:
+            self.zoom_out = 1
+
     def paint(self, painter, option, widget):
         if self.q_image is not None:
 
             # Draw the image.
-            painter.drawImage(self.frame_x_offset,
-                              self.frame_y_offset,
-                              self.q_image)
+            if self.image_rect is not None:
+                painter.drawImage(self.image_rect, self.q_image)
+            else:
+                painter.drawImage(self.frame_x_offset,
+                                  self.frame_y_offset,
+                                  self.q_image)
             
             # Draw the grid into the buffer.
             if self.draw_grid:
@@ -116,20 +140,33 @@ class QtCameraGraphicsItem(QtWidgets.QGraphicsItem):
         self.click_x = cx
         self.click_y = cy
 
-    def setColorTable(self):
+    def setColorTable(self, q_image):
         """
-        Sets the color table of the new image. If you don't do this Qt
+        Sets the color table of a new image. If you don't do this Qt
         will segfault without giving you a traceback or any kind of
         warning message..
         """
         if self.colortable:
             for i in range(256):
-                self.q_image.setColor(i, QtGui.qRgb(self.colortable[i][0], 
-                                                    self.colortable[i][1], 
-                                                    self.colortable[i][2]))
+                q_image.setColor(i, QtGui.qRgb(self.colortable[i][0], 
+                                               self.colortable[i][1], 
+                                               self.colortable[i][2]))
         else:
             for i in range(256):
-                self.q_image.setColor(i,QtGui.qRgb(i,i,i))        
+                q_image.setColor(i,QtGui.qRgb(i,i,i))        
+
+    def setRender(self, render):
+        """
+        Display the result of renderFrame().
+        """
+        self.image_max = render["image_max"]
+        self.image_min = render["image_min"]
+        self.image_rect = render["image_rect"]
+        self.intensity_info = render["intensity_info"]
+        self.q_image = render["q_image"]
+
+        # Force re-paint.
+        self.update()
 
     def setShowGrid(self, show):
         self.draw_grid = show
@@ -137,9 +174,13 @@ class QtCameraGraphicsItem(QtWidgets.QGraphicsItem):
     def setShowTarget(self, show):
         self.draw_target = show
         
-    def updateImageWithFrame(self, frame):
+    def renderFrame(self, frame):
         """
-        Convert the frame to a QImage, then call update() to display it.
+        Convert the frame to a QImage. This does not change what is
+        displayed so it can be called from a thread other than the GUI
+        thread. The result is displayed with setRender().
+
+        Returns None if the frame is not the expected size.
         """
         #
         # For reasons lost in the mists of time 'frame' is a 1D numpy array
@@ -152,42 +193,61 @@ class QtCameraGraphicsItem(QtWidgets.QGraphicsItem):
             image_data = image_data.reshape((h,w))
         except ValueError as e:
             print("Got an image with an unexpected size, ", image_data.shape, "expected [", w, ",", h, "]")
-            return
+            return None
 
         max_intensity = self.max_intensity
         if not self.display_saturated_pixels:
             max_intensity = None
 
+        # Downsample if we are zoomed out, allowing for binning.
+        downsample = int(self.zoom_out/max(self.scale_x, self.scale_y))
+        
         # Rescale the image & record it's minimum and maximum.
-        [temp, self.image_min, self.image_max] = c_image.rescaleImage(image_data,
-                                                                      False,
-                                                                      False,
-                                                                      False,
-                                                                      self.display_range,
-                                                                      max_intensity)
+        [temp, image_min, image_max] = self.rescaler.rescaleImage(image_data,
+                                                                  False,
+                                                                  False,
+                                                                  False,
+                                                                  self.display_range,
+                                                                  max_intensity,
+                                                                  downsample = downsample)
+
+        # Save the minimum and maximum so that other modules don't have to compute them.
+        frame.getStats().setMinMax(image_min, image_max)
         
-        # Create QImage & re-scale to compensate for binning, if any.
-        temp_image = QtGui.QImage(temp.data, w, h, QtGui.QImage.Format_Indexed8)
-        if (self.scale_x != 1) or (self.scale_y != 1):
-            self.q_image = temp_image.scaled(w * self.scale_x, h * self.scale_y)
+        # Create QImage & re-scale to compensate for binning, if any. If the
+        # image was downsampled it is scaled back up when it is drawn.
+        temp_image = QtGui.QImage(temp.data, temp.shape[1], temp.shape[0], temp.shape[1], QtGui.QImage.Format_Indexed8)
+        image_rect = None
+        if (temp.shape[1] != w) or (temp.shape[0] != h):
+            image_rect = QtCore.QRectF(self.frame_x_offset,
+                                       self.frame_y_offset,
+                                       w * self.scale_x,
+                                       h * self.scale_y)
+            q_image = temp_image
+        elif (self.scale_x != 1) or (self.scale_y != 1):
+            q_image = temp_image.scaled(w * self.scale_x, h * self.scale_y)
         else:
-            self.q_image = temp_image
-        self.q_image.ndarray = temp
+            q_image = temp_image
+        q_image.ndarray = temp
 
         # Set the images color table.
-        self.setColorTable()
+        self.setColorTable(q_image)
 
         # Record the intensity where the user last clicked on the image.
         # self.click_x and self.click_y are in frame coordinates.
         xl = self.click_x
         yl = self.click_y
         if ((xl >= 0) and (xl < w) and (yl >= 0) and (yl < h)):
-            self.intensity_info = image_data[yl, xl]
+            intensity_info = image_data[yl, xl]
         else:
-            self.intensity_info = 0
+            intensity_info = 0
 
-        # Force re-paint.
-        self.update()
+        return {"frame" : frame,
+                "image_max" : image_max,
+                "image_min" : image_min,
+                "image_rect" : image_rect,
+                "intensity_info" : intensity_info,
+                "q_image" : q_image}
 
 
 class QtCameraGraphicsScene(QtWidgets.QGraphicsScene):
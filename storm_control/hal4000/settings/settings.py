@@ -38,10 +38,43 @@ import storm_control.hal4000.halLib.halModule as halModule
 import storm_control.hal4000.settings.parametersBox as parametersBox
 
 
+def getChangedParameters(message, section):
+    """
+    Returns the list of the parameters in section that changed in a
+    'new parameters' message, or None if this is not known. In this
+    case all the parameters in the section could have changed.
+    """
+    changes = message.getData().get("changes", None)
+    if changes is None:
+        return None
+    return changes.get(section, [])
+
+
+def parametersChanged(message, section, current_parameters):
+    """
+    Returns False if none of the parameters in section changed in a
+    'new parameters' message. Modules can use this to skip re-configuring.
+
+    current_parameters are the parameters that the module is using now.
+    A module can change these itself (from its UI for example), so they
+    are not necessarily the last parameters that settings applied, and
+    the new parameters are also compared against them.
+    """
+    changed = getChangedParameters(message, section)
+    if (changed is None) or (len(changed) > 0):
+        return True
+
+    parameters = message.getData()["parameters"]
+    if not parameters.has(section):
+        return False
+    return (len(params.difference(parameters.get(section), current_parameters)) > 0)
+
+
 class Settings(halModule.HalModule):
     
     def __init__(self, module_params = None, qt_settings = None, **kwds):
         super().__init__(**kwds)
+        self.applied_parameters = None
         self.locked_out = False
         self.wait_for = []
         self.waiting_on = []
@@ -113,8 +146,19 @@ class Settings(halModule.HalModule):
         #
         #   3. The 'new parameters' response does not need to be a copy.
         #
+        #   4. 'changes' is the difference between these parameters and the
+        #      last parameters that were successfully applied, as a dictionary
+        #      of changed parameter names keyed by the top level section (see
+        #      params.differenceBySection()). Modules can use this (with
+        #      parametersChanged()) to avoid re-configuring if nothing in their
+        #      section changed. It is not included if the difference is not
+        #      known, for example after an error. It also does not include
+        #      any changes that the modules made to their own parameters
+        #      after they were applied, parametersChanged() checks for these.
+        #
         halMessage.addMessage("new parameters",
-                              validator = {"data" : {"parameters" : [True, params.StormXMLObject],
+                              validator = {"data" : {"changes" : [False, dict],
+                                                     "parameters" : [True, params.StormXMLObject],
                                                      "is_edit" : [True, bool]},
                                            "resp" : {"new parameters" : [False, params.StormXMLObject],
                                                      "old parameters" : [False, params.StormXMLObject]}})
@@ -189,9 +233,15 @@ class Settings(halModule.HalModule):
         self.setLockout(True)
         
         # is_edit means we are sending a modified version of the current parameters.
+        data = {"parameters" : parameters.copy(),
+                "is_edit" : is_edit}
+
+        # Work out what changed relative to the parameters that the modules have.
+        if self.applied_parameters is not None:
+            data["changes"] = params.differenceBySection(parameters, self.applied_parameters)
+
         self.sendMessage(halMessage.HalMessage(m_type = "new parameters",
-                                               data = {"parameters" : parameters.copy(),
-                                                       "is_edit" : is_edit}))
+                                               data = data))
 
     def handleResponses(self, message):
 
@@ -211,6 +261,9 @@ class Settings(halModule.HalModule):
 
             # Check if we got any errors.
             if message.hasErrors():
+
+                # We don't know what state the modules are in now.
+                self.applied_parameters = None
                 
                 # Create a message box with the first error.
                 msg = "New Parameters:\n\n"
@@ -278,6 +331,9 @@ class Settings(halModule.HalModule):
             self.view.copyDefaultParameters()
             self.view.markCurrentAsInitialized()
 
+            # At this point the current parameters are the initial parameters of the modules.
+            self.applied_parameters = self.view.getCurrentParameters().copy()
+
         elif message.isType("get parameters"):
             p = self.view.getParameters(message.getData()["index or name"])
             if p is None:
@@ -351,6 +407,9 @@ class Settings(halModule.HalModule):
 
     def updateComplete(self):
         self.setLockout(False)
+
+        # These are what all of the modules are now using.
+        self.applied_parameters = self.view.getCurrentParameters().copy()
         
         # Notify the editor, so that it can update based on the parameters
         # that were returned.
@@ -2,12 +2,23 @@
 """
 Analyze frames using QRunnables and QThreadPool.
 
+With the "processes" backend the QRunnables pass the frames to a
+pool of processes (in shared memory) for analysis. This avoids
+contention for the GIL, which limits how many frames the QRunnables
+can analyze in parallel.
+
 Hazen 05/17
 """
+import concurrent.futures
+import multiprocessing
+import numpy
+import sys
 import time
 
 from PyQt5 import QtCore
 
+import storm_control.sc_library.halExceptions as halExceptions
+
 import storm_control.hal4000.halLib.halModule as halModule
 import storm_control.hal4000.spotCounter.lmmObjectFinder as lmmObjectFinder
 
@@ -21,12 +32,17 @@ class AnalysisWorker(QtCore.QRunnable):
         self.aw_signaler = AnalysisWorkerSignaler()
         self.frame_analysis = None
         self.busy = False
+        self.object_finder = None
+
+    def cleanUp(self):
+        if self.object_finder is not None:
+            self.object_finder.cleanUp()
 
     def isBusy(self):
         return self.busy
         
     def run(self):
-        self.frame_analysis.analyzeImage()
+        self.frame_analysis.analyzeImage(object_finder = self.object_finder)
         self.aw_signaler.analysisDone.emit(self.frame_analysis)
         self.busy = False
         
@@ -34,6 +50,9 @@ class AnalysisWorker(QtCore.QRunnable):
         self.frame_analysis = frame_analysis
         self.busy = True
 
+    def setObjectFinder(self, object_finder):
+        self.object_finder = object_finder
+
 
 class AnalysisWorkerSignaler(QtCore.QObject):
     """
@@ -63,9 +82,31 @@ class FrameAnalysis(QtCore.QObject):
         self.x_locs = None
         self.y_locs = None
         
-    def analyzeImage(self):
-        [self.x_locs, self.y_locs, self.locs_count] = lmmObjectFinder.findObjects(self.frame,
-                                                                                  self.threshold)
+    def analyzeImage(self, object_finder = None):
+        """
+        object_finder - A ProcessObjectFinder, or None to find the
+                        objects in this thread.
+        """
+
+        #
+        # A peak has to be at least threshold above the pixels around it, so if the
+        # range of the image is less than this there are no peaks. Only do this if
+        # the image does not have any values that are negative as signed 16 bit
+        # integers, as this is how lmmObjectFinder treats the image.
+        #
+        [image_min, image_max] = self.frame.getStats().getMinMax()
+        if (image_max < 32768) and ((image_max - image_min) < self.threshold):
+            self.x_locs = numpy.zeros(0, dtype = numpy.float32)
+            self.y_locs = numpy.zeros(0, dtype = numpy.float32)
+            self.locs_count = 0
+            return
+        
+        if object_finder is None:
+            [self.x_locs, self.y_locs, self.locs_count] = lmmObjectFinder.findObjects(self.frame,
+                                                                                      self.threshold)
+        else:
+            [self.x_locs, self.y_locs, self.locs_count] = object_finder.findObjects(self.frame,
+                                                                                    self.threshold)
 
     def getCameraName(self):
         return self.camera_name
@@ -81,23 +122,76 @@ class FrameAnalysis(QtCore.QObject):
                 self.y_locs[:self.locs_count]]
         
 
+class ProcessObjectFinder(object):
+    """
+    Finds the objects in a frame using a process from a process pool.
+    The frame is copied to a shared memory buffer, so each of these
+    can only be used by one thread at a time.
+    """
+    def __init__(self, max_size = None, process_pool = None, **kwds):
+        super().__init__(**kwds)
+        self.process_pool = process_pool
+
+        # This needs Python 3.8 or later.
+        from multiprocessing import shared_memory
+
+        self.shm = shared_memory.SharedMemory(create = True, size = 2 * max(1, max_size))
+        self.np_data = numpy.ndarray((max(1, max_size),), dtype = numpy.uint16, buffer = self.shm.buf)
+
+    def cleanUp(self):
+        self.np_data = None
+        self.shm.close()
+        self.shm.unlink()
+
+    def findObjects(self, frame, threshold):
+        size = frame.image_x * frame.image_y
+        self.np_data[:size] = numpy.ravel(frame.getData())
+        future = self.process_pool.submit(lmmObjectFinder.findObjectsShared,
+                                          self.shm.name,
+                                          frame.image_x,
+                                          frame.image_y,
+                                          threshold)
+        return future.result()
+
+
 class SpotCounter(QtCore.QObject):
+    """
+    Analyzes the frames using up to max_threads AnalysisWorkers. Frames
+    that are larger than max_size pixels are not analyzed.
+
+    backend is either "threads", the objects are found in the
+    AnalysisWorker threads, or "processes", the objects are found
+    in a pool of max_threads processes.
+    """
     imageProcessed = QtCore.pyqtSignal(object)
 
-    def __init__(self, max_threads = None, max_size = 0, **kwds):
+    def __init__(self, backend = "threads", max_threads = None, max_size = 0, **kwds):
         super().__init__(**kwds)
 
         self.dropped = 0
         self.max_size = max_size
+        self.process_pool = None
         self.threadpool = halModule.threadpool
         self.total = 0
         self.workers = []
 
+        if (backend == "processes"):
+            if (sys.version_info < (3, 8)):
+                raise halExceptions.HalException("The 'processes' spot counter backend requires Python 3.8 or later")
+            self.process_pool = concurrent.futures.ProcessPoolExecutor(max_workers = max_threads,
+                                                                       mp_context = multiprocessing.get_context("spawn"),
+                                                                       initializer = lmmObjectFinder.initialize)
+        elif (backend != "threads"):
+            raise halExceptions.HalException("Unknown spot counter backend '" + backend + "'")
+
         # Create analysis workers.
         for i in range(max_threads):
             aw = AnalysisWorker()
             aw.setAutoDelete(False)
             aw.aw_signaler.analysisDone.connect(self.handleAnalysisDone)
+            if self.process_pool is not None:
+                aw.setObjectFinder(ProcessObjectFinder(max_size = max_size,
+                                                       process_pool = self.process_pool))
             self.workers.append(aw)
 
         # Initialize object finder.
@@ -115,6 +209,12 @@ class SpotCounter(QtCore.QObject):
                     break
             still_busy = all_busy
             time.sleep(0.1)
+
+        # Stop the analysis processes.
+        if self.process_pool is not None:
+            self.process_pool.shutdown()
+        for worker in self.workers:
+            worker.cleanUp()
         
         # Object finder cleanup.
         lmmObjectFinder.cleanUp()
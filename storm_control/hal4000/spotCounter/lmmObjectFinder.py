@@ -5,6 +5,14 @@ works by indentifying local maxima, then computing their first moment.
 
 Note that the maximum number of objects found per image is limited to 1000.
 
+findObjectsPy() is a numpy version of findObjects(), this is
+used if the C library is not available. It only checks the pixels
+that could be peaks, so findObjects() also uses it when there are
+few of these as it is then faster than the C library.
+
+findObjectsShared() finds the objects in an image that is in
+shared memory, this is used to find objects in another process.
+
 Hazen 09/13
 """
 
@@ -16,15 +24,43 @@ import sys
 
 import storm_control.c_libraries.loadclib as loadclib
 
-lmmoment = False
+import storm_control.hal4000.camera.frame as frame
+
+lmmoment = None
 max_locs = 1000
 
+# findObjects() uses the numpy object finder if less than this fraction of
+# the pixels in the image could be peaks.
+max_candidates = 0.02
+
+# The shared memory buffers that findObjectsShared() has attached to.
+shared_buffers = {}
+
+# This is the same as the peak array in LMMoment.c, the
+# peak boundary is 1 and the peak center is 2.
+peak = numpy.array([[0, 0, 0, 1, 1, 1, 0, 0, 0],
+                    [0, 0, 1, 2, 2, 2, 1, 0, 0],
+                    [0, 1, 2, 2, 2, 2, 2, 1, 0],
+                    [1, 2, 2, 2, 2, 2, 2, 2, 1],
+                    [1, 2, 2, 2, 2, 2, 2, 2, 1],
+                    [1, 2, 2, 2, 2, 2, 2, 2, 1],
+                    [0, 1, 2, 2, 2, 2, 2, 1, 0],
+                    [0, 0, 1, 2, 2, 2, 1, 0, 0],
+                    [0, 0, 0, 1, 1, 1, 0, 0, 0]])
+bdy_dx, bdy_dy = numpy.nonzero(peak == 1)
+bdy_dx -= 4
+bdy_dy -= 4
+cnt_dx, cnt_dy = numpy.nonzero(peak == 2)
+cnt_dx -= 4
+cnt_dy -= 4
+
 
 def cleanUp():
     """
     Called at program shutdown to free arrays allocated in C.
     """
-    lmmoment.cleanup()
+    if lmmoment is not None:
+        lmmoment.cleanup()
 
 
 def initialize():
@@ -34,7 +70,12 @@ def initialize():
     """
     
     global lmmoment
-    lmmoment = loadclib.loadCLibrary("LMMoment")
+    try:
+        lmmoment = loadclib.loadCLibrary("LMMoment")
+    except OSError:
+        print("LMMoment library not found, reverting to numpy.")
+        lmmoment = None
+        return
 
     lmmoment.initialize.argtypes = []
     lmmoment.cleanup.argtypes = []
@@ -48,10 +89,26 @@ def initialize():
     lmmoment.initialize()
 
 
+def frameImage(frame):
+    """
+    Returns the image in frame as a 2D array of signed 16 bit integers, as
+    this is how the C library treats it.
+    """
+    return numpy.reshape(frame.getData(), (frame.image_y, frame.image_x)).view(numpy.int16)
+
+
 def findObjects(frame, threshold):
     """
     Find the objects in the image.
     """
+    if lmmoment is None:
+        return findObjectsPy(frame, threshold)
+
+    image = frameImage(frame)
+    cutoff = peakCutoff(image, threshold)
+    if (numpy.count_nonzero(image >= cutoff) < max_candidates * image.size):
+        return findObjectsCandidates(image, threshold, *findCandidates(image, cutoff))
+    
     x = numpy.zeros((max_locs), dtype = numpy.float32)
     y = numpy.zeros((max_locs), dtype = numpy.float32)
     n = ctypes.c_int(max_locs)
@@ -65,6 +122,103 @@ def findObjects(frame, threshold):
     return [x, y, n.value]
 
 
+def peakCutoff(image, threshold):
+    """
+    A peak has to be at least threshold above the pixels on its
+    boundary, so only pixels that are at least this much above the
+    minimum of the image can be peaks.
+    """
+    return int(numpy.min(image)) + threshold
+
+
+def findCandidates(image, cutoff):
+    """
+    Returns the x and y indices of the pixels in image that could be
+    peaks, i.e. that are at least cutoff.
+    """
+    [size_x, size_y] = image.shape
+    bsize = 5
+
+    if (cutoff > 32767) or (size_x <= 2*bsize) or (size_y <= 2*bsize):
+        [mx, my] = [numpy.zeros(0, dtype = numpy.intp), numpy.zeros(0, dtype = numpy.intp)]
+    else:
+        [mx, my] = numpy.nonzero(image[bsize:size_x-bsize, bsize:size_y-bsize] >= cutoff)
+        mx += bsize
+        my += bsize
+    return [mx, my]
+
+
+def findObjectsCandidates(image, threshold, mx, my):
+    """
+    Find the objects in image, mx and my are the pixels that could be
+    peaks from findCandidates().
+    """
+    # Find the local maxima amongst these pixels. Ties are broken the same way as in isLocalMaxima().
+    cur = image[mx, my].astype(numpy.int32)
+
+    def shifted(dx, dy):
+        return image[mx + dx, my + dy]
+    is_max = (cur > shifted(-1, -1)) & (cur > shifted(-1, 0)) & (cur > shifted(-1, 1))
+    is_max &= (cur > shifted(0, -1)) & (cur >= shifted(0, 1))
+    is_max &= (cur > shifted(1, -1)) & (cur >= shifted(1, 0)) & (cur >= shifted(1, 1))
+    mx = mx[is_max]
+    my = my[is_max]
+    cur = cur[is_max]
+
+    # Check that the local maxima are peaks (isPeak()).
+    bdy = image[mx[:,None] + bdy_dx[None,:], my[:,None] + bdy_dy[None,:]].astype(numpy.int32)
+    bdy_sum = numpy.sum(bdy, axis = 1)
+    mean = numpy.sign(bdy_sum) * (numpy.abs(bdy_sum)//bdy_dx.size)
+    is_peak = numpy.all(cur[:,None] >= (bdy + threshold), axis = 1) & (mean > 0)
+
+    mx = mx[is_peak][:max_locs]
+    my = my[is_peak][:max_locs]
+    mean = mean[is_peak][:max_locs]
+
+    # Peak positions from the first moment (peakPosition()).
+    cnt = image[mx[:,None] + cnt_dx[None,:], my[:,None] + cnt_dy[None,:]].astype(numpy.int32) - mean[:,None]
+    cnt_sum = numpy.sum(cnt, axis = 1).astype(numpy.float32)
+    cnt_sumx = numpy.sum(cnt * cnt_dx[None,:], axis = 1).astype(numpy.float32)
+    cnt_sumy = numpy.sum(cnt * cnt_dy[None,:], axis = 1).astype(numpy.float32)
+
+    n = mx.size
+    x = numpy.zeros((max_locs), dtype = numpy.float32)
+    y = numpy.zeros((max_locs), dtype = numpy.float32)
+    valid = (cnt_sum > 0)
+    with numpy.errstate(divide = "ignore", invalid = "ignore"):
+        x[:n] = numpy.where(valid, my.astype(numpy.float32) + cnt_sumy/cnt_sum, -1.0)
+        y[:n] = numpy.where(valid, mx.astype(numpy.float32) + cnt_sumx/cnt_sum, -1.0)
+    return [x, y, n]
+
+
+def findObjectsPy(frame, threshold):
+    """
+    Find the objects in the image. This is a numpy version of
+    findObjects() that gives the same results.
+    """
+    image = frameImage(frame)
+    [mx, my] = findCandidates(image, peakCutoff(image, threshold))
+    return findObjectsCandidates(image, threshold, mx, my)
+
+
+def findObjectsShared(buffer_name, image_x, image_y, threshold):
+    """
+    Find the objects in an image that is stored in the shared memory
+    buffer buffer_name. Returns the x and y locations of the objects
+    and the number of objects.
+    """
+    if not buffer_name in shared_buffers:
+        # This needs Python 3.8 or later.
+        from multiprocessing import shared_memory
+        shared_buffers[buffer_name] = shared_memory.SharedMemory(name = buffer_name)
+    np_data = numpy.ndarray((image_x * image_y,),
+                            dtype = numpy.uint16,
+                            buffer = shared_buffers[buffer_name].buf)
+
+    [x, y, n] = findObjects(frame.Frame(np_data, 0, image_x, image_y, ""), threshold)
+    return [x[:n], y[:n], n]
+
+
 #
 # The MIT License
 #
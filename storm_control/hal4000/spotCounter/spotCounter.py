@@ -211,6 +211,14 @@ class SpotCounter(halModule.HalModule):
 
     def __init__(self, module_params = None, qt_settings = None, **kwds):
         super().__init__(**kwds)
+        self.message_types = ["changing parameters",
+                              "configuration",
+                              "configure1",
+                              "new parameters",
+                              "show",
+                              "start",
+                              "start film",
+                              "stop film"]
         self.analyzers = []
         self.basename = None
         self.feed_names = []
@@ -220,7 +228,8 @@ class SpotCounter(halModule.HalModule):
 
         configuration = module_params.get("configuration")
 
-        self.spot_counter = findSpots.SpotCounter(max_threads = configuration.get("max_threads"),
+        self.spot_counter = findSpots.SpotCounter(backend = configuration.get("backend", "threads"),
+                                                  max_threads = configuration.get("max_threads"),
                                                   max_size = configuration.get("max_size"))
 
         self.view = SpotCounterView(module_name = self.module_name,
@@ -15,6 +15,7 @@ import storm_control.hal4000.halLib.halDialog as halDialog
 import storm_control.hal4000.halLib.halMessage as halMessage
 import storm_control.hal4000.halLib.halMessageBox as halMessageBox
 import storm_control.hal4000.halLib.halModule as halModule
+import storm_control.hal4000.settings.settings as settings
 
 import storm_control.hal4000.qtdesigner.stage_ui as stageUi
 
@@ -246,6 +247,12 @@ class Stage(halModule.HalModule):
 
     def __init__(self, module_params = None, qt_settings = None, **kwds):
         super().__init__(**kwds)
+        self.message_types = ["change directory",
+                              "configure1",
+                              "new parameters",
+                              "show",
+                              "start",
+                              "stop film"]
 
         self.stage_fn_name = module_params.get("configuration.stage_functionality")
         
@@ -284,7 +291,8 @@ class Stage(halModule.HalModule):
             p = message.getData()["parameters"]
             message.addResponse(halMessage.HalMessageResponse(source = self.module_name,
                                                               data = {"old parameters" : self.view.getParameters().copy()}))
-            self.view.newParameters(p.get(self.module_name))
+            if settings.parametersChanged(message, self.module_name, self.view.getParameters()):
+                self.view.newParameters(p.get(self.module_name))
             message.addResponse(halMessage.HalMessageResponse(source = self.module_name,
                                                               data = {"new parameters" : self.view.getParameters()}))
             
@@ -5,6 +5,7 @@ Handles remote control (via TCP/IP of the data collection program).
 Hazen 05/17
 """
 
+import collections
 import os
 import warnings
 from PyQt5 import QtCore
@@ -98,6 +99,10 @@ class TCPAction(QtCore.QObject):
         return False
         
     def sendResponse(self, server):
+        """
+        server is anything with a sendMessage() method, usually this
+        is the Controller.
+        """
         if not self.was_handled:
             warnings.warn("No response to '" + self.tcp_message.getType() + "'")
             self.tcp_message.setError(True, "This message was not handled.")
@@ -113,6 +118,7 @@ class TCPActionGetMovieStats(TCPAction):
         super().__init__(**kwds)
         self.hal_message = halMessage.HalMessage(m_type = "get parameters",
                                                  data = {"index or name" : self.tcp_message.getData("parameters")})
+        self.parameters = None
 
     def handleResponses(self, message):
 
@@ -132,11 +138,11 @@ class TCPActionGetMovieStats(TCPAction):
             self.was_handled = True
             return True
         
-        parameters = responses[0].getData()["parameters"]
+        self.parameters = responses[0].getData()["parameters"]
 
         # Check if the parameters are initialized.
-        if parameters.get("initialized", False):
-            calculateMovieStats(self.tcp_message, parameters)
+        if self.parameters.get("initialized", False):
+            calculateMovieStats(self.tcp_message, self.parameters)
             self.was_handled = True
             return True
         else:
@@ -145,10 +151,13 @@ class TCPActionGetMovieStats(TCPAction):
             self.actionMessage.emit(msg)
             return False
 
+    def getData(self):
+        return {"movie parameters" : self.parameters}
+
     def processMessage(self, message):
         if message.isType("updated parameters"):
-            parameters = message.getData()["parameters"]
-            calculateMovieStats(self.tcp_message, parameters)
+            self.parameters = message.getData()["parameters"]
+            calculateMovieStats(self.tcp_message, self.parameters)
             self.was_handled = True
             return True
         return False
@@ -342,6 +351,57 @@ class TCPActionTakeMovie(TCPAction):
         return False    
 
     
+class TCPBatch(object):
+    """
+    A 'Validate Sequence' TCP message. This contains a list of TCP messages
+    that are all handled in test mode, and the response 'results' is a list
+    of the response messages in the same order. This is used by Dave to
+    validate a sequence with a few TCP messages instead of one TCP message
+    for every action in the sequence.
+
+    The parameters that are looked up while handling the messages are
+    cached by name so that we only have to ask HAL for them once.
+    """
+    def __init__(self, tcp_message = None, **kwds):
+        super().__init__(**kwds)
+        self.parameters = {}
+        self.results = []
+        self.tcp_message = tcp_message
+        self.tcp_messages = []
+        for json_dict in self.tcp_message.getData("messages", []):
+            message = tcpMessage.TCPMessage.fromDict(json_dict)
+            message.setTestMode(True)
+            self.tcp_messages.append(message)
+
+    def addParameters(self, name_or_index, parameters):
+        self.parameters[name_or_index] = parameters
+
+    def addResult(self, tcp_message):
+        """
+        Returns True if tcp_message is the next message in this batch.
+        """
+        if self.isDone() or (tcp_message is not self.tcp_messages[len(self.results)]):
+            return False
+        self.results.append(tcp_message.toDict())
+        return True
+
+    def getParameters(self, name_or_index):
+        """
+        Returns the cached parameters, or None.
+        """
+        return self.parameters.get(name_or_index)
+
+    def getTCPMessage(self):
+        self.tcp_message.addResponse("results", self.results)
+        return self.tcp_message
+
+    def getTCPMessages(self):
+        return self.tcp_messages
+
+    def isDone(self):
+        return (len(self.results) == len(self.tcp_messages))
+
+
 class Controller(QtCore.QObject):
     """
     This is the interface between HAL and a TCP client such as Dave. Most messages
@@ -368,8 +428,18 @@ class Controller(QtCore.QObject):
     4. 'Take Movie'
     In this sequence 1 and 2 can happen in parallel.
 
-    Note also the expectation that the TCP client does not send another message
-    until it gets a response to the first message.
+    TCP clients can send several messages without waiting for the responses
+    (pipelining). The messages are handled in the order in which they arrive
+    and the responses are sent as they complete, so the client should use the
+    message ID to match the responses with its requests. Messages that arrive
+    while an action is in progress are queued until the action completes.
+
+    The 'Validate Sequence' message validates a list of TCP messages
+    with a single response, see TCPBatch.
+
+    If the TCP client disconnects while an action is in progress the
+    action is allowed to finish, but there is no response. Messages from
+    the next client are queued until the action finishes.
     """
     controlAction = QtCore.pyqtSignal(object)
     controlMessage = QtCore.pyqtSignal(object)
@@ -377,8 +447,12 @@ class Controller(QtCore.QObject):
     
     def __init__(self, parallel_mode = None, server = None, verbose = True, **kwds):
         super().__init__(**kwds)
+        self.batch = None
+        self.current_action = None
+        self.lost_action = None
         self.parallel_mode = None
         self.server = server
+        self.tcp_messages = collections.deque()
         self.test_directory = None
         self.test_parameters = None
         self.verbose = verbose
@@ -391,39 +465,72 @@ class Controller(QtCore.QObject):
         """
         This is called when an action completes.
         """
+        self.current_action = None
+        
         data = tcp_action.getData()
         if "parameters" in data:
             self.test_parameters = data["parameters"]
-        tcp_action.sendResponse(self.server)
+
+        # The client that sent this message has disconnected.
+        if (tcp_action is self.lost_action):
+            self.lost_action = None
+            
+        else:
+            # Cache the parameters for the rest of the batch.
+            if self.batch is not None:
+                for key in ["movie parameters", "parameters"]:
+                    if data.get(key) is not None:
+                        self.batch.addParameters(tcp_action.tcp_message.getData("parameters"), data[key])
+        
+            tcp_action.sendResponse(self)
+
+        self.nextMessage()
 
     def cleanUp(self):
         self.server.close()
+
+    def emitAction(self, action):
+        self.current_action = action
+        self.controlAction.emit(action)
         
     def handleLostConnection(self):
+        self.batch = None
+        self.lost_action = self.current_action
+        self.tcp_messages.clear()
         self.gotConnection.emit(False)
 
     def handleMessageReceived(self, tcp_message):
         """
-        TCP message handling.
+        Queue TCP messages and handle them in order.
         """
         if self.verbose:
             print(">TCP message received:")
             print(tcp_message)
             print("")
 
+        self.tcp_messages.append(tcp_message)
+        self.nextMessage()
+
+    def handleNewConnection(self):
+        self.gotConnection.emit(True)
+
+    def handleTCPMessage(self, tcp_message):
+        """
+        TCP message handling.
+        """
         if tcp_message.isType('Check Focus Lock'):
             # This is supposed to ensure that everything else, like stage moves is complete.
             self.controlMessage.emit(halMessage.SyncMessage())
             
             action = TCPAction(tcp_message = tcp_message)
-            self.controlAction.emit(action)
+            self.emitAction(action)
 
         elif tcp_message.isType('Find Sum'):
             # This is supposed to ensure that everything else, like stage moves is complete.
             self.controlMessage.emit(halMessage.SyncMessage())
             
             action = TCPAction(tcp_message = tcp_message)
-            self.controlAction.emit(action)            
+            self.emitAction(action)
                 
         elif tcp_message.isType("Set Directory"):
             warnings.warn("The 'Set Directory' message is deprecated.")
@@ -441,23 +548,29 @@ class Controller(QtCore.QObject):
                     #
                     self.controlMessage.emit(halMessage.HalMessage(m_type = "change directory",
                                                                    data = {"directory" : directory},
-                                                                   finalizer = lambda : self.server.sendMessage(tcp_message)))
+                                                                   finalizer = lambda : self.sendMessage(tcp_message)))
                     return
-            self.server.sendMessage(tcp_message)
+            self.sendMessage(tcp_message)
 
         elif tcp_message.isType("Set Parameters"):
             if tcp_message.isTest():
+                if self.batch is not None:
+                    parameters = self.batch.getParameters(tcp_message.getData("parameters"))
+                    if parameters is not None:
+                        self.test_parameters = parameters
+                        self.sendMessage(tcp_message)
+                        return
                 action = TCPActionGetParameters(tcp_message = tcp_message)
             else:
                 action = TCPActionSetParameters(tcp_message = tcp_message)
-            self.controlAction.emit(action)
+            self.emitAction(action)
                     
         elif tcp_message.isType("Take Movie"):
 
             # Check that movie length is valid.
             if (tcp_message.getData("length") is None) or (tcp_message.getData("length") < 1):
-                tcp_message.setError(True, str(message.getData("length")) + " is an invalid movie length.")
-                self.server.sendMessage(tcp_message)
+                tcp_message.setError(True, str(tcp_message.getData("length")) + " is an invalid movie length.")
+                self.sendMessage(tcp_message)
                 return
 
             # Check that the requested directory (if any) exists.
@@ -465,7 +578,7 @@ class Controller(QtCore.QObject):
                 directory = tcp_message.getData("directory")
                 if not os.path.exists(directory):
                     tcp_message.setError(True, "The directory '" + directory + "' does not exist.")
-                    self.server.sendMessage(tcp_message)
+                    self.sendMessage(tcp_message)
                     return
                     
             # Some messy logic here to check if we will over-write a existing films? For now, just
@@ -478,7 +591,7 @@ class Controller(QtCore.QObject):
                 filename = os.path.join(directory, tcp_message.getData("name")) + ".xml"
                 if os.path.exists(filename):
                     tcp_message.setError(True, "The movie file '" + filename + "' already exists.")
-                    self.server.sendMessage(tcp_message)
+                    self.sendMessage(tcp_message)
                     return
 
             # More messy logic here to return film size, time, etc..
@@ -486,29 +599,72 @@ class Controller(QtCore.QObject):
                 
                 # If the movie has parameters specified, we'll request them specially.
                 if tcp_message.getData("parameters") is not None:
-                    action = TCPActionGetMovieStats(tcp_message = tcp_message)
-                    self.controlAction.emit(action)
+                    parameters = None
+                    if self.batch is not None:
+                        parameters = self.batch.getParameters(tcp_message.getData("parameters"))
+                    if parameters is not None:
+                        calculateMovieStats(tcp_message, parameters)
+                        self.sendMessage(tcp_message)
+                    else:
+                        action = TCPActionGetMovieStats(tcp_message = tcp_message)
+                        self.emitAction(action)
 
                 # Otherwise calculate based on the current parameters.
                 else:
                     calculateMovieStats(tcp_message, self.test_parameters)
-                    self.server.sendMessage(tcp_message)                    
+                    self.sendMessage(tcp_message)                    
             else:
                 action = TCPActionTakeMovie(tcp_message = tcp_message)
-                self.controlAction.emit(action)
+                self.emitAction(action)
+
+        elif tcp_message.isType("Validate Sequence"):
+            if self.batch is not None:
+                tcp_message.setError(True, "'Validate Sequence' messages cannot be nested.")
+                self.sendMessage(tcp_message)
+                return
+
+            #
+            # The messages in the batch go to the front of the queue, so they
+            # are handled before any other messages that the client has sent.
+            #
+            self.batch = TCPBatch(tcp_message = tcp_message)
+            if self.batch.isDone():
+                self.batch = None
+                tcp_message.addResponse("results", [])
+                self.sendMessage(tcp_message)
+            else:
+                self.tcp_messages.extendleft(reversed(self.batch.getTCPMessages()))
 
         else:
             if tcp_message.isTest() or (not self.parallel_mode):
                 action = TCPAction(tcp_message = tcp_message)
-                self.controlAction.emit(action)
+                self.emitAction(action)
             else:
                 msg = halMessage.HalMessage(m_type = "tcp message",
                                             data = {"tcp message" : tcp_message})
                 self.controlMessage.emit(msg)
-                self.server.sendMessage(tcp_message)
-                
-    def handleNewConnection(self):
-        self.gotConnection.emit(True)
+                self.sendMessage(tcp_message)
+
+    def nextMessage(self):
+        """
+        Handle queued TCP messages until we get to one that
+        requires an action.
+        """
+        while (self.current_action is None) and (len(self.tcp_messages) > 0):
+            self.handleTCPMessage(self.tcp_messages.popleft())
+
+    def sendMessage(self, tcp_message):
+        """
+        Send the response to a TCP message, or add it to the
+        results of the current batch.
+        """
+        if (self.batch is not None) and self.batch.addResult(tcp_message):
+            if self.batch.isDone():
+                batch = self.batch
+                self.batch = None
+                self.server.sendMessage(batch.getTCPMessage())
+        else:
+            self.server.sendMessage(tcp_message)
 
     def setDirectory(self, directory):
         self.test_directory = directory
@@ -549,9 +705,14 @@ class TCPControl(halModule.HalModule):
         self.control.cleanUp()
 
     def finalizeControlAction(self):
-        self.control.actionDone(self.control_action)
+        #
+        # This will start the next action if the TCP client
+        # has sent more messages, so clean up first.
+        #
+        control_action = self.control_action
         self.control_action.actionMessage.disconnect(self.sendMessage)
         self.control_action = None
+        self.control.actionDone(control_action)
         
     def handleControlAction(self, action):
         #
@@ -577,15 +738,9 @@ class TCPControl(halModule.HalModule):
                                                    data = {"properties" : {"connected" : True}}))
         else:
             #
-            # If we are still processing a message just clean it up and
-            # throw it away. Not sure if this is the right thing, but if
-            # the Dave / Steve disconnects and reconnects then we are
-            # going to have issues if we're still processing an action.
+            # If we are still processing an action it is allowed to finish,
+            # the controller will not send a response.
             #
-            if self.control_action is not None:
-                self.control_action.actionMessage.disconnect(self.sendMessage)
-                self.control_action = None
-                
             self.sendMessage(halMessage.HalMessage(m_type = "configuration",
                                                    data = {"properties" : {"connected" : False}}))
 
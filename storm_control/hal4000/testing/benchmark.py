@@ -0,0 +1,467 @@
+#!/usr/bin/env python
+"""
+Benchmarking of HAL's frame path, camera -> feeds -> image writers,
+display and spot counter.
+
+This runs HAL (headless) with an emulated camera that runs at a fixed
+frame rate and a testing module that records a fixed length film. The
+testing module measures how long it takes each frame to get through
+each stage of the frame path and saves the results as JSON.
+
+Usage:
+  python benchmark.py --frames 1000 --size 512 512 --frame_rate 200 --results results.json
+
+The results are:
+  "display" - The number of frames that the display rendered and the
+              number that it skipped because a newer frame arrived
+              before they could be rendered.
+  "dropped" - The number of frames that were dropped (or never displayed)
+              by each stage.
+  "fps" - The rate at which the frames arrived in HAL's main thread.
+  "frames" - The number of frames that were requested and received.
+  "latency_ms" - The latency percentiles for each stage. For the camera
+                 this is the time between the frame being created and it
+                 reaching the main thread. For the other stages it is the
+                 time between the camera frame reaching the main thread
+                 and the stage being done with it.
+  "peak_rss_mb" - The peak memory usage of HAL.
+  "settings" - The benchmark settings.
+"""
+import argparse
+import json
+import numpy
+import os
+import sys
+import tempfile
+import time
+
+from xml.etree import ElementTree
+
+from PyQt5 import QtWidgets
+
+# This is not available on Windows.
+resource = None
+try:
+    import resource
+except ModuleNotFoundError as mnfe:
+    pass
+
+import storm_control.sc_library.hdebug as hdebug
+import storm_control.sc_library.parameters as params
+
+import storm_control.hal4000.camera.noneCameraControl as noneCameraControl
+import storm_control.hal4000.halLib.halMessage as halMessage
+import storm_control.hal4000.testing.testActions as testActions
+import storm_control.hal4000.testing.testing as testing
+
+
+def latencyStats(latencies):
+    """
+    Returns a dictionary with the statistics of a list of latencies in
+    seconds. The statistics are in milliseconds.
+    """
+    if (len(latencies) == 0):
+        return {"n" : 0}
+
+    ms = 1000.0 * numpy.array(latencies)
+    [p50, p90, p99] = numpy.percentile(ms, [50, 90, 99])
+    return {"max" : float(numpy.max(ms)),
+            "mean" : float(numpy.mean(ms)),
+            "n" : int(ms.size),
+            "p50" : float(p50),
+            "p90" : float(p90),
+            "p99" : float(p99)}
+
+def peakRSS():
+    """
+    Returns the peak resident set size of this process in MB.
+    """
+    if resource is None:
+        return None
+
+    # Linux reports this in KB, OS-X in bytes.
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if (sys.platform == "darwin"):
+        return max_rss/(1024.0 * 1024.0)
+    else:
+        return max_rss/1024.0
+
+
+class BenchmarkCameraControl(noneCameraControl.NoneCameraControl):
+    """
+    An emulated camera that runs at a fixed frame rate (if it can) and
+    that time stamps every frame.
+
+    The chip size is set by 'chip_x' and 'chip_y' and the frame rate
+    by 'frame_rate' in the camera's configuration parameters.
+    """
+    def __init__(self, config = None, **kwds):
+        kwds["config"] = config
+        super().__init__(**kwds)
+        self.frame_rate = config.get("frame_rate", 100.0)
+
+        chip_x = config.get("chip_x", 512)
+        chip_y = config.get("chip_y", 512)
+        for pname in ["x_start", "x_end"]:
+            self.parameters.getp(pname).setMaximum(chip_x)
+        for pname in ["y_start", "y_end"]:
+            self.parameters.getp(pname).setMaximum(chip_y)
+
+        self.parameters.setv("x_end", chip_x)
+        self.parameters.setv("y_end", chip_y)
+        self.parameters.setv("x_chip", chip_x)
+        self.parameters.setv("y_chip", chip_y)
+
+        self.newParameters(self.parameters, initialization = True)
+
+    def run(self):
+        self.running = True
+        self.thread_started = True
+
+        period = 1.0/self.frame_rate
+        next_time = time.perf_counter()
+        while(self.running):
+            aframe = self.makeFrame()
+
+            if self.film_length is not None:
+                if (self.frame_number == self.film_length):
+                    self.running = False
+
+            aframe.benchmark_time = time.perf_counter()
+            self.newData.emit([aframe])
+
+            # Sleep until it is time for the next frame. If we are running
+            # late we don't sleep at all in order to try and catch up.
+            next_time += period
+            if self.running:
+                delay = next_time - time.perf_counter()
+                if (delay > 0.0):
+                    time.sleep(delay)
+
+
+class Benchmark(testing.Testing):
+    """
+    Records a fixed length film and measures how long each stage
+    of the frame path takes.
+
+    This assumes that there is only a single camera.
+    """
+    def __init__(self, module_params = None, qt_settings = None, **kwds):
+        super().__init__(module_params = module_params, qt_settings = qt_settings, **kwds)
+
+        configuration = module_params.get("configuration")
+
+        self.camera_names = []
+        self.camera_times = {}
+        self.display_fn = None
+        self.display_stats = {}
+        self.displayed = {}
+        self.feed_fns = []
+        self.filming = False
+        self.frames = configuration.get("frames")
+        self.latencies = {}
+        self.results_file = configuration.get("results_file")
+        self.settings = {}
+        self.spot_counter = None
+        self.spot_counter_dropped = 0
+        self.writer_dropped = 0
+        self.writers = []
+
+        for pname in configuration.getAttrs():
+            self.settings[pname] = configuration.get(pname)
+
+        self.test_actions = [testActions.SetDirectory(directory = configuration.get("directory"))]
+        if configuration.has("parameters_file"):
+            self.test_actions.extend([testActions.LoadParameters(filename = configuration.get("parameters_file")),
+                                      testActions.SetParameters(p_name = 0)])
+        self.test_actions.extend([testActions.Timer(timeout = 500),
+                                  testActions.Record(filename = "benchmark", length = self.frames),
+                                  testActions.Timer(timeout = 200)])
+
+    def addLatency(self, stage, latency):
+        if not stage in self.latencies:
+            self.latencies[stage] = []
+        self.latencies[stage].append(latency)
+
+    def getResults(self):
+        results = {"display" : self.display_stats,
+                   "dropped" : {},
+                   "fps" : 0.0,
+                   "frames" : {"camera" : len(self.camera_times),
+                               "requested" : self.frames},
+                   "latency_ms" : {},
+                   "peak_rss_mb" : peakRSS(),
+                   "settings" : self.settings}
+
+        if (len(self.camera_times) > 1):
+            times = numpy.array(list(self.camera_times.values()))
+            results["fps"] = float((times.size - 1)/(numpy.max(times) - numpy.min(times)))
+
+        for stage in sorted(self.latencies):
+            results["latency_ms"][stage] = latencyStats(self.latencies[stage])
+
+        results["dropped"]["camera"] = self.frames - len(self.camera_times)
+        for name in sorted(self.displayed):
+            results["dropped"]["display " + name] = len(self.camera_times) - len(self.displayed[name])
+        if self.spot_counter is not None:
+            results["dropped"]["spot counter"] = self.spot_counter_dropped
+        results["dropped"]["writers"] = self.writer_dropped
+        return results
+
+    def handleActionDone(self):
+        if (self.action_counter == (self.reps * len(self.test_actions))):
+            self.saveResults()
+        super().handleActionDone()
+
+    def handleFrameDisplayed(self, frame):
+        if self.filming and frame.frame_number in self.camera_times:
+            if not frame.which_camera in self.displayed:
+                self.displayed[frame.which_camera] = set()
+
+            # The display may show the same frame several times.
+            if not frame.frame_number in self.displayed[frame.which_camera]:
+                self.displayed[frame.which_camera].add(frame.frame_number)
+                self.addLatency("display",
+                                time.perf_counter() - self.camera_times[frame.frame_number])
+
+    def handleImageProcessed(self, frame_analysis):
+        if self.filming and frame_analysis.getFrameNumber() in self.camera_times:
+            self.addLatency("spot counter",
+                            time.perf_counter() - self.camera_times[frame_analysis.getFrameNumber()])
+
+    def handleNewFrame(self, frame):
+        if not self.filming:
+            return
+
+        now = time.perf_counter()
+        if frame.which_camera in self.camera_names:
+            self.camera_times[frame.frame_number] = now
+            if hasattr(frame, "benchmark_time"):
+                self.addLatency(frame.which_camera, now - frame.benchmark_time)
+        elif frame.frame_number in self.camera_times:
+            self.addLatency("feed " + frame.which_camera,
+                            now - self.camera_times[frame.frame_number])
+
+    def handleResponses(self, message):
+        if message.isType("get functionality") and message.hasResponses():
+            fn = message.getResponses()[0].getData()["functionality"]
+            if (message.getData()["extra data"] == "benchmark_display"):
+                self.display_fn = fn
+                self.display_fn.frameDisplayed.connect(self.handleFrameDisplayed)
+            else:
+                if fn.isCamera():
+                    self.camera_names.append(fn.getCameraName())
+                fn.newFrame.connect(self.handleNewFrame)
+                self.feed_fns.append(fn)
+        else:
+            super().handleResponses(message)
+
+    def processMessage(self, message):
+
+        if message.isType("configuration"):
+            if message.sourceIs("feeds"):
+                for fn in self.feed_fns:
+                    fn.newFrame.disconnect(self.handleNewFrame)
+                self.camera_names = []
+                self.feed_fns = []
+                for name in message.getData()["properties"]["feed names"]:
+                    self.sendMessage(halMessage.HalMessage(m_type = "get functionality",
+                                                           data = {"name" : name,
+                                                                   "extra data" : "benchmark_feed"}))
+
+        elif message.isType("configure2"):
+            self.sendMessage(halMessage.HalMessage(m_type = "get functionality",
+                                                   data = {"name" : "display",
+                                                           "extra data" : "benchmark_display"}))
+
+        elif message.isType("start film"):
+            self.filming = True
+            self.camera_times = {}
+            self.display_stats = {}
+            self.displayed = {}
+            self.latencies = {}
+            if self.display_fn is not None:
+                self.display_fn.resetRenderStats()
+
+            # The image writers have been created by the time we get this message.
+            self.writers = self.all_modules["film"].writers
+            for writer in self.writers:
+                writer.recordLatencies()
+
+            if "spotcounter" in self.all_modules:
+                self.spot_counter = self.all_modules["spotcounter"].spot_counter
+                self.spot_counter.imageProcessed.connect(self.handleImageProcessed)
+                self.spot_counter_dropped = self.spot_counter.dropped
+
+        elif message.isType("stop film"):
+            self.filming = False
+            if self.display_fn is not None:
+                self.display_stats = self.display_fn.getRenderStats()
+
+            # The image writers are closed by the time we get this message.
+            self.writer_dropped = 0
+            for writer in self.writers:
+                self.writer_dropped += writer.getStats()["dropped"]
+                self.latencies["writer " + os.path.basename(writer.filename)] = writer.getLatencies()
+            self.writers = []
+
+            if self.spot_counter is not None:
+                self.spot_counter.imageProcessed.disconnect(self.handleImageProcessed)
+                self.spot_counter_dropped = self.spot_counter.dropped - self.spot_counter_dropped
+
+        super().processMessage(message)
+
+    def saveResults(self):
+        with open(self.results_file, "w") as fp:
+            json.dump(self.getResults(), fp, indent = 2, sort_keys = True)
+
+
+def runBenchmark(config_xml = None,
+                 directory = None,
+                 filetype = ".dax",
+                 frame_rate = 100.0,
+                 frames = 100,
+                 parameters_file = None,
+                 results_file = None,
+                 show_gui = False,
+                 writer_queue_size = 0,
+                 x_pixels = 512,
+                 y_pixels = 512):
+    """
+    Run the benchmark, returns the results as a dictionary.
+
+    config_xml - The HAL configuration to use, this must use a
+                 BenchmarkCameraControl camera.
+    directory - The directory to save the film (and logs) in.
+    filetype - The movie format.
+    frame_rate - The camera frame rate.
+    frames - The length of the film.
+    parameters_file - A parameters file to load before filming, for
+                      example to add some feeds.
+    results_file - The name of the JSON file to save the results in.
+    show_gui - Show HAL's GUI.
+    writer_queue_size - Film 'writer_queue_size' setting.
+    x_pixels, y_pixels - The size of the camera frames.
+    """
+    # Import here as this module is also loaded by HAL.
+    import storm_control.hal4000.hal4000 as hal4000
+
+    if config_xml is None:
+        config_xml = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                  "../../test/hal/none_benchmark_config.xml")
+    if directory is None:
+        directory = tempfile.mkdtemp()
+    directory = os.path.join(directory, "")
+    if results_file is None:
+        results_file = os.path.join(directory, "benchmark.json")
+
+    # Create the parameters file that sets the film type, this also
+    # includes the contents of parameters_file.
+    if parameters_file is not None:
+        xml = ElementTree.parse(parameters_file).getroot()
+    else:
+        xml = ElementTree.Element("settings")
+    film = xml.find("film")
+    if film is None:
+        film = ElementTree.SubElement(xml, "film")
+    ft = ElementTree.SubElement(film, "filetype", {"type" : "string"})
+    ft.text = filetype
+    benchmark_parameters_file = os.path.join(directory, "benchmark_parameters.xml")
+    ElementTree.ElementTree(xml).write(benchmark_parameters_file)
+
+    app = QtWidgets.QApplication(sys.argv)
+
+    config = params.config(config_xml)
+    config.set("directory", directory)
+    config.set("modules.camera1.camera.parameters.chip_x", x_pixels)
+    config.set("modules.camera1.camera.parameters.chip_y", y_pixels)
+    config.set("modules.camera1.camera.parameters.frame_rate", float(frame_rate))
+    config.set("modules.film.configuration.writer_queue_size", writer_queue_size)
+
+    # Add the benchmark module.
+    c_test = config.addSubSection("modules.testing")
+    c_test.add("class_name", "Benchmark")
+    c_test.add("module_name", "storm_control.hal4000.testing.benchmark")
+    c_test.add("configuration.directory", directory)
+    c_test.add("configuration.filetype", filetype)
+    c_test.add("configuration.frame_rate", float(frame_rate))
+    c_test.add("configuration.frames", frames)
+    c_test.add("configuration.parameters_file", benchmark_parameters_file)
+    c_test.add("configuration.results_file", results_file)
+    c_test.add("configuration.writer_queue_size", writer_queue_size)
+    c_test.add("configuration.x_pixels", x_pixels)
+    c_test.add("configuration.y_pixels", y_pixels)
+
+    hdebug.startLogging(directory, "hal4000")
+
+    hal = hal4000.HalCore(config = config,
+                          testing_mode = True,
+                          show_gui = show_gui)
+    app.exec_()
+    app = None
+
+    with open(results_file) as fp:
+        return json.load(fp)
+
+
+if (__name__ == "__main__"):
+
+    parser = argparse.ArgumentParser(description = 'Benchmark the HAL frame path.')
+
+    parser.add_argument('--config', dest='config', type=str, required=False, default=None,
+                        help = "The HAL configuration file, the default is test/hal/none_benchmark_config.xml.")
+    parser.add_argument('--directory', dest='directory', type=str, required=False, default=None,
+                        help = "The directory to save the film in, the default is a temporary directory.")
+    parser.add_argument('--filetype', dest='filetype', type=str, required=False, default=".dax",
+                        help = "The movie format, the default is .dax.")
+    parser.add_argument('--frame_rate', dest='frame_rate', type=float, required=False, default=100.0,
+                        help = "The camera frame rate, the default is 100.")
+    parser.add_argument('--frames', dest='frames', type=int, required=False, default=100,
+                        help = "The length of the film, the default is 100.")
+    parser.add_argument('--parameters', dest='parameters', type=str, required=False, default=None,
+                        help = "A parameters file to use, for example to add feeds.")
+    parser.add_argument('--results', dest='results', type=str, required=False, default=None,
+                        help = "The name of the JSON file to save the results in.")
+    parser.add_argument('--size', dest='size', type=int, nargs=2, required=False, default=[512, 512],
+                        help = "The camera frame size (x, y), the default is 512 x 512.")
+    parser.add_argument('--writer_queue_size', dest='writer_queue_size', type=int, required=False, default=0,
+                        help = "The film writer queue size, the default is 0 (not threaded).")
+
+    args = parser.parse_args()
+
+    results = runBenchmark(config_xml = args.config,
+                           directory = args.directory,
+                           filetype = args.filetype,
+                           frame_rate = args.frame_rate,
+                           frames = args.frames,
+                           parameters_file = args.parameters,
+                           results_file = args.results,
+                           writer_queue_size = args.writer_queue_size,
+                           x_pixels = args.size[0],
+                           y_pixels = args.size[1])
+    print(json.dumps(results, indent = 2, sort_keys = True))
+
+
+#
+# The MIT License
+#
+# Copyright (c) 2026 Zhuang Lab, Harvard University
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
@@ -25,6 +25,12 @@ class TestActionTCP(testActions.TestAction):
         message is as expected.
         """
         pass
+
+    def getTCPMessages(self):
+        """
+        The TCP message(s) to send to HAL.
+        """
+        return [self.tcp_message]
         
     def handleMessageReceived(self, tcp_message):
         """
@@ -67,6 +73,17 @@ class FindSum(TestActionTCP):
                                                  test_mode = self.test_mode)
 
         
+class GetMessageMetrics(TestActionTCP):
+    """
+    Query HAL for the message timing metrics.
+    """
+    def __init__(self, module = None, **kwds):
+        super().__init__(**kwds)
+        self.tcp_message = tcpMessage.TCPMessage(message_type = "Get Message Metrics",
+                                                 message_data = {"module" : module},
+                                                 test_mode = self.test_mode)
+
+
 class GetMosaicSettings(TestActionTCP):
     """
     Query HAL for the current mosaic settings.
@@ -87,6 +104,17 @@ class GetObjective(TestActionTCP):
                                                  test_mode = self.test_mode)
 
         
+class GetSnapshot(TestActionTCP):
+    """
+    Get the next frame from a camera (or feed).
+    """
+    def __init__(self, camera = "camera1", **kwds):
+        super().__init__(**kwds)
+        self.tcp_message = tcpMessage.TCPMessage(message_type = "Get Snapshot",
+                                                 message_data = {"camera" : camera},
+                                                 test_mode = self.test_mode)
+
+
 class GetStagePosition(TestActionTCP):
     """
     Query HAL for the current stage position.
@@ -119,6 +147,37 @@ class NoSuchMessage(TestActionTCP):
                                                  test_mode = self.test_mode)
 
         
+class Pipeline(TestActionTCP):
+    """
+    Send the TCP messages of several actions to HAL without waiting
+    for the responses. The responses are matched to the actions using
+    the message ID, and this is complete when all of the actions have
+    gotten a response.
+    """
+    def __init__(self, actions = None, **kwds):
+        super().__init__(**kwds)
+        self.actions = {}
+        self.tcp_messages = []
+        for action in actions:
+            self.actions[action.tcp_message.getID()] = action
+            self.tcp_messages.append(action.tcp_message)
+
+        self.responses = []
+
+    def getTCPMessages(self):
+        return self.tcp_messages
+
+    def handleMessageReceived(self, tcp_message):
+        self.responses.append(tcp_message.getID())
+        self.actions[tcp_message.getID()].checkMessage(tcp_message)
+        if (len(self.responses) == len(self.tcp_messages)):
+            self.actionDone.emit()
+
+    def start(self):
+        super().start()
+        self.responses = []
+
+        
 class SetFocusLockMode(TestActionTCP):
     """
     Technically this is only supposed to be used for testing.
@@ -194,3 +253,25 @@ class TakeMovie(TestActionTCP):
         self.tcp_message = tcpMessage.TCPMessage(message_type = "Take Movie",
                                                  message_data = data_dict,
                                                  test_mode = self.test_mode)
+
+
+class ValidateSequence(TestActionTCP):
+    """
+    Validate the TCP messages of several actions with a single TCP
+    message. The results are checked by the actions.
+    """
+    def __init__(self, actions = None, **kwds):
+        super().__init__(**kwds)
+        self.actions = actions
+        messages = []
+        for action in self.actions:
+            messages.append(action.tcp_message.toDict())
+        self.tcp_message = tcpMessage.TCPMessage(message_type = "Validate Sequence",
+                                                 message_data = {"messages" : messages},
+                                                 test_mode = True)
+
+    def checkMessage(self, tcp_message):
+        results = tcp_message.getResponse("results")
+        assert (len(results) == len(self.actions))
+        for action, result in zip(self.actions, results):
+            action.checkMessage(tcpMessage.TCPMessage.fromDict(result))
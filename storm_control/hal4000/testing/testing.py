@@ -147,9 +147,10 @@ class TestingTCP(Testing):
         # this will send a "noop" message through HAL's queue.
         super().handleActionDone()
 
-        # Check if this TestActionTCP and we need to send a TCPMessage.
+        # Check if this TestActionTCP and we need to send TCPMessage(s).
         if not done and isinstance(self.current_action, testActionsTCP.TestActionTCP):
-            self.hal_client.sendMessage(self.current_action.tcp_message)
+            for tcp_message in self.current_action.getTCPMessages():
+                self.hal_client.sendMessage(tcp_message)
 
     def handleMessageReceived(self, tcp_message):
         """
@@ -171,6 +171,7 @@ class TigerController(stageModule.StageModule):
 
     def __init__(self, module_params = None, qt_settings = None, **kwds):
         super().__init__(**kwds)
+        self.message_types.append("configure1")
         self.controller_mutex = QtCore.QMutex()
         self.functionalities = {}
 
@@ -111,6 +111,7 @@ class AmplitudeModule(hardwareModule.HardwareModule):
     """
     def __init__(self, **kwds):
         super().__init__(**kwds)
+        self.message_types = ["get functionality", "start film", "stop film"]
         self.device_mutex = QtCore.QMutex()
 
     def getFunctionality(self, message):
@@ -63,6 +63,7 @@ class FilterWheelModule(hardwareModule.HardwareModule):
     """
     def __init__(self, **kwds):
         super().__init__(**kwds)
+        self.message_types = ["get functionality"]
 
     def getFunctionality(self, message):
         pass
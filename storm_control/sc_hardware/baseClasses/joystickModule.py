@@ -254,6 +254,11 @@ class JoystickModule(halModule.HalModule):
 
     def __init__(self, module_params = None, qt_settings = None, **kwds):
         super().__init__(**kwds)
+        self.message_types = ["configuration",
+                              "configure1",
+                              "film lockout",
+                              "new parameters",
+                              "stop film"]
         self.can_jump = False
         self.filming = False
         self.waiting_for_film = False
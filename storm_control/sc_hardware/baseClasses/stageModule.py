@@ -208,6 +208,11 @@ class StageModule(hardwareModule.HardwareModule):
     """
     def __init__(self, **kwds):
         super().__init__(**kwds)
+        self.message_types = ["configuration",
+                              "get functionality",
+                              "start film",
+                              "stop film",
+                              "tcp message"]
         self.stage = None
         self.stage_functionality = None
 
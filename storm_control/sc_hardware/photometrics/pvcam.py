@@ -98,6 +98,7 @@ class PVCAMCamera(object):
         self.buffer_len = None
         self.data_buffer = None
         self.frame_bytes = None
+        self.frame_pool = None
         self.frame_x = None
         self.frame_y = None
         self.n_captured = pvc.uns32(0) # No more than 4 billion frames in a single capture..
@@ -173,7 +174,10 @@ class PVCAMCamera(object):
                                                 ctypes.byref(data_ptr)),
                   "pl_exp_get_oldest_frame")
 
-            pv_data = PVCAMFrameData(self.frame_bytes)
+            if (self.frame_pool is not None) and (2 * self.frame_pool.getFrameSize() == self.frame_bytes):
+                pv_data = PVCAMFrameData(self.frame_bytes, np_array = self.frame_pool.getBuffer())
+            else:
+                pv_data = PVCAMFrameData(self.frame_bytes)
             pv_data.copyData(data_ptr)
             frames.append(pv_data)
             
@@ -184,6 +188,13 @@ class PVCAMCamera(object):
             
         return [frames, [self.frame_x, self.frame_y]]
         
+    def setFramePool(self, frame_pool):
+        """
+        Use buffers from frame_pool for the frame data instead of
+        allocating new storage for each frame.
+        """
+        self.frame_pool = frame_pool
+
     def getParam(self, pid, value, attrib):
         """
         Wrapper of pl_get_params, primarily for internal use.
@@ -427,12 +438,16 @@ class PVCAMFrameData(object):
 
     By now you'd think we'd have a generic base class for this..
     """
-    def __init__(self, size = None, **kwds):
+    def __init__(self, size = None, np_array = None, **kwds):
         """
-        Create a data object of the appropriate size.
+        Create a data object of the appropriate size. Use np_array
+        for storage if it is specified.
         """
         super().__init__(**kwds)
-        self.np_array = numpy.ascontiguousarray(numpy.empty(int(size/2), dtype=numpy.uint16))
+        if np_array is None:
+            self.np_array = numpy.ascontiguousarray(numpy.empty(int(size/2), dtype=numpy.uint16))
+        else:
+            self.np_array = np_array
         self.size = size
 
     def copyData(self, address):
@@ -3,261 +3,381 @@
 This parses a log file series (i.e. log, log.1, log.2, etc..) and
 outputs timing and call frequency information for HAL messages.
 
+The log files are read in chunks and the message events are pulled
+out with a regular expression, so there is no per line Python code.
+The results are stored as columns (numpy arrays) in a Messages object
+rather than as one Python object per message.
+
+Parsing can optionally be cached in a .npz file next to the log files.
+The cache is only used if the sizes and modification times of the
+log files have not changed.
+
 Hazen 5/18
 """
-from datetime import datetime
+import json
+import numpy
 import os
+import re
+
+
+# Size of the chunks to read the log files in.
+chunk_size = 16 * 1024 * 1024
 
+# Log file extensions, oldest first.
+extensions = [".5", ".4", ".3", ".2", ".1", ""]
 
-pattern = '%Y-%m-%d %H:%M:%S,%f'
+# Message events, the index in this list is the event code.
+events = ["queued", "sent", "processed", "worker done", "handled by"]
 
+# Matches the time of a HAL log line.
+line_re = re.compile(rb"^(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d,\d{3}):hal4000:INFO:", re.M)
 
-class Message(object):
+#
+# Matches a message event, this is time, event, message id, module name and
+# message type. Anchoring on the newline instead of using re.M is a lot faster,
+# so the chunks have to start with a newline.
+#
+event_re = re.compile(rb"\n(.{23}):hal4000:INFO: +(" +
+                      b"|".join(map(lambda x: x.encode(), events)) +
+                      rb"),(\d+),([^,\r\n]*),([^\r\n]*)")
+
+
+class Messages(object):
     """
-    Storage for the timing of a single message.
+    Storage for the timing of a collection of messages. The
+    columns are numpy arrays with one element per message:
+
+    "m_id" - The message ID.
+    "m_type" - The message type.
+    "source" - The message source.
+    "created_time" - When the message was created relative to first
+                     time in the log file in seconds.
+    "queued_time" - Time queued in seconds (NaN if the message was
+                    never sent).
+    "processing_time" - Time to process in seconds (NaN if the message
+                        was never processed).
+    "n_workers" - The number of workers (QRunnables) that were employed
+                  to process this message.
+
+    handled_by is a list of two arrays with the message ID and the
+    name of the module for every 'handled by' event.
     """
-    def __init__(self, m_type = None, source = None, time = None, zero_time = None, **kwds):
+    columns = ["m_id", "m_type", "source", "created_time", "queued_time", "processing_time", "n_workers"]
+
+    def __init__(self, data = None, handled_by = None, **kwds):
         super().__init__(**kwds)
-        self.created_time = None
-        self.handled_by = {}
-        self.m_type = m_type
-        self.n_workers = 0
-        self.processing_time = None
-        self.queued_time = None
-        self.source = source
-        
-        self.temp = self.parseTime(time)
-        self.created(zero_time)
-
-    def created(self, time):
-        t_time = self.parseTime(time)
-        self.created_time = (self.temp - t_time).total_seconds()
-
-    def handledBy(self, module_name):
-        if module_name in self.handled_by:
-            self.handled_by[module_name] += 1
-        else:
-            self.handled_by[module_name] = 1
-        
-    def getCreatedTime(self):
-        """
-        Returns the time when the message was created relative to first
-        time in the log file in seconds.
-        """
-        return self.created_time
+        self.data = data
+        self.handled_by = handled_by
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def __len__(self):
+        return self.data["m_id"].size
 
     def getHandledBy(self):
         """
-        Get dictionary of modules that handled this message.
-        """
-        return self.handled_by
-    
-    def getNWorkers(self):
-        """
-        Return the number of workers (QRunnables) that were employed
-        to process this message.
-        """
-        return self.n_workers
-        
-    def getProcessingTime(self):
-        """
-        Return time to process in seconds.
+        Get dictionary of modules that handled these messages, and how
+        many times they handled them.
         """
-        return self.processing_time
-        
-    def getQueuedTime(self):
-        """
-        Return time queued in seconds.
-        """
-        return self.queued_time
+        mask = numpy.isin(self.handled_by[0], self.data["m_id"])
+        [names, counts] = numpy.unique(self.handled_by[1][mask], return_counts = True)
+        return dict(zip(names.tolist(), counts.tolist()))
 
-    def getSource(self):
-        """
-        Returns the source of a message.
-        """
-        return self.source
-    
-    def getType(self):
+    def isComplete(self):
         """
-        Return the message type.
+        Returns a boolean array, True for messages where we have all
+        the timing data.
         """
-        return self.m_type
+        return numpy.logical_not(numpy.isnan(self.data["processing_time"]))
 
-    def incNWorkers(self):
-        self.n_workers += 1
-        
-    def isComplete(self):
+    def select(self, index):
         """
-        Returns true if we have all the timing data for this message.
+        Return a new Messages object containing only the selected
+        messages, index is either a boolean mask or an index array.
         """
-        return (self.processing_time != None)
-
-    def parseTime(self, time):
-        return datetime.strptime(time, pattern)
+        data = {}
+        for key in self.columns:
+            data[key] = self.data[key][index]
+        return Messages(data = data, handled_by = self.handled_by)
 
-    def processed(self, time):
-        t_time = self.parseTime(time)
-        self.processing_time = (t_time - self.temp).total_seconds()
-        
-    def sent(self, time):
-        t_time = self.parseTime(time)
-        self.queued_time = (t_time - self.temp).total_seconds()
-        self.temp = t_time
 
-
-def getIterable(dict_or_list):
+def cacheKey(fnames):
     """
-    Returns an iterable given a dictionary of a list.
+    The cache key is the names, sizes and modification times of the log files.
     """
-    if isinstance(dict_or_list, dict):
-        iterable = list(dict_or_list.values())
-    elif isinstance(dict_or_list, list):
-        iterable = dict_or_list
-    else:
-        raise Exception("Unknown type '" + str(type(dict_or_list)) + "'")
-    
-    return iterable
+    key = []
+    for fname in fnames:
+        stat = os.stat(fname)
+        key.append([os.path.basename(fname), stat.st_size, stat.st_mtime_ns])
+    return json.dumps(key)
 
 
 def groupByMsgType(messages):
     """
-    Returns a dictionary keyed by message type, with a list of one or
-    more message objects per message type.
+    Returns a dictionary keyed by message type, with a Messages object
+    per message type.
     """
-    return groupByX(lambda x : x.getType(),
-                    messages)
+    return groupByX("m_type", messages)
 
 
 def groupBySource(messages):
     """
-    Returns a dictionary keyed by message source, with a list of one or
-    more message objects per message source.
+    Returns a dictionary keyed by message source, with a Messages object
+    per message source.
     """
-    return groupByX(lambda x : x.getSource(),
-                    messages)
+    return groupByX("source", messages)
 
 
-def groupByX(grp_fn, messages):
+def groupByX(column, messages):
     """
-    Returns a dictionary keyed by the requested group.
+    Returns a dictionary keyed by the unique values in column.
     """
-    m_grp = {}
-    
-    for msg in getIterable(messages):
-        m_type = grp_fn(msg)
-        if m_type in m_grp:
-            m_grp[m_type].append(msg)
-        else:
-            m_grp[m_type] = [msg]
+    [keys, inverse, counts] = numpy.unique(messages[column], return_inverse = True, return_counts = True)
+    order = numpy.argsort(inverse, kind = "stable")
+    ends = numpy.cumsum(counts)
 
+    m_grp = {}
+    for i, key in enumerate(keys.tolist()):
+        m_grp[key] = messages.select(order[ends[i] - counts[i]:ends[i]])
     return m_grp
-        
 
-def logTiming(basename, ignore_incomplete = True):
+
+def loadCache(cache_name, key):
     """
-    Returns a dictionary of Message objects keyed by their ID number.
+    Returns a Messages object if the cache exists and has the right key,
+    otherwise None.
     """
-    zero_time = None
-    messages = {}
+    if not os.path.exists(cache_name):
+        return None
+
+    try:
+        with numpy.load(cache_name) as cache:
+            if (str(cache["key"]) != key):
+                return None
+            data = {}
+            for column in Messages.columns:
+                data[column] = cache[column]
+            handled_by = [cache["handled_by_m_id"], cache["handled_by_module"]]
+    except (OSError, ValueError, KeyError):
+        return None
 
-    for ext in [".5", ".4", ".3", ".2", ".1", ""]:
+    return Messages(data = data, handled_by = handled_by)
 
+
+def logTiming(basename, ignore_incomplete = True, use_cache = False):
+    """
+    Returns a Messages object with the timing of all the messages in
+    the log file series.
+
+    If use_cache is True the results are saved in basename + ".timing.npz"
+    and loaded from this file the next time if the log files have not changed.
+    """
+    fnames = []
+    for ext in extensions:
         fname = basename + ".out" + ext
         if not os.path.exists(fname):
             print(fname, "not found.")
             continue
-    
-        with open(fname) as fp:
-            for line in fp:
-
-                try:
-                    [time, command] = map(lambda x: x.strip(), line.split(":hal4000:INFO:"))
-                except ValueError:
-                    continue
-
-                if zero_time is None:
-                    zero_time = time
-
-                # Message handled by.
-                if (command.startswith("handled by,")):
-                    [m_id, module_name, m_type] = command.split(",")[1:]
-                    if m_id in messages:
-                        messages[m_id].handledBy(module_name)
-
-                # Message queued.
-                elif (command.startswith("queued,")):
-                    [m_id, source, m_type] = command.split(",")[1:]
-                    messages[m_id] = Message(m_type = m_type,
-                                             source = source,
-                                             time = time,
-                                             zero_time = zero_time)
-                              
-                # Message sent.
-                elif (command.startswith("sent,")):
-                    m_id = command.split(",")[1]
-                    if m_id in messages:
-                        messages[m_id].sent(time)
-
-                # Message processed.
-                elif (command.startswith("processed,")):
-                    m_id = command.split(",")[1]
-                    if m_id in messages:
-                        messages[m_id].processed(time)
-
-                elif (command.startswith("worker done,")):
-                    m_id = command.split(",")[1]
-                    if m_id in messages:
-                        messages[m_id].incNWorkers()
+        fnames.append(fname)
+
+    messages = None
+    if use_cache:
+        cache_name = basename + ".timing.npz"
+        key = cacheKey(fnames)
+        messages = loadCache(cache_name, key)
+
+    if messages is None:
+        messages = parseLogs(fnames)
+        if use_cache:
+            saveCache(cache_name, key, messages)
 
     # Ignore messages that we don't have all the timing for.
     if ignore_incomplete:
-        temp = {}
-        for m_id in messages:
-            msg = messages[m_id]
-            if msg.isComplete():
-                temp[m_id] = msg
-        return temp
+        messages = messages.select(messages.isComplete())
+
+    return messages
+
+
+def parseLogs(fnames):
+    """
+    Parse the log files and return a Messages object.
+    """
+    columns = [[], [], [], [], []]
+    zero_time = None
+    for fname in fnames:
+        for chunk in readChunks(fname):
+            if zero_time is None:
+                match = line_re.search(chunk)
+                if match is not None:
+                    zero_time = match.group(1)
+            found = event_re.findall(b"\n" + chunk)
+            if (len(found) > 0):
+                for i, column in enumerate(zip(*found)):
+                    columns[i].append(numpy.array(column))
+
+    if (len(columns[0]) == 0):
+        columns = [numpy.array([], dtype = "S23")] + [numpy.array([], dtype = "S1")] * 4
+        zero_time = b"1970-01-01 00:00:00,000"
     else:
-        return messages
+        columns = list(map(numpy.concatenate, columns))
+
+    [e_time, e_event, e_id, e_name, e_type] = columns
+    times = parseTimes(numpy.append(e_time, zero_time))
+    e_time = times[:-1] - times[-1]
+    e_id = e_id.astype(numpy.int64)
+
+    event_codes = numpy.zeros(e_event.size, dtype = numpy.int8)
+    for i, event in enumerate(events):
+        event_codes[(e_event == event.encode())] = i
+
+    #
+    # Messages are created when they are queued. If the same ID is
+    # queued more than once we use the last one.
+    #
+    queued = (event_codes == 0)
+    [m_id, last] = numpy.unique(e_id[queued][::-1], return_index = True)
+    q_index = numpy.flatnonzero(queued)[::-1][last]
+
+    created_time = e_time[q_index]
+    m_type = e_type[q_index].astype(str)
+    source = e_name[q_index].astype(str)
+
+    def eventIndex(code):
+        """
+        Returns the index of the message, and the event for all events
+        of a given type whose message ID was queued.
+        """
+        e_index = numpy.flatnonzero(event_codes == code)
+        if (m_id.size == 0):
+            return [e_index[:0], e_index[:0]]
+        m_index = numpy.searchsorted(m_id, e_id[e_index])
+        m_index[(m_index >= m_id.size)] = 0
+        mask = (m_id[m_index] == e_id[e_index])
+        return [m_index[mask], e_index[mask]]
+
+    # Sent time.
+    sent_time = created_time.copy()
+    queued_time = numpy.full(m_id.size, numpy.nan)
+    [m_index, e_index] = eventIndex(1)
+    sent_time[m_index] = e_time[e_index]
+    queued_time[m_index] = sent_time[m_index] - created_time[m_index]
+
+    # Processed time.
+    processing_time = numpy.full(m_id.size, numpy.nan)
+    [m_index, e_index] = eventIndex(2)
+    processing_time[m_index] = e_time[e_index] - sent_time[m_index]
+
+    # Number of workers.
+    [m_index, e_index] = eventIndex(3)
+    n_workers = numpy.bincount(m_index, minlength = m_id.size)
+
+    # Handled by.
+    [m_index, e_index] = eventIndex(4)
+    handled_by = [m_id[m_index], e_name[e_index].astype(str)]
+
+    return Messages(data = {"m_id" : m_id,
+                            "m_type" : m_type,
+                            "source" : source,
+                            "created_time" : created_time,
+                            "queued_time" : queued_time,
+                            "processing_time" : processing_time,
+                            "n_workers" : n_workers},
+                    handled_by = handled_by)
+
+
+def parseTimes(times):
+    """
+    Vectorized parsing of log time strings ('%Y-%m-%d %H:%M:%S,%f') to
+    seconds relative to the start of the first day.
+    """
+    if (times.size == 0):
+        return numpy.zeros(0)
+
+    times = times.astype("S23")
+    [dates, d_index] = numpy.unique(times.astype("S10"), return_inverse = True)
+    days = dates.astype(str).astype("datetime64[D]").astype(numpy.int64)
+    days = days - days[0]
+
+    digits = numpy.frombuffer(times.tobytes(), dtype = numpy.uint8).reshape(-1, 23).astype(numpy.int64) - ord("0")
+
+    def toInt(start, end):
+        value = numpy.zeros(times.size, dtype = numpy.int64)
+        for i in range(start, end):
+            value = 10 * value + digits[:,i]
+        return value
+
+    seconds = 3600 * toInt(11, 13) + 60 * toInt(14, 16) + toInt(17, 19)
+    return 86400.0 * days[d_index.ravel()] + seconds + 0.001 * toInt(20, 23)
 
 
 def processingTime(messages):
     """
-    Returns the total processing time for a collection of messages.
+    Returns the total processing time for a Messages object or a
+    dictionary of Messages objects.
     """
-    accum_time = 0
-    for msg in getIterable(messages):
-        if isinstance(msg, list):
-            for elt in msg:
-                accum_time += elt.getProcessingTime()
-        else:
-            accum_time += msg.getProcessingTime()
-    return accum_time
+    if isinstance(messages, dict):
+        return sum(map(processingTime, messages.values()))
+    return float(numpy.nansum(messages["processing_time"]))
 
 
 def queuedTime(messages):
     """
-    Returns the total queued time for a a collection of messages.
+    Returns the total queued time for a Messages object or a
+    dictionary of Messages objects.
+    """
+    if isinstance(messages, dict):
+        return sum(map(queuedTime, messages.values()))
+    return float(numpy.nansum(messages["queued_time"]))
+
+
+def readChunks(fname):
+    """
+    Generator that returns the contents of a file in chunks that
+    end on a line boundary.
+    """
+    remainder = b""
+    with open(fname, "rb") as fp:
+        while True:
+            chunk = fp.read(chunk_size)
+            if (len(chunk) == 0):
+                break
+            chunk = remainder + chunk
+            end = chunk.rfind(b"\n") + 1
+            remainder = chunk[end:]
+            yield chunk[:end]
+    if (len(remainder) > 0):
+        yield remainder
+
+
+def saveCache(cache_name, key, messages):
+    """
+    Save the parsed messages, failing to save the cache is not an error.
     """
-    accum_time = 0
-    for msg in getIterable(messages):
-        if isinstance(msg, list):
-            for elt in msg:
-                accum_time += elt.getQueuedTime()
-        else:
-            accum_time += msg.getQueuedTime()
-    return accum_time
+    data = {}
+    for column in Messages.columns:
+        data[column] = messages[column]
+    try:
+        numpy.savez(cache_name,
+                    key = numpy.array(key),
+                    handled_by_m_id = messages.handled_by[0],
+                    handled_by_module = messages.handled_by[1],
+                    **data)
+    except OSError as exception:
+        print("Could not save cache", cache_name, str(exception))
 
 
 if (__name__ == "__main__"):
 
-    import sys
-    
-    if (len(sys.argv) != 2):
-        print("usage: <log file>")
-        exit()
+    import argparse
 
-    messages = logTiming(sys.argv[1])
+    parser = argparse.ArgumentParser(description = 'HAL message timing.')
+    parser.add_argument('basename', type = str, help = "The log file name, without the .out extension.")
+    parser.add_argument('--no-cache', dest = 'no_cache', action = 'store_true', default = False,
+                        help = "Don't load or save the parsed log files.")
+    args = parser.parse_args()
+
+    messages = logTiming(args.basename, use_cache = (not args.no_cache))
     groups = groupByMsgType(messages)
 
     print()
@@ -276,5 +396,3 @@ if (__name__ == "__main__"):
         print(key + ", {0:0d} counts, {1:.3f} seconds".format(len(grp), processingTime(grp)))
     print("Total processing time {0:.3f} seconds".format(processingTime(groups)))
 
-
-
@@ -6,8 +6,12 @@ the resulting settings.
 Hazen 06/15
 """
 
+import collections
 import copy
+import hashlib
 import os
+import threading
+import time
 import traceback
 import xml
 
@@ -15,20 +19,51 @@ from xml.dom import minidom
 from xml.etree import ElementTree
 
 
+#
+# The cache of parsed XML files, see parseFile(). This is keyed by
+# the file name and recurse. The values are [path, modification time
+# and size], the hash of the file contents, the root element tag, the
+# StormXMLObject and the time when the file was last hashed.
+#
+parse_cache = collections.OrderedDict()
+parse_cache_lock = threading.Lock()
+parse_cache_size = 32
+
+#
+# A file could be re-written without changing its modification time or
+# size if this happens within the resolution of the file system time
+# stamps (which can be quite coarse on network shares). Files that were
+# modified less than this many seconds before they were hashed are
+# always hashed again.
+#
+parse_cache_mtime_resolution = 2.0
+
+#
+# Parameter values of these types can't be changed in place, so
+# StormXMLObject.get() can return them without un-sharing anything.
+#
+immutable_types = (type(None), bool, int, float, str, bytes)
+
+
 #
 # Functions.
 #
+def clearCache():
+    """
+    Clear the cache of parsed XML files.
+    """
+    with parse_cache_lock:
+        parse_cache.clear()
+
+
 def config(config_file):
     """
     Parse a configuration file for a setup.
     """
-    xml = ElementTree.parse(config_file).getroot()
-    if (xml.tag != "config"):
+    [tag, config] = parseFile(config_file, True)
+    if (tag != "config"):
         raise ParametersException(config_file + " is not a configuration file.")
 
-    # Create the configuration object.
-    config = StormXMLObject(nodes = xml, recurse = True)
-
     return config
 
 
@@ -43,7 +78,8 @@ def copyParameters(original_parameters, new_parameters):
 
     # Create.
     params = original_parameters.copy()
-    copyParametersReplace("", params, new_parameters)
+    for [pname, value] in copyParametersReplace("", params, new_parameters):
+        params.set(pname, value)
 
     # Check and add any new parameters.
     unrecognized = copyParametersAddNew(params, new_parameters, not new_parameters._validate_)
@@ -103,57 +139,116 @@ def copyParametersReplace(root, original, new):
     """
     A helper function for copyParameters().
 
-    This replaces all the parameters in original with their values
-    from new, if new has a corresponding value. The idea is that
+    This returns a list of the parameters in original that have a
+    different value in new, and the new values. The idea is that
     the new parameters only need to specify what is different.
 
+    This does not change original, so any parameters that are not
+    different stay shared with the object that original is a copy of.
+
     Note: This no longer supports flat parameter trees for new.
     """
+    replace = []
     for attr in original.getAttrs():
 
-        prop = original.get(attr)
+        prop = original._getp_(attr, False)
+
+        attr_fullname = attr
+        if (len(root) > 0):
+            attr_fullname = root + "." + attr
 
         # Recurse if this a branch.
         if isinstance(prop, StormXMLObject):
-            if (len(root) > 0):
-                copyParametersReplace(root + "." + attr, prop, new)
-            else:
-                copyParametersReplace(attr, prop, new)
+            replace.extend(copyParametersReplace(attr_fullname, prop, new))
 
         # Otherwise check for the corresponding node in new.
-        else:
-            attr_fullname = attr
-            if (len(root) > 0):
-                attr_fullname = root + "." + attr
-            if new.has(attr_fullname):
-                original.set(attr, new.get(attr_fullname))
+        elif new.has(attr_fullname):
+            new_value = new.get(attr_fullname)
+            if (prop.getv() != new_value):
+                replace.append([attr_fullname, new_value])
+
+    return replace
 
 
 def difference(params1, params2):
     """
     Return which parameters in params1 are different / don't 
     exist in params2.
+
+    This only reads the parameters, so it does not un-share copies.
+    Sections (or Parameters) that are still shared between params1
+    and params2 are the same and are skipped.
     """
     differences = []
     
     def diffRecurse(root, p1, p2):
+        if (p1.parameters is p2.parameters):
+            return
+        
         for attr in p1.getAttrs():
-            prop = p1.get(attr)
-
-            if isinstance(prop, StormXMLObject):
-                if p2.has(attr):
-                    diffRecurse(root + attr + ".", prop, p2.get(attr))
+            if not attr in p2.parameters:
+                differences.append(root + attr)
+                continue
+
+            prop1 = p1.parameters[attr]
+            prop2 = p2.parameters[attr]
+            if prop1 is prop2:
+                continue
+
+            if isinstance(prop1, StormXMLObject):
+                if isinstance(prop2, StormXMLObject):
+                    diffRecurse(root + attr + ".", prop1, prop2)
                 else:
                     differences.append(root + attr)
             else:
-                if not p2.has(attr):
+                if isinstance(prop2, StormXMLObject):
                     differences.append(root + attr)
-                elif (prop != p2.get(attr)):
+                elif (prop1.getv() != prop2.getv()):
                     differences.append(root + attr)
 
     diffRecurse("", params1, params2)
     return differences
 
+
+def differenceBySection(params1, params2):
+    """
+    Return which parameters in params1 are different / don't
+    exist in params2 as a dictionary keyed by the top level
+    sections. The values are lists of the names of the parameters
+    (relative to the section) that are different. Parameters that
+    are not in a section are in the '' key.
+
+    If a section in params1 does not exist in params2 then all of
+    its parameters are different.
+    """
+    def allParameters(root, p):
+        pnames = []
+        for attr in p.getAttrs():
+            prop = p._getp_(attr, False)
+            if isinstance(prop, StormXMLObject):
+                pnames.extend(allParameters(root + attr + ".", prop))
+            else:
+                pnames.append(root + attr)
+        return pnames
+    
+    differences = {}
+    for pname in difference(params1, params2):
+        prop = params1._getp_(pname, False)
+        if isinstance(prop, StormXMLObject):
+            pnames = allParameters(pname + ".", prop)
+        else:
+            pnames = [pname]
+
+        for pname in pnames:
+            names = pname.split(".", 1)
+            if (len(names) == 1):
+                names = [""] + names
+            if not names[0] in differences:
+                differences[names[0]] = []
+            differences[names[0]].append(names[1])
+
+    return differences
+
     
 def fileType(xml_file):
     """
@@ -194,18 +289,72 @@ def parameters(parameters_file, recurse = False, add_filename_param = True):
     """
     Parses a parameters file to create a parameters object.
     """
-    xml = ElementTree.parse(parameters_file).getroot()
-    if (xml.tag != "settings"):
+    [tag, xml_object] = parseFile(parameters_file, recurse)
+    if (tag != "settings"):
         raise ParametersException(parameters_file + " is not a setting file.")
 
-    # Create XML object.
-    xml_object = StormXMLObject(xml, recurse)
     if add_filename_param:
         xml_object.set("parameters_file", parameters_file)
     
     return xml_object
 
 
+def parseFile(xml_file, recurse):
+    """
+    Returns the root element tag and a StormXMLObject for an XML file.
+
+    The StormXMLObjects are cached, keyed by the file name, the file
+    modification time and size, and a hash of the file contents. The
+    cached objects are never changed, what is returned is a copy, and
+    as copies are copy-on-write this is very fast.
+
+    The file is only not hashed if the modification time and size match
+    and the file was hashed at least parse_cache_mtime_resolution seconds
+    after it was modified.
+    """
+    # Don't try and cache file objects, etc.
+    if not isinstance(xml_file, str):
+        xml = ElementTree.parse(xml_file).getroot()
+        return [xml.tag, StormXMLObject(xml, recurse)]
+
+    key = (os.path.abspath(xml_file), recurse)
+    stat = os.stat(xml_file)
+    stat_key = [stat.st_mtime_ns, stat.st_size]
+
+    # Check the cache using the modification time and size.
+    with parse_cache_lock:
+        if key in parse_cache:
+            entry = parse_cache[key]
+            parse_cache.move_to_end(key)
+            safe = ((entry[4] - 1.0e-9 * stat.st_mtime_ns) > parse_cache_mtime_resolution)
+            if (entry[0] == stat_key) and safe:
+                return [entry[2], entry[3].copy()]
+
+    # Check the cache using the contents of the file.
+    hash_time = time.time()
+    with open(xml_file, "rb") as fp:
+        data = fp.read()
+    digest = hashlib.sha1(data).hexdigest()
+
+    with parse_cache_lock:
+        if key in parse_cache:
+            entry = parse_cache[key]
+            if (entry[1] == digest):
+                entry[0] = stat_key
+                entry[4] = hash_time
+                return [entry[2], entry[3].copy()]
+
+    # Parse the file.
+    xml = ElementTree.fromstring(data)
+    xml_object = StormXMLObject(xml, recurse)
+
+    with parse_cache_lock:
+        parse_cache[key] = [stat_key, digest, xml.tag, xml_object, hash_time]
+        while (len(parse_cache) > parse_cache_size):
+            parse_cache.popitem(last = False)
+        return [xml.tag, xml_object.copy()]
+
+
 #
 # Classes.
 # 
@@ -522,11 +671,56 @@ class ParameterStringFilename(ParameterString):
         self.use_save_dialog = use_save_dialog
 
 
+#
+# Parameter classes for the 'type' attribute of XML elements, these are
+# used by StormXMLObject. Ranges are elements with a 'min' attribute,
+# sets are elements with a 'values' attribute.
+#
+range_types = {"float" : ParameterRangeFloat,
+               "int" : ParameterRangeInt}
+
+set_types = {"float" : ParameterSetFloat,
+             "int" : ParameterSetInt,
+             "string" : ParameterSetString}
+
+simple_types = {"custom" : ParameterCustom,
+                "directory" : ParameterStringDirectory,
+                "filename" : ParameterStringFilename,
+                "float" : ParameterFloat,
+                "int" : ParameterInt,
+                "string" : ParameterString}
+
+#
+# These are deprecated and may disappear. They only remain so that
+# current Steve can read older data.
+#
+deprecated_types = {"float-array" : ParameterCustom,
+                    "float64" : None,
+                    "int-array" : None,
+                    "str" : None,
+                    "string-array" : None,
+                    "unicode" : None,
+                    "bool" : None}
+
+
 class StormXMLObject(object):
     """
     A collection of Parameters objects that are (usually) created 
     dynamically by parsing an XML file. All parameter names must 
     be unique for each section.
+
+    Copies are copy-on-write. copy() just shares the parameters
+    dictionary between the original and the copy. The first time
+    either of them is changed it makes its own dictionary, and the
+    Parameter and StormXMLObject objects in it are only duplicated
+    when they are requested with getp() (or get() for sub-sections
+    and for values such as lists that can be changed in place), or
+    changed.
+
+    Parameter and StormXMLObject objects that have been handed out
+    (by getp(), get(), getProps(), add() or addSubSection()) can be
+    changed by whoever holds them, so these are never shared, copy()
+    duplicates them instead.
     """
     def __init__(self, nodes = None, recurse = False, validate = True, **kwds):
         super().__init__(**kwds)
@@ -534,6 +728,16 @@ class StormXMLObject(object):
         self._validate_ = validate
         self.parameters = {}
 
+        #
+        # This is None if we own self.parameters and all the objects in it,
+        # True if self.parameters is shared with a copy or a set of the
+        # names of the objects that are still shared with a copy.
+        #
+        self._shared_ = None
+
+        # The names of the objects that have been handed out.
+        self._exposed_ = set()
+
         if nodes is None:
             return
 
@@ -550,75 +754,51 @@ class StormXMLObject(object):
 
         for node in nodes:
             param = None
+            attrib = node.attrib
+            node_type = attrib.get("type")
             
             #
             # These are settings as specified in the defaul xml file. This will
             # (hopefully) provide a complete specification for each Parameter.
             #
-            if node.attrib.get("type", False):
-                node_type = node.attrib.get("type")
+            if node_type:
                 kwds = {"name" : node.tag,
                         "value" : node.text,
-                        "description" : node.attrib.get("desc", "None"),
-                        "is_mutable" : (node.attrib.get("mutable", "true").lower() == "true"),
-                        "order" : int(node.attrib.get("order", 1))}
+                        "description" : attrib.get("desc", "None"),
+                        "is_mutable" : (attrib.get("mutable", "true").lower() == "true"),
+                        "order" : int(attrib.get("order", 1))}
 
                 # Boolean
                 if (node_type == "boolean"):
                     param = ParameterSetBoolean(**kwds)
 
                 # Ranges.
-                elif node.attrib.get("min", False):
-                    kwds["min_value"] = node.attrib.get("min")
-                    kwds["max_value"] = node.attrib.get("max")
-                    if (node_type == "float"):
-                        param = ParameterRangeFloat(**kwds)
-                    elif (node_type == "int"):
-                        param = ParameterRangeInt(**kwds)
-                    else:
+                elif attrib.get("min"):
+                    if not node_type in range_types:
                         raise ParametersException("unrecognized range type, " + node_type)
+                    kwds["min_value"] = attrib.get("min")
+                    kwds["max_value"] = attrib.get("max")
+                    param = range_types[node_type](**kwds)
 
                 # Sets.
-                elif node.attrib.get("values", False):
-                    kwds["allowed"] = node.attrib.get("values").split(",")
-                    if (node_type == "float"):
-                        param = ParameterSetFloat(**kwds)
-                    elif (node_type == "int"):
-                        param = ParameterSetInt(**kwds)
-                    elif (node_type == "string"):
-                        param = ParameterSetString(**kwds)
-                    else:
+                elif attrib.get("values"):
+                    if not node_type in set_types:
                         raise ParametersException("unrecognized set type, " + node_type)
+                    kwds["allowed"] = attrib.get("values").split(",")
+                    param = set_types[node_type](**kwds)
 
                 # The fallback if the element is not a set or a range.
-                elif (node_type == "float"):
-                    param = ParameterFloat(**kwds)
-
-                elif (node_type == "int"):
-                    param = ParameterInt(**kwds)
-
-                # Other types of elements.
-                elif (node_type == "custom"):
-                    param = ParameterCustom(**kwds)
-
-                elif (node_type == "directory"):
-                    param = ParameterStringDirectory(**kwds)
-                    
-                elif (node_type == "filename"):
-                    kwds["use_save_dialog"] = (node.attrib.get("use_save_dialog", "false").lower() == "true")
-                    param = ParameterStringFilename(**kwds)
-
-                elif (node_type == "string"):
-                    param = ParameterString(**kwds)
-
-                # These are deprecated and may disappear. They only remain so
-                # that current Steve can read older data.
-                elif (node_type == "float-array"):
-                    param = ParameterCustom(**kwds)
-                    print("Found deprecated parameter type: ", node_type )
-
-                elif (node_type in ["float64", "int-array", "str", "string-array", "unicode", "bool"]):
-                    print("Found deprecated parameter type: ", node_type, " ignoring.")
+                elif node_type in simple_types:
+                    if (node_type == "filename"):
+                        kwds["use_save_dialog"] = (attrib.get("use_save_dialog", "false").lower() == "true")
+                    param = simple_types[node_type](**kwds)
+
+                elif node_type in deprecated_types:
+                    if deprecated_types[node_type] is None:
+                        print("Found deprecated parameter type: ", node_type, " ignoring.")
+                    else:
+                        param = deprecated_types[node_type](**kwds)
+                        print("Found deprecated parameter type: ", node_type )
 
                 else:
                     raise ParametersException("unrecognized type, " + node_type)
@@ -636,7 +816,58 @@ class StormXMLObject(object):
 
             # If we were able to make a parameter object add it to the record.
             if param is not None:
-                self.addParameter(node.tag, param)
+                if node.tag in self.parameters:
+                    raise ParametersException("Parameter " + node.tag + " already exists.")
+                self.parameters[node.tag] = param
+
+    def _getp_(self, pname, unshare):
+        """
+        Return the property specified by pname, un-sharing it (and the
+        sections that contain it) if unshare is True.
+        """
+        # Check for sub-property.
+        pnames = pname.split(".")
+        if (len(pnames) > 1):
+            xml_object = self._getp_(pnames[0], unshare)
+            return xml_object._getp_(".".join(pnames[1:]), unshare)
+
+        if pname in self.parameters:
+            if unshare:
+                return self._unshareItem_(pname)
+            return self.parameters[pname]
+        else:
+            raise ParametersExceptionGet("Requested property " + pname + " not found")
+
+    def _expose_(self, pname):
+        """
+        Record that the object specified by pname (and the sections
+        that contain it) has been handed out.
+        """
+        pnames = pname.split(".", 1)
+        self._exposed_.add(pnames[0])
+        if (len(pnames) > 1):
+            self.parameters[pnames[0]]._expose_(pnames[1])
+
+    def _unshare_(self):
+        """
+        Make our own copy of the parameters dictionary.
+        """
+        if self._shared_ is True:
+            self.parameters = dict(self.parameters)
+            self._shared_ = set(self.parameters) - self._exposed_
+
+    def _unshareItem_(self, pname):
+        """
+        Make our own copy of a Parameter or sub-section and return it.
+        """
+        if self._shared_ is not None:
+            self._unshare_()
+            if pname in self._shared_:
+                self.parameters[pname] = self.parameters[pname].copy()
+                self._shared_.remove(pname)
+                if (len(self._shared_) == 0):
+                    self._shared_ = None
+        return self.parameters[pname]
 
     def add(self, pname, pvalue = None):
         """
@@ -656,11 +887,13 @@ class StormXMLObject(object):
         pnames = pname.split(".")
         if (len(pnames) > 1):
             try:
-                prop = self.get(pnames[0])
+                prop = self._getp_(pnames[0], True)
             except ParametersExceptionGet:
                 self.addSubSection(pnames[0])
-            prop = self.get(pnames[0])
+            prop = self._getp_(pnames[0], True)
             prop.add(".".join(pnames[1:]), pvalue)
+            if isinstance(pvalue, Parameter):
+                self._exposed_.add(pnames[0])
         else:
             self.addParameter(pname, pvalue)
 
@@ -671,8 +904,10 @@ class StormXMLObject(object):
         if pname in self.parameters:
             raise ParametersException("Parameter " + pname + " already exists.")
         else:
+            self._unshare_()
             if isinstance(pvalue, Parameter):
                 self.parameters[pname] = pvalue
+                self._exposed_.add(pname)
             else:
                 self.parameters[pname] = ParameterSimple(pname, pvalue)
 
@@ -686,12 +921,14 @@ class StormXMLObject(object):
         If the section already exists and overwrite is False then you
         will get an exception.
         """
+        self._unshare_()
         snames = sname.split(".")
         if (len(snames) > 1):
             if not snames[0] in self.parameters:
                 cur_section = self.parameters[snames[0]] = StormXMLObject()
             else:
-                cur_section = self.parameters[snames[0]]
+                cur_section = self._unshareItem_(snames[0])
+            self._exposed_.add(snames[0])
             return cur_section.addSubSection(".".join(snames[1:]),
                                              svalue = svalue,
                                              overwrite = overwrite)
@@ -709,10 +946,39 @@ class StormXMLObject(object):
                 else:
                     raise ParametersException("Object is a " + type(svalue) + " not a StormXMLObject")
 
+            # This is a new section, so it is not shared.
+            if isinstance(self._shared_, set):
+                self._shared_.discard(sname)
+            self._exposed_.add(sname)
             return self.parameters[sname]
 
     def copy(self):
-        return copy.deepcopy(self)
+        """
+        Return a (copy-on-write) copy, this only depends on the
+        number of objects that have been handed out.
+        """
+        new_object = copy.copy(self)
+        new_object._exposed_ = set()
+        if (len(self._exposed_) == 0):
+            new_object._shared_ = True
+            self._shared_ = True
+            return new_object
+
+        #
+        # The objects that have been handed out could still be changed
+        # through these references, so the copy gets its own duplicates
+        # of them and shares the rest.
+        #
+        shared = set(self.parameters) - self._exposed_
+        new_object.parameters = dict(self.parameters)
+        for pname in self._exposed_:
+            new_object.parameters[pname] = self.parameters[pname].copy()
+        new_object._shared_ = set(shared)
+        if self._shared_ is None:
+            self._shared_ = shared
+        else:
+            self._shared_.update(shared)
+        return new_object
 
     def delete(self, name):
         """
@@ -721,8 +987,12 @@ class StormXMLObject(object):
         if self.has(name):
             names = name.split(".")
             if (len(names) > 1):
-                self.get(".".join(names[:-1])).delete(names[-1])
+                self._getp_(".".join(names[:-1]), True).delete(names[-1])
             else:
+                self._unshare_()
+                if isinstance(self._shared_, set):
+                    self._shared_.discard(name)
+                self._exposed_.discard(name)
                 del self.parameters[name]
 
     def get(self, pname, default = None):
@@ -731,17 +1001,21 @@ class StormXMLObject(object):
         the corresponding StormXMLObject.
         """
         try:
-            prop = self.getp(pname)
+            prop = self._getp_(pname, False)
         except ParametersException:
             if default is not None:
                 return default
             else:
                 raise ParametersExceptionGet("Requested property " + pname + " not found and no default was specified.")
         else:
+            # The caller could change the sub-section or a value such as a
+            # list in place, so these can't be shared.
             if isinstance(prop, StormXMLObject):
-                return prop
-            else:
+                return self.getp(pname)
+            elif isinstance(prop.getv(), immutable_types):
                 return prop.getv()
+            else:
+                return self.getp(pname).getv()
 
     def getAttrs(self):
         """
@@ -759,22 +1033,17 @@ class StormXMLObject(object):
         """
         Return the property specified by pname.
         """
-        # Check for sub-property.
-        pnames = pname.split(".")
-        if (len(pnames) > 1):
-            xml_object = self.getp(pnames[0])
-            #print pnames, type(xml_object)
-            return xml_object.getp(".".join(pnames[1:]))
-
-        if pname in self.parameters:
-            return self.parameters[pname]
-        else:
-            raise ParametersExceptionGet("Requested property " + pname + " not found")
+        prop = self._getp_(pname, True)
+        self._expose_(pname)
+        return prop
 
     def getProps(self):
         """
         Return all the properties.
         """
+        for pname in list(self.parameters):
+            self._unshareItem_(pname)
+            self._exposed_.add(pname)
         return self.parameters.values()
 
     def getSortedAttrs(self):
@@ -789,7 +1058,7 @@ class StormXMLObject(object):
         Return true if this object has a particular Parameter.
         """
         try:
-            prop = self.getp(pname)
+            prop = self._getp_(pname, False)
         except ParametersExceptionGet:
             return False
         return True
@@ -819,7 +1088,7 @@ class StormXMLObject(object):
         # If the parameter does not already exist a ParameterSimple
         # is created to hold the value of the parameter.
         try:
-            temp = self.getp(pname)
+            temp = self._getp_(pname, True)
             if isinstance(pvalue, Parameter):
                 temp.setv(pvalue.getv())
             else:
@@ -845,7 +1114,7 @@ class StormXMLObject(object):
                 raise ParametersException(msg)
             return
 
-        self.getp(pname).setv(value)
+        self._getp_(pname, True).setv(value)
 
     def toString(self, all_params = False):
         """
@@ -46,6 +46,7 @@ class TCPClient(QtCore.QObject, tcpCommunications.TCPCommunicationsMixin):
             print(string)
 
         # Attempt to connect to host.
+        self.clearBinary()
         self.socket.connectToHost(self.address, self.port)
 
         if not self.socket.waitForConnected(1000):
@@ -55,6 +56,7 @@ class TCPClient(QtCore.QObject, tcpCommunications.TCPCommunicationsMixin):
         """
         Handles the disconnect from the socket.
         """
+        self.clearBinary()
         self.comLostConnection.emit()
 
     def startCommunication(self):
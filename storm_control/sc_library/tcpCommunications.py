@@ -19,6 +19,13 @@ class TCPCommunicationsMixin(object):
     A mixin class that defines the basic process of exchanging TCP 
     messages. Client and servers (multi-) inherit this class.
 
+    Messages are sent as one line of JSON. Responses have the same ID
+    as the request, so a client can send several messages without
+    waiting for the responses and use the ID to match them up.
+
+    If a message has binary data this is sent immediately after the
+    JSON line. The length of the binary data is in the JSON.
+
     They will should also include the following signal:
     messageReceived = QtCore.pyqtSignal(object)
     """
@@ -33,6 +40,8 @@ class TCPCommunicationsMixin(object):
 
         # Initialize internal attributes
         self.address = address
+        self.binary_buffer = None
+        self.binary_message = None
         self.encoding = encoding
         self.port = port 
         self.server_name = server_name
@@ -48,23 +57,24 @@ class TCPCommunicationsMixin(object):
             if self.verbose:
                 print("Closing TCP communications: " + self.server_name)
             
+    def clearBinary(self):
+        """
+        Discard any partly received binary data, this is called when
+        the connection is made or lost.
+        """
+        self.binary_buffer = None
+        self.binary_message = None
+
     def handleBusy(self):
         """
         Handle a busy message. Reserved for future use.
         """
         pass
 
-    def handleReadyRead(self):
+    def handleMessage(self, message):
         """
-        Create TCP message class from JSON message and forward as appropriate
+        Forward a (complete) message as appropriate.
         """
-        message_str = ""
-        while self.socket.canReadLine():
-            # Read data line
-            message_str += str(self.socket.readLine(), self.encoding)
-
-        # Create message.
-        message = TCPMessage.fromJSON(message_str)
         if self.verbose:
             print("Received: \n" + str(message))
 
@@ -72,6 +82,46 @@ class TCPCommunicationsMixin(object):
             self.handleBusy()
         else:
             self.messageReceived.emit(message)
+
+    def handleReadyRead(self):
+        """
+        Create TCP message classes from JSON messages and forward as appropriate.
+
+        Each message is a single line, there may be more than one message
+        available, or the last message may not have fully arrived yet. In
+        the later case it will be handled the next time this is called.
+        """
+        while True:
+
+            # Read the binary data for the current message.
+            if self.binary_message is not None:
+                size = self.binary_message.getBinarySize()
+                n_bytes = min(self.socket.bytesAvailable(), size - len(self.binary_buffer))
+                if (n_bytes > 0):
+                    self.binary_buffer += self.socket.read(n_bytes)
+                if (len(self.binary_buffer) < size):
+                    return
+
+                message = self.binary_message
+                message.binary_data = bytes(self.binary_buffer)
+                self.binary_buffer = None
+                self.binary_message = None
+                self.handleMessage(message)
+
+            if not self.socket.canReadLine():
+                return
+            
+            message_str = str(self.socket.readLine(), self.encoding).strip()
+            if (len(message_str) == 0):
+                continue
+
+            # Create message.
+            message = TCPMessage.fromJSON(message_str)
+            if (message.getBinarySize() > 0):
+                self.binary_buffer = bytearray()
+                self.binary_message = message
+            else:
+                self.handleMessage(message)
     
     def isConnected(self):
         """
@@ -89,6 +139,8 @@ class TCPCommunicationsMixin(object):
         if self.isConnected():
             message_str = message.toJSON() + "\n"
             self.socket.write(message_str.encode(self.encoding))
+            if (message.getBinarySize() > 0):
+                self.socket.write(message.getBinaryData())
             self.socket.flush()
             if self.verbose:
                 print("Sent: \n" + str(message))
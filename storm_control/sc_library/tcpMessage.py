@@ -16,6 +16,10 @@ import json
 class TCPMessage(object):
     """
     Contains the contents and status of a TCP message.
+
+    Messages can also carry binary data, such as camera frames. This
+    is not included in the JSON, instead it is sent immediately after
+    the JSON and the 'binary_size' field of the JSON is its length.
     """
     _COUNTER = 0 # Track number of created instances of this class.
 
@@ -29,6 +33,8 @@ class TCPMessage(object):
         assert message_type is not None
         
         #self.complete = False
+        self.binary_data = None
+        self.binary_size = 0
         self.error = False
         self.error_message = None
         self.message_data = copy.copy(message_data)
@@ -52,14 +58,33 @@ class TCPMessage(object):
         self.response[key_name] = value
 
     @staticmethod
-    def fromJSON(json_string):
+    def fromDict(json_dict):
         """
-        Creates a Message from a JSON string.
+        Creates a Message from a dictionary (see toDict()).
         """
         message = TCPMessage(message_type = True)
-        message.__dict__.update(json.loads(json_string))
+        message.__dict__.update(json_dict)
         return message
 
+    @staticmethod
+    def fromJSON(json_string):
+        """
+        Creates a Message from a JSON string.
+        """
+        return TCPMessage.fromDict(json.loads(json_string))
+
+    def getBinaryData(self):
+        """
+        Return the binary data (as bytes), or None if there is none.
+        """
+        return self.binary_data
+
+    def getBinarySize(self):
+        """
+        Return the size of the binary data in bytes.
+        """
+        return self.binary_size
+
     def getData(self, key_name, default = None):
         """
         Access elements of the message data by name.
@@ -123,6 +148,13 @@ class TCPMessage(object):
         """
         return (self.message_type == string)
 
+    def setBinaryData(self, binary_data):
+        """
+        Set the binary data (as bytes).
+        """
+        self.binary_data = bytes(binary_data)
+        self.binary_size = len(self.binary_data)
+
     def setError(self, error_boolean, error_message):
         """
         Set the error status of the message.
@@ -136,11 +168,20 @@ class TCPMessage(object):
         """
         self.test_mode = test_boolean
 
+    def toDict(self):
+        """
+        Returns the message as a dictionary that can be serialized using
+        JSON, this is useful for sending a message inside another message.
+        """
+        json_dict = dict(self.__dict__)
+        del json_dict["binary_data"]
+        return json_dict
+
     def toJSON(self):
         """
-        Serialize using JSON.
+        Serialize using JSON, this does not include the binary data.
         """
-        return json.dumps(self.__dict__)
+        return json.dumps(self.toDict())
 
     ## markAsComplete
     #
@@ -155,7 +196,7 @@ class TCPMessage(object):
         """
         string_rep = "\tMessage Type: " + str(self.message_type)
         for attribute in sorted(vars(self).keys()):
-            if not (attribute == "message_type"):
+            if not (attribute in ["binary_data", "message_type"]):
                 string_rep += "\n\t" + attribute + ": " + str(getattr(self, attribute))
         return string_rep
 
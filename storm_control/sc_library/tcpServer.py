@@ -57,6 +57,7 @@ class TCPServer(QtNetwork.QTcpServer, tcpCommunications.TCPCommunicationsMixin):
             self.socket.waitForDisconnect()
             self.socket.close()
             self.socket = None
+            self.clearBinary()
             self.comLostConnection.emit()
             self.connectToNewClients()
     
@@ -68,6 +69,7 @@ class TCPServer(QtNetwork.QTcpServer, tcpCommunications.TCPCommunicationsMixin):
 
         if not self.isConnected():
             self.socket = socket
+            self.clearBinary()
             self.socket.readyRead.connect(self.handleReadyRead)
             self.socket.disconnected.connect(self.handleClientDisconnect)
             self.comGotConnection.emit()
@@ -88,6 +90,7 @@ class TCPServer(QtNetwork.QTcpServer, tcpCommunications.TCPCommunicationsMixin):
         self.socket.disconnectFromHost()
         self.socket.close()
         self.socket = None
+        self.clearBinary()
         self.comLostConnection.emit()
         if self.verbose:
             print("Client disconnected")
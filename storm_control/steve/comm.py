@@ -187,6 +187,19 @@ class CommMessagePosition(CommMessage):
         self.tcp_message = tcpMessage.TCPMessage(message_type = "Get Stage Position")    
 
 
+class CommMessageSnapshot(CommMessage):
+    """
+    Get the next frame from a camera (or feed). The frame is the
+    binary data of the response.
+    """
+    @hdebug.debug
+    def __init__(self, camera = "camera1", **kwds):
+        super().__init__(**kwds)
+
+        self.tcp_message = tcpMessage.TCPMessage(message_type = "Get Snapshot",
+                                                 message_data = {"camera" : camera})
+
+
 class CommMessageStage(CommMessage):
     """
     Move the stage to a position.
@@ -141,7 +141,8 @@ class MovieCapture(QtCore.QObject):
         """
         Load the (basic) movie and add it to the item store and scene.
         """
-        image_item = self.loadMovie(self.smc.getMovieName())
+        image_item = self.smc.loadImage(self.movie_loader)
+        self.addImageItem(image_item)
         self.captureComplete.emit(image_item)
 
         # Update current objective.
@@ -300,6 +301,12 @@ class SingleMovieCapture(object):
 
     def handleMovieMessage(self, tcp_message, tcp_message_response):
         self.finalizer_fn()
+
+    def loadImage(self, movie_loader):
+        """
+        Load the movie that we took.
+        """
+        return movie_loader.loadMovie(self.movie_name, 0)
         
     def handleStageMessage(self, tcp_message, tcp_message_response):
         """
@@ -322,3 +329,27 @@ class SingleMovieCapture(object):
     def start(self):
         self.removeOldMovie()
         return self.comm.sendMessage(self.stage_message)
+
+
+class SingleSnapshotCapture(SingleMovieCapture):
+    """
+    Handles communicating with HAL to move the stage and get a single
+    frame. The frame is returned in the response from HAL so nothing
+    is saved to (or loaded from) the disk.
+    """
+    def __init__(self, camera = "camera1", disconnect = None, **kwds):
+        super().__init__(disconnect = disconnect, **kwds)
+        self.snapshot_response = None
+        self.movie_message = comm.CommMessageSnapshot(camera = camera,
+                                                      disconnect = disconnect,
+                                                      finalizer_fn = self.handleMovieMessage)
+
+    def handleMovieMessage(self, tcp_message, tcp_message_response):
+        self.snapshot_response = tcp_message_response
+        super().handleMovieMessage(tcp_message, tcp_message_response)
+
+    def loadImage(self, movie_loader):
+        return movie_loader.loadSnapshot(self.snapshot_response)
+    
+    def start(self):
+        return self.comm.sendMessage(self.stage_message)
@@ -232,15 +232,29 @@ class ImageItemLoaderHAL(object):
         #
         self.objectives = objectives
 
+    def dataToImageItem(self, numpy_data, objective_name, x_um, y_um, pixmap_min, pixmap_max):
+        """
+        Create an Image Item from numpy_data.
+        """
+        # Size and offsets.
+        [obj_um_per_pix, x_um_offset, y_um_offset] = self.objectives.getData(objective_name)
+
+        image_item = ImageItem(numpy_data = numpy_data,
+                               objective_name = objective_name,
+                               x_um = x_um,
+                               y_um = y_um)
+        image_item.dataToPixmap(pixmap_min, pixmap_max)
+        image_item.setMagnification(obj_um_per_pix)
+        image_item.setOffset(x_um_offset, y_um_offset)
+
+        return image_item
+        
     def dataXMLToImageItem(self, numpy_data, xml):
         """
         Create an Image Item from numpy_data and the corresponding XML.
 
         Note: This assumes that there is a camera1
         """
-        # Size and offsets.
-        [obj_um_per_pix, x_um_offset, y_um_offset] = self.objectives.getData(self.getObjectiveName(xml))
-
         # Location.
         [x_um, y_um] = list(map(float, xml.get("acquisition.stage_position").split(",")))
 
@@ -248,15 +262,12 @@ class ImageItemLoaderHAL(object):
         pixmap_min = xml.get("display00.camera1.display_min")
         pixmap_max = xml.get("display00.camera1.display_max")
 
-        image_item = ImageItem(numpy_data = numpy_data,
-                               objective_name = self.getObjectiveName(xml),
-                               x_um = x_um,
-                               y_um = y_um)
-        image_item.dataToPixmap(pixmap_min, pixmap_max)
-        image_item.setMagnification(obj_um_per_pix)
-        image_item.setOffset(x_um_offset, y_um_offset)
-
-        return image_item
+        return self.dataToImageItem(numpy_data,
+                                    self.getObjectiveName(xml),
+                                    x_um,
+                                    y_um,
+                                    pixmap_min,
+                                    pixmap_max)
 
     def getObjectiveName(self, xml):
         obj_attr = xml.get("mosaic.objective")
@@ -344,17 +355,59 @@ class ImageItemLoaderHAL(object):
 
         return image_item
 
-    def orientNumpyData(self, numpy_data, xml):
+    def loadSnapshot(self, tcp_message):
         """
-        Orients numpy data array based on XML.
+        Create an ImageItem from HAL's response to a 'Get Snapshot' message,
+        the frame is the binary data of the message.
         """
-        if xml.get("mosaic.flip_horizontal", False):
+        objective_name = tcp_message.getResponse("objective")
+        self.objectives.changeObjective(objective_name)
+
+        # Frame numpy data.
+        numpy_data = numpy.frombuffer(tcp_message.getBinaryData(),
+                                      dtype = numpy.dtype(tcp_message.getResponse("dtype")))
+        numpy_data = numpy_data.reshape(tcp_message.getResponse("shape"))
+
+        # Orient.
+        numpy_data = self.orient(numpy_data,
+                                 tcp_message.getResponse("flip_horizontal"),
+                                 tcp_message.getResponse("flip_vertical"),
+                                 tcp_message.getResponse("transpose"))
+
+        # Display contrast, this is the range of the data if HAL did not send one.
+        pixmap_min = tcp_message.getResponse("display_min")
+        pixmap_max = tcp_message.getResponse("display_max")
+        if (pixmap_min is None) or (pixmap_max is None):
+            pixmap_min = int(numpy.min(numpy_data))
+            pixmap_max = max(int(numpy.max(numpy_data)), pixmap_min + 1)
+
+        return self.dataToImageItem(numpy_data,
+                                    objective_name,
+                                    tcp_message.getResponse("stage_x"),
+                                    tcp_message.getResponse("stage_y"),
+                                    pixmap_min,
+                                    pixmap_max)
+
+    def orient(self, numpy_data, flip_horizontal, flip_vertical, transpose):
+        """
+        Orients numpy data array.
+        """
+        if flip_horizontal:
             numpy_data = numpy.fliplr(numpy_data)
-        if xml.get("mosaic.flip_vertical", False):
+        if flip_vertical:
             numpy_data = numpy.flipud(numpy_data)
-        if xml.get("mosaic.transpose", False):
+        if transpose:
             numpy_data = numpy.transpose(numpy_data)
         return numpy_data
+        
+    def orientNumpyData(self, numpy_data, xml):
+        """
+        Orients numpy data array based on XML.
+        """
+        return self.orient(numpy_data,
+                           xml.get("mosaic.flip_horizontal", False),
+                           xml.get("mosaic.flip_vertical", False),
+                           xml.get("mosaic.transpose", False))
 
 
 
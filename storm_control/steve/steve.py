@@ -97,10 +97,16 @@ class Window(QtWidgets.QMainWindow):
         # The image capture object needs the objectives object.
         self.image_capture.postInitialization(objectives = self.objectives)
 
-        # Configure to use standard image/movie loader.
+        # Configure to use standard image/movie loader. If 'use_snapshots' is
+        # True we get the images directly from HAL instead of from movies.
+        # Note that HAL does not run the shutters sequence for these, so the
+        # illumination has to be turned on in HAL first.
         movie_loader = imageItem.ImageItemLoaderHAL(objectives = self.objectives)
+        movie_taker = imageCapture.SingleMovieCapture
+        if self.parameters.get("use_snapshots", False):
+            movie_taker = imageCapture.SingleSnapshotCapture
         self.image_capture.setMovieLoaderTaker(movie_loader = movie_loader,
-                                               movie_taker = imageCapture.SingleMovieCapture)
+                                               movie_taker = movie_taker)
         
         # Positions
         #
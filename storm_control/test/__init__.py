@@ -17,6 +17,23 @@ def kilroyXmlFilePathAndName(filename):
 def logDirectory():
     return os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs/")
 
+def makeNoneCamera(**kwds):
+    """
+    Returns an emulated camera, 'camera1', configured with kwds. The
+    frame pool is allocated so that frames can be made without first
+    starting the camera.
+    """
+    import storm_control.sc_library.parameters as params
+    import storm_control.hal4000.camera.noneCameraControl as noneCameraControl
+
+    config = params.StormXMLObject()
+    config.set("roll", 1.0)
+    for key, value in kwds.items():
+        config.set(key, value)
+    camera = noneCameraControl.NoneCameraControl(camera_name = "camera1", config = config)
+    camera.frame_pool.setFrameSize(camera.parameters.get("bytes_per_frame"))
+    return camera
+
 def steveXmlFilePathAndName(filename):
     return os.path.join(os.path.dirname(os.path.abspath(__file__)), "steve_xml", filename)
     
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+"""
+Hand run benchmarks of the C libraries against the numpy versions,
+not designed for CI as the timings depend on the machine.
+
+$ python c_libraries_benchmark.py
+"""
+import time
+
+from storm_control.test.test_c_libraries import spotsFrame
+
+
+def timeIt(fn, *args, reps = 5):
+    """
+    Returns the fastest time for fn(*args).
+    """
+    best = None
+    for i in range(reps):
+        start_time = time.perf_counter()
+        fn(*args)
+        elapsed = time.perf_counter() - start_time
+        if (best is None) or (elapsed < best):
+            best = elapsed
+    return best
+
+def report(name, times):
+    """
+    Print the times (in milliseconds) of the different versions.
+    """
+    print(name)
+    for [version, elapsed] in times:
+        print("  {0:s} {1:.3f}ms".format(version, 1000.0 * elapsed))
+    print()
+
+
+def benchmarkCImageManipulation():
+    import storm_control.hal4000.halLib.c_image_manipulation_c as cIM
+
+    nim = spotsFrame(1024, 1024, 50).getData().reshape((1024, 1024))
+    rescaler = cIM.ImageRescaler()
+    report("rescaleImage", [["C", timeIt(cIM.rescaleImage, nim, False, True, False, [50, 300], None)],
+                            ["numpy", timeIt(cIM.rescaleImage, nim, False, True, False, [50, 300], None, True)],
+                            ["ImageRescaler", timeIt(rescaler.rescaleImage, nim, False, True, False, [50, 300], None)]])
+
+def benchmarkFocusQuality():
+    import storm_control.hal4000.focusLock.focusQuality as fq
+
+    a_frame = spotsFrame(1024, 1024, 10)
+    report("imageGradient", [["C", timeIt(fq.imageGradient, a_frame)],
+                             ["numpy", timeIt(fq.imageGradientPy, a_frame)]])
+
+def benchmarkLMMoment():
+    import storm_control.hal4000.spotCounter.lmmObjectFinder as lof
+
+    lof.initialize()
+    a_frame = spotsFrame(1024, 1024, 50)
+    max_candidates = lof.max_candidates
+    for threshold in [20, 100]:
+        lof.max_candidates = 0
+        c_time = timeIt(lof.findObjects, a_frame, threshold)
+        lof.max_candidates = max_candidates
+        report("findObjects, threshold " + str(threshold),
+               [["C", c_time],
+                ["numpy", timeIt(lof.findObjectsPy, a_frame, threshold)],
+                ["findObjects", timeIt(lof.findObjects, a_frame, threshold)]])
+    lof.cleanUp()
+
+    
+if (__name__ == "__main__"):
+    benchmarkCImageManipulation()
+    benchmarkFocusQuality()
+    benchmarkLMMoment()
+    
@@ -0,0 +1,30 @@
+#!/usr/bin/env python
+"""
+Tests of HAL's message timing metrics.
+
+The responses are saved in the 'metrics' dictionary and checked by
+the test once HAL exits.
+"""
+import storm_control.hal4000.testing.testActionsTCP as testActionsTCP
+import storm_control.hal4000.testing.testing as testing
+
+metrics = {}
+
+
+class GetMessageMetricsAction(testActionsTCP.GetMessageMetrics):
+
+    def __init__(self, name = None, **kwds):
+        super().__init__(**kwds)
+        self.name = name
+        
+    def checkMessage(self, tcp_message):
+        metrics[self.name] = [tcp_message.hasError(), tcp_message.getResponse("metrics")]
+
+class GetMessageMetrics1(testing.TestingTCP):
+
+    def __init__(self, **kwds):
+        super().__init__(**kwds)
+
+        self.test_actions = [GetMessageMetricsAction(name = "all"),
+                             GetMessageMetricsAction(name = "stage", module = "stage"),
+                             GetMessageMetricsAction(name = "test", test_mode = True)]
@@ -7,6 +7,9 @@ import storm_control.hal4000.testing.testing as testing
 
 import storm_control.test as test
 
+# The 'changes' in the 'new parameters' messages, checked by test_hal_params_6.
+changes = []
+
 #
 # Check the default parameters.
 #
@@ -111,3 +114,25 @@ class ParamTest5(testing.Testing):
         self.test_actions = [testActions.LoadParameters(filename = test.halXmlFilePathAndName(fname + ".xml")),
                              testActions.LoadParameters(filename = test.halXmlFilePathAndName(fname + ".xml")),
                              ParamTest5Action(p_name = fname)]
+
+
+#
+# Check the changes that settings.settings includes in 'new parameters'.
+#
+class ParamTest6(testing.Testing):
+
+    def __init__(self, **kwds):
+        super().__init__(**kwds)
+
+        self.test_actions = [testActions.LoadParameters(filename = test.halXmlFilePathAndName("256x256.xml")),
+                             testActions.LoadParameters(filename = test.halXmlFilePathAndName("256x512.xml")),
+                             testActions.SetParameters(p_name = "256x256"),
+                             testActions.SetParameters(p_name = "256x512"),
+                             testActions.SetParameters(p_name = "256x256")]
+
+    def processMessage(self, message):
+
+        if message.isType("new parameters"):
+            changes.append(message.getData().get("changes", None))
+
+        super().processMessage(message)
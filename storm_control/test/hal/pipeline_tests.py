@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+"""
+Tests of sending HAL several TCP messages without waiting for
+the responses.
+
+The responses are saved in the 'responses' dictionary and checked
+by the test once HAL exits.
+"""
+import storm_control.hal4000.testing.testActionsTCP as testActionsTCP
+import storm_control.hal4000.testing.testing as testing
+
+responses = {}
+
+
+def recorder(action_class):
+    """
+    Returns a sub-class of action_class that records the response.
+    """
+    class RecordAction(action_class):
+
+        def __init__(self, name = None, **kwds):
+            super().__init__(**kwds)
+            self.name = name
+
+        def checkMessage(self, tcp_message):
+            assert (tcp_message.getID() == self.tcp_message.getID())
+            responses[self.name] = {"error" : tcp_message.hasError(),
+                                    "order" : len(responses),
+                                    "response" : tcp_message.response,
+                                    "type" : tcp_message.getType()}
+
+    return RecordAction
+
+
+class Pipeline1(testing.TestingTCP):
+
+    def __init__(self, **kwds):
+        super().__init__(**kwds)
+
+        actions = [recorder(testActionsTCP.MoveStage)(name = "move", x = 10.0, y = 10.0),
+                   recorder(testActionsTCP.GetStagePosition)(name = "position"),
+                   recorder(testActionsTCP.MoveStage)(name = "move test", test_mode = True, x = 0.0, y = 0.0),
+                   recorder(testActionsTCP.SetParameters)(name = "parameters test", test_mode = True, name_or_index = 0),
+                   recorder(testActionsTCP.NoSuchMessage)(name = "no such message"),
+                   recorder(testActionsTCP.GetMessageMetrics)(name = "metrics", module = "stage")]
+        self.test_actions = [testActionsTCP.Pipeline(actions = actions)]
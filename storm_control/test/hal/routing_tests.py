@@ -0,0 +1,26 @@
+#!/usr/bin/env python
+"""
+Tests of HAL core's routing of messages to the modules.
+
+The results are saved in the 'routing' dictionary and checked by the
+test once HAL exits, as errors in processMessage() are caught by HAL.
+"""
+import storm_control.hal4000.testing.testing as testing
+
+routing = {}
+
+
+class MessageRouting1(testing.Testing):
+    """
+    Record which modules the 'start' message was routed to and the
+    fan out statistics up to this point.
+    """
+    def processMessage(self, message):
+
+        if message.isType("start"):
+            core = self.all_modules["core"]
+            routing["fan_out"] = dict(core.getFanOut())
+            routing["n_modules"] = len(core.modules)
+            routing["start"] = list(map(lambda x: x.module_name, core.getMessageRoute("start")))
+
+        super().processMessage(message)
@@ -0,0 +1,32 @@
+#!/usr/bin/env python
+"""
+Tests of getting frames from HAL using TCP.
+
+The responses are saved in the 'responses' dictionary and checked
+by the test once HAL exits.
+"""
+import storm_control.hal4000.testing.testActionsTCP as testActionsTCP
+import storm_control.hal4000.testing.testing as testing
+
+responses = {}
+
+
+class GetSnapshotAction(testActionsTCP.GetSnapshot):
+
+    def __init__(self, name = None, **kwds):
+        super().__init__(**kwds)
+        self.name = name
+        
+    def checkMessage(self, tcp_message):
+        responses[self.name] = tcp_message
+
+
+class GetSnapshot1(testing.TestingTCP):
+
+    def __init__(self, **kwds):
+        super().__init__(**kwds)
+
+        self.test_actions = [testActionsTCP.MoveStage(x = 10.0, y = 5.0),
+                             GetSnapshotAction(name = "camera1"),
+                             GetSnapshotAction(name = "test", test_mode = True),
+                             GetSnapshotAction(name = "no camera", camera = "camera9")]
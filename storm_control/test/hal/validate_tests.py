@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+"""
+Tests of validating several TCP messages with a single
+'Validate Sequence' message.
+
+The responses are saved in the 'responses' dictionary and checked
+by the test once HAL exits.
+"""
+import storm_control.hal4000.testing.testActions as testActions
+import storm_control.hal4000.testing.testActionsTCP as testActionsTCP
+import storm_control.hal4000.testing.testing as testing
+
+import storm_control.test as test
+
+responses = {}
+
+
+def recorder(action_class):
+    """
+    Returns a sub-class of action_class that records the response.
+    """
+    class RecordAction(action_class):
+
+        def __init__(self, record_as = None, **kwds):
+            super().__init__(**kwds)
+            self.record_as = record_as
+
+        def checkMessage(self, tcp_message):
+            assert (tcp_message.getID() == self.tcp_message.getID())
+            responses[self.record_as] = {"error" : tcp_message.hasError(),
+                                    "order" : len(responses),
+                                    "response" : tcp_message.response,
+                                    "test" : tcp_message.isTest(),
+                                    "type" : tcp_message.getType()}
+
+    return RecordAction
+
+
+class ValidateSequence1(testing.TestingTCP):
+
+    def __init__(self, **kwds):
+        super().__init__(**kwds)
+
+        directory = test.dataDirectory()
+        p_name = "256x256"
+
+        # The messages in the sequence don't have to be in test mode.
+        sequence = [recorder(testActionsTCP.SetParameters)(record_as = "parameters", name_or_index = p_name),
+                    recorder(testActionsTCP.TakeMovie)(record_as = "movie parameters",
+                                                       directory = directory,
+                                                       length = 50,
+                                                       name = "movie_01",
+                                                       parameters = p_name),
+                    recorder(testActionsTCP.TakeMovie)(record_as = "movie",
+                                                       directory = directory,
+                                                       length = 50,
+                                                       name = "movie_01"),
+                    recorder(testActionsTCP.MoveStage)(record_as = "move", x = 10.0, y = 10.0),
+                    recorder(testActionsTCP.SetParameters)(record_as = "no parameters", name_or_index = "no_such_parameters"),
+                    recorder(testActionsTCP.TakeMovie)(record_as = "bad length",
+                                                       directory = directory,
+                                                       length = 0,
+                                                       name = "movie_01"),
+                    recorder(testActionsTCP.NoSuchMessage)(record_as = "no such message")]
+
+        # This message is sent right after the 'Validate Sequence' message.
+        position = recorder(testActionsTCP.GetStagePosition)(record_as = "position")
+        
+        self.test_actions = [testActions.LoadParameters(filename = test.halXmlFilePathAndName(p_name + ".xml")),
+                             testActionsTCP.Pipeline(actions = [testActionsTCP.ValidateSequence(actions = sequence),
+                                                                position])]
+
+        
+class ValidateSequence2(testing.TestingTCP):
+    """
+    An empty sequence.
+    """
+    def __init__(self, **kwds):
+        super().__init__(**kwds)
+        self.test_actions = [recorder(testActionsTCP.ValidateSequence)(record_as = "empty", actions = [])]
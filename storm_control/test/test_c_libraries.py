@@ -1,8 +1,33 @@
 #!/usr/bin/env python
 """
 Tests of the C libraries.
+
+These also check that the C libraries give the same results as
+the numpy versions. c_libraries_benchmark.py compares their speed.
 """
 import numpy
+import pytest
+
+
+def gaussianImage(size, cx, cy, sigma, height):
+    """
+    Returns a (size[0], size[1]) image with a Gaussian at cx, cy.
+    """
+    [xi, yi] = numpy.mgrid[0:size[0], 0:size[1]]
+    return height * numpy.exp(-((xi - cx)*(xi - cx) + (yi - cy)*(yi - cy))/(2.0 * sigma * sigma))
+
+def spotsFrame(image_x, image_y, n_spots):
+    """
+    Returns a frame with some bright pixels on a noisy background.
+    """
+    import storm_control.hal4000.camera.frame as frame
+
+    rng = numpy.random.default_rng(1)
+    image = rng.poisson(100, size = (image_y, image_x)).astype(numpy.uint16)
+    for i in range(n_spots):
+        image[rng.integers(10, image_y - 10), rng.integers(10, image_x - 10)] += 500
+    return frame.Frame(image.ravel(), 0, image_x, image_y, "na")
+
 
 
 def testCImageManipulation():
@@ -29,8 +54,8 @@ def testCImageManipulation():
 
             # Convert to integer so that we don't have overflow issues when we
             # compare for differences between the two images.
-            c_nim = c_nim.astype(numpy.int)
-            py_nim = py_nim.astype(numpy.int)
+            c_nim = c_nim.astype(numpy.int32)
+            py_nim = py_nim.astype(numpy.int32)
 
             assert(c_image_min == py_image_min)
             assert(c_image_max == py_image_max)
@@ -86,9 +111,112 @@ def testLMMoment():
     lof.cleanUp()
 
 
+def testAFLockParity():
+    try:
+        import storm_control.sc_hardware.utility.af_lock_c as afLock
+    except OSError:
+        pytest.skip("The af_lock C library is not available.")
+
+    size = (32, 40)
+    image1 = gaussianImage(size, 16.0, 20.0, 2.0, 1000.0)
+    image2 = gaussianImage(size, 17.3, 18.6, 2.0, 1000.0)
+
+    afc = afLock.AFLockC(offset = 0.0)
+    [c_dx, c_dy, c_success, c_mag] = afc.findOffsetU16NM(image1.astype(numpy.uint16), image2.astype(numpy.uint16))
+    afc.cleanup()
+
+    afp = afLock.AFLockPy(offset = 0.0)
+    [py_dx, py_dy, py_res, py_mag] = afp.findOffset(image1.astype(numpy.uint16), image2.astype(numpy.uint16))
+
+    assert c_success
+    assert (abs(c_dx - py_dx) < 1.0e-2)
+    assert (abs(c_dy - py_dy) < 1.0e-2)
+    
+
+def testImageRescalerParity():
+    import storm_control.hal4000.halLib.c_image_manipulation_c as cIM
+
+    nim = numpy.random.randint(400, size = (300,200)).astype(numpy.uint16)
+    rescaler = cIM.ImageRescaler(n_threads = 4, tile_rows = 16)
+    for flip_h in [False, True]:
+        for flip_v in [False, True]:
+            for transpose in [False, True]:
+                for max_v in [None, 350]:
+                    [c_nim, c_min, c_max] = cIM.rescaleImage(nim, flip_h, flip_v, transpose, [50, 300], max_v)
+                    [t_nim, t_min, t_max] = rescaler.rescaleImage(nim, flip_h, flip_v, transpose, [50, 300], max_v)
+                    assert numpy.array_equal(c_nim, t_nim)
+                    assert (c_min == t_min)
+                    assert (c_max == t_max)
+
+                    # Downsampled.
+                    [t_nim, t_min, t_max] = rescaler.rescaleImage(nim, flip_h, flip_v, transpose, [50, 300], max_v, downsample = 3)
+                    [py_nim, py_min, py_max] = rescaler.rescaleImage(nim, flip_h, flip_v, transpose, [50, 300], max_v, downsample = 3, use_numpy = True)
+                    assert numpy.array_equal(t_nim, py_nim)
+                    assert (t_min == c_min)
+                    assert (t_max == c_max)
+                    if transpose:
+                        assert (t_nim.shape == (66, 100))
+                    else:
+                        assert (t_nim.shape == (100, 66))
+
+
+def testCorr2DGaussParity():
+    pytest.importorskip("storm_analysis")
+    import storm_control.sc_hardware.utility.corr_2d_gauss_c as c2dg
+
+    size = (20, 30)
+    sigma = 2.0
+    image = gaussianImage(size, 10.3, 13.8, sigma, 100.0)
+
+    c2d_c = c2dg.Corr2DGaussCNCG(size = size, sigma = sigma, verbose = False)
+    c2d_c.setImage(image)
+    [c_x, c_success, c_fn, c_status] = c2d_c.maximize()
+    c2d_c.cleanup()
+
+    c2d_py = c2dg.Corr2DGaussPyNCG(size = size, sigma = sigma)
+    c2d_py.setImage(image)
+    [py_x, py_success, py_fn, py_status] = c2d_py.maximize()
+
+    assert numpy.allclose(c_x, py_x, atol = 1.0e-2)
+
+
+def testFocusQualityParity():
+    import storm_control.hal4000.focusLock.focusQuality as fq
+
+    for [image_x, image_y] in [[64, 64], [128, 48]]:
+        a_frame = spotsFrame(image_x, image_y, 10)
+        assert (fq.imageGradient(a_frame) == fq.imageGradientPy(a_frame))
+
+
+def testLMMomentParity():
+    import storm_control.hal4000.spotCounter.lmmObjectFinder as lof
+
+    # Always use the C library in findObjects().
+    max_candidates = lof.max_candidates
+    lof.max_candidates = 0
+    lof.initialize()
+    try:
+        for [image_x, image_y, n_spots] in [[256, 256, 20], [128, 512, 50]]:
+            a_frame = spotsFrame(image_x, image_y, n_spots)
+            for threshold in [20, 100]:
+                [c_x, c_y, c_n] = lof.findObjects(a_frame, threshold)
+                [py_x, py_y, py_n] = lof.findObjectsPy(a_frame, threshold)
+                assert (c_n == py_n)
+                assert numpy.array_equal(c_x, py_x)
+                assert numpy.array_equal(c_y, py_y)
+    finally:
+        lof.max_candidates = max_candidates
+        lof.cleanUp()
+
+
 if (__name__ == "__main__"):
     testCImageManipulation()
     testFocusQuality()
     testLMMoment()
+    testAFLockParity()
+    testCorr2DGaussParity()
+    testFocusQualityParity()
+    testImageRescalerParity()
+    testLMMomentParity()
     
     
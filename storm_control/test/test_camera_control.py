@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+"""
+Tests of batched frame delivery and backpressure in CameraControl.
+"""
+import numpy
+
+import storm_control.test as test
+
+import storm_control.hal4000.camera.frame as frame
+
+
+class Consumer(object):
+
+    def __init__(self, camera_functionality, **kwds):
+        super().__init__(**kwds)
+        self.batches = []
+        self.frames = []
+        self.live = []
+        camera_functionality.newFrame.connect(self.frames.append)
+        camera_functionality.newFrames.connect(self.batches.append)
+        camera_functionality.newLiveFrames.connect(self.live.extend)
+
+
+def makeFrames(camera, n_frames):
+    frames = []
+    for i in range(n_frames):
+        frames.append(camera.makeFrame())
+    return frames
+
+
+def test_camera_control_1():
+    """
+    Check that consumers get all the frames when we are not behind.
+    """
+    camera = test.makeNoneCamera(backpressure_limit = 2, backpressure_policy = "display")
+    consumer = Consumer(camera.getCameraFunctionality())
+
+    for i in range(3):
+        camera.handleNewData(makeFrames(camera, 2))
+
+    assert (len(consumer.frames) == 6)
+    assert (len(consumer.batches) == 3)
+    assert (len(consumer.live) == 6)
+    assert (camera.getCameraFunctionality().getLiveFramesDropped() == 0)
+
+
+def test_camera_control_2():
+    """
+    Check that only live consumers drop frames when we are behind.
+    """
+    camera = test.makeNoneCamera(backpressure_limit = 2, backpressure_policy = "display")
+    consumer = Consumer(camera.getCameraFunctionality())
+
+    batch1 = makeFrames(camera, 3)
+    batch2 = makeFrames(camera, 3)
+    camera.handleNewData(batch1)
+    camera.handleNewData(batch2)
+
+    assert ([x.frame_number for x in consumer.frames] == list(range(6)))
+    assert (len(consumer.batches) == 2)
+    assert ([x.frame_number for x in consumer.live] == [2, 3, 4, 5])
+    assert (camera.getCameraFunctionality().getLiveFramesDropped() == 2)
+
+
+def test_camera_control_3():
+    """
+    Check that nothing is dropped with the 'never' policy.
+    """
+    camera = test.makeNoneCamera(backpressure_limit = 2)
+    consumer = Consumer(camera.getCameraFunctionality())
+
+    batch1 = makeFrames(camera, 3)
+    batch2 = makeFrames(camera, 3)
+    camera.handleNewData(batch1)
+    camera.handleNewData(batch2)
+
+    assert (len(consumer.live) == 6)
+
+
+def test_camera_control_4():
+    """
+    Check frame stacking.
+    """
+    camera = test.makeNoneCamera()
+    frames = makeFrames(camera, 3)
+    stack = frame.stackFrames(frames)
+
+    [size_x, size_y] = camera.fake_frame_size
+    assert (stack.shape == (3, size_y, size_x))
+    for i in range(3):
+        assert numpy.array_equal(stack[i].ravel(), frames[i].getData())
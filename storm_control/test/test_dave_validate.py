@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+"""
+Test validating a Dave sequence in batches.
+"""
+import storm_control.sc_library.hdebug as hdebug
+import storm_control.sc_library.parameters as params
+import storm_control.sc_library.tcpMessage as tcpMessage
+import storm_control.sc_library.tcpServer as tcpServer
+import storm_control.test as test
+
+import storm_control.dave.dave as dave
+
+
+class FakeHAL(object):
+    """
+    Responds to Dave like HAL would, all the messages are valid.
+    """
+    def __init__(self, batches = True, **kwds):
+        super().__init__(**kwds)
+        self.batches = batches
+        self.received = []
+        self.server = tcpServer.TCPServer(port = 9000, server_name = "HAL")
+        self.server.messageReceived.connect(self.handleMessageReceived)
+
+    def close(self):
+        self.server.close()
+
+    def handleMessageReceived(self, message):
+        self.received.append(message.getType())
+        if message.isType("Validate Sequence"):
+            if self.batches:
+                results = []
+                for json_dict in message.getData("messages"):
+                    results.append(self.testMessage(tcpMessage.TCPMessage.fromDict(json_dict)).toDict())
+                message.addResponse("results", results)
+            else:
+                message.setError(True, "This message was not handled.")
+        else:
+            self.testMessage(message)
+        self.server.sendMessage(message)
+
+    def testMessage(self, message):
+        assert message.isTest()
+        message.addResponse("duration", 1.0)
+        if message.isType("Take Movie"):
+            message.addResponse("disk_usage", 2.0)
+        return message
+        
+
+def validate(qtbot, fake_hal):
+    parameters = params.parameters(test.daveXmlFilePathAndName("test_default.xml"))
+    hdebug.startLogging(test.logDirectory(), "dave")
+    mainw = dave.Dave(parameters)
+    qtbot.addWidget(mainw)
+    try:
+        mainw.newSequence(test.daveXmlFilePathAndName("validate_sequence.xml"))
+        mainw.handleValidateCommandSequence(False)
+        qtbot.waitUntil(lambda : mainw.sequence_validated, timeout = 5000)
+
+        assert mainw.ui.commandSequenceTreeView.isAllValid()
+        assert (mainw.ui.commandSequenceTreeView.getEstimates() == [6.0, 4.0])
+    finally:
+        fake_hal.close()
+        
+        
+def test_dave_validate_1(qtbot):
+    """
+    Validate the sequence with a single message.
+    """
+    fake_hal = FakeHAL()
+    validate(qtbot, fake_hal)
+    assert (fake_hal.received == ["Validate Sequence"])
+
+
+def test_dave_validate_2(qtbot):
+    """
+    Validate the sequence one action at a time if HAL does not
+    support batches.
+    """
+    fake_hal = FakeHAL(batches = False)
+    validate(qtbot, fake_hal)
+    assert (fake_hal.received == ["Validate Sequence", "Move Stage", "Set Parameters", "Take Movie", "Move Stage"])
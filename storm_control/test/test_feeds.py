@@ -0,0 +1,326 @@
+#!/usr/bin/env python
+"""
+Tests of the feeds.
+"""
+import numpy
+import sys
+
+from PyQt5 import QtCore, QtWidgets
+
+import storm_control.sc_library.parameters as params
+import storm_control.test as test
+
+import storm_control.hal4000.feeds.feeds as feeds
+
+
+def makeFeed(feed_type, **kwds):
+    """
+    Returns a camera and a feed of the requested type driven by the camera.
+    """
+    kwds["feed_type"] = feed_type
+    kwds["source"] = "camera1"
+    [camera, controller] = makeFeeds({"feed" : kwds})
+    return [camera, controller.getFeed("camera1.feed")]
+
+
+def makeFeeds(feed_dicts):
+    """
+    Returns a camera and a feed controller with feeds driven by the camera.
+    """
+    camera = test.makeNoneCamera(frame_bank_size = 8)
+    
+    parameters = params.StormXMLObject()
+    for feed_name, feed_dict in feed_dicts.items():
+        feed_params = params.StormXMLObject()
+        for key, value in feed_dict.items():
+            feed_params.set(key, value)
+        parameters.addSubSection(feed_name, feed_params)
+
+    controller = feeds.FeedController(parameters = parameters)
+    for feed in controller.getCameraFeeds():
+        controller.setCameraFunctionality(feed.getCameraName(), camera.camera_functionality)
+    return [camera, controller]
+
+
+def runFeed(camera, feed, batches):
+    """
+    Send batches of frames from the camera, returns the camera frames,
+    the feed frames and the order of the feed signals.
+    """
+    [cam_frames, feed_frames, events] = runFeeds(camera, [feed], batches)
+    return [cam_frames, feed_frames[0], events[0]]
+
+
+def runFeeds(camera, feeds, batches):
+    """
+    Send batches of frames from the camera, returns the camera frames
+    and lists of the feed frames and the order of the feed signals
+    for each feed.
+    """
+    cam_fn = camera.camera_functionality
+    cam_frames = []
+    events = []
+    feed_frames = []
+    loop = QtCore.QEventLoop()
+    
+    def connectFeed(feed, f_events, f_frames):
+        def handleNewFrames(frames):
+            f_events.append("frames")
+            f_frames.extend(frames)
+
+        def handleStopped():
+            f_events.append("stopped")
+            if all(map(lambda x: ("stopped" in x), events)):
+                loop.quit()
+
+        feed.newFrames.connect(handleNewFrames)
+        feed.started.connect(lambda : f_events.append("started"))
+        feed.stopped.connect(handleStopped)
+
+    for feed in feeds:
+        events.append([])
+        feed_frames.append([])
+        connectFeed(feed, events[-1], feed_frames[-1])
+
+    cam_fn.started.emit()
+    for i in range(batches):
+        frames = [camera.makeFrame(), camera.makeFrame()]
+        cam_frames.extend(frames)
+        cam_fn.emitFrames(frames)
+    cam_fn.stopped.emit()
+
+    QtCore.QTimer.singleShot(10000, loop.quit)
+    loop.exec_()
+    return [cam_frames, feed_frames, events]
+
+
+def test_feeds_1(qapp):
+    """
+    Average feed.
+    """
+    [camera, feed] = makeFeed("average", frames_to_average = 3)
+    [cam_frames, feed_frames, events] = runFeed(camera, feed, 3)
+
+    assert (events[0] == "started")
+    assert (events[-1] == "stopped")
+    assert (len(feed_frames) == 2)
+
+    frames = list(map(lambda x: x.getData().astype(numpy.uint32), cam_frames))
+    for i, feed_frame in enumerate(feed_frames):
+        expected = (frames[3*i] + frames[3*i+1] + frames[3*i+2])//3
+        assert (feed_frame.frame_number == i)
+        assert (feed_frame.getData().dtype == numpy.uint16)
+        assert numpy.array_equal(feed_frame.getData(), expected)
+
+    # The feed frames are not the averaging buffer.
+    assert not numpy.shares_memory(feed_frames[0].getData(), feed.average_frame)
+    assert not numpy.array_equal(feed_frames[0].getData(), feed_frames[1].getData())
+
+
+def test_feeds_2(qapp):
+    """
+    Average feed reset.
+    """
+    [camera, feed] = makeFeed("average", frames_to_average = 3)
+
+    # The reset is handled after the first batch of frames.
+    camera.camera_functionality.emitFrames([camera.makeFrame(), camera.makeFrame()])
+    feed.reset()
+    [cam_frames, feed_frames, events] = runFeed(camera, feed, 2)
+
+    assert (len(feed_frames) == 1)
+    assert (feed_frames[0].frame_number == 0)
+
+    expected = cam_frames[0].getData().astype(numpy.uint32)
+    expected += cam_frames[1].getData()
+    expected += cam_frames[2].getData()
+    assert numpy.array_equal(feed_frames[0].getData(), expected//3)
+
+
+def test_feeds_3(qapp):
+    """
+    A slice that covers the full width of the frame is a view, other
+    slices are copies.
+    """
+    [camera, feed] = makeFeed("slice", y_start = 11, y_end = 20)
+    [cam_frames, feed_frames, events] = runFeed(camera, feed, 1)
+    assert (events == ["started", "frames", "stopped"])
+    assert (len(feed_frames) == 2)
+
+    data = feed_frames[0].getData()
+    expected = numpy.reshape(cam_frames[0].getData(), (512, 512))[10:20,:]
+    assert numpy.array_equal(data, expected)
+    assert numpy.shares_memory(data, cam_frames[0].getData())
+
+    [camera, feed] = makeFeed("slice", x_start = 11, x_end = 30)
+    [cam_frames, feed_frames, events] = runFeed(camera, feed, 1)
+
+    data = feed_frames[0].getData()
+    expected = numpy.reshape(cam_frames[0].getData(), (512, 512))[:,10:30]
+    assert data.flags.c_contiguous
+    assert numpy.array_equal(data, expected)
+    assert not numpy.shares_memory(data, cam_frames[0].getData())
+
+
+def test_feeds_4(qapp):
+    """
+    Feed graph, a slice shared by a max projection and a standard deviation feed.
+    """
+    [camera, controller] = makeFeeds({"fmax" : {"source" : "slice",
+                                                "feed_type" : "max",
+                                                "frames_to_max" : 3},
+                                      "fstd" : {"source" : "slice",
+                                                "feed_type" : "std",
+                                                "x_start" : 5,
+                                                "x_end" : 12},
+                                      "slice" : {"source" : "camera1",
+                                                 "feed_type" : "slice",
+                                                 "x_start" : 101,
+                                                 "x_end" : 120,
+                                                 "y_start" : 51,
+                                                 "y_end" : 60}})
+    assert (controller.getFeedNames() == ["camera1.slice", "camera1.slice.fmax", "camera1.slice.fstd"])
+    assert (len(controller.getCameraFeeds()) == 1)
+    assert controller.allFeedsFunctional()
+
+    # The slice is shared.
+    s_feed = controller.getFeed("camera1.slice")
+    m_feed = controller.getFeed("camera1.slice.fmax")
+    d_feed = controller.getFeed("camera1.slice.fstd")
+    assert (m_feed.getCameraFunctionality() is s_feed)
+    assert (d_feed.getCameraFunctionality() is s_feed)
+
+    # The feed AOI is relative to it's source feed.
+    assert (d_feed.getParameter("x_start") == 105)
+    assert (d_feed.getParameter("x_pixels") == 8)
+    assert (d_feed.getParameter("y_start") == 51)
+    
+    [cam_frames, feed_frames, events] = runFeeds(camera, [m_feed, d_feed], 3)
+    for f_events in events:
+        assert (f_events[0] == "started")
+        assert (f_events[-1] == "stopped")
+
+    sliced = numpy.array(list(map(lambda x: numpy.reshape(x.getData(), (512, 512))[50:60,100:120], cam_frames)))
+    assert (len(feed_frames[0]) == 6)
+    for i, m_frame in enumerate(feed_frames[0]):
+        assert numpy.array_equal(m_frame.getData(), numpy.max(sliced[max(0, i-2):i+1], axis = 0))
+
+    assert (len(feed_frames[1]) == 6)
+    for i, d_frame in enumerate(feed_frames[1]):
+        expected = numpy.std(sliced[:i+1,:,4:12].astype(numpy.float64), axis = 0)
+        assert (numpy.max(numpy.abs(d_frame.getData() - expected)) < 1.0)
+    assert (numpy.max(feed_frames[1][-1].getData()) > 0)
+
+
+def test_feeds_5(qapp):
+    """
+    Background subtraction feed.
+    """
+    [camera, feed] = makeFeed("background", background_frames = 2, offset = 10)
+    [cam_frames, feed_frames, events] = runFeed(camera, feed, 3)
+    assert (len(feed_frames) == 6)
+
+    # The background is the average of the previous two frames.
+    frames = list(map(lambda x: x.getData().astype(numpy.float64), cam_frames))
+    for i, feed_frame in enumerate(feed_frames):
+        if (i == 0):
+            background = frames[0]
+        else:
+            background = numpy.mean(frames[max(0, i-2):i], axis = 0)
+        expected = numpy.clip(frames[i] - background + 10, 0, 65535)
+        assert (numpy.max(numpy.abs(feed_frame.getData() - expected)) < 1.0)
+
+    # The first frame is just the offset.
+    assert numpy.all(feed_frames[0].getData() == 10)
+
+
+def test_feeds_6(qapp):
+    """
+    Feed graph errors.
+    """
+    feed_params = params.StormXMLObject()
+    for [name, source] in [["a", "b"], ["b", "c"], ["c", "a"]]:
+        fp = params.StormXMLObject()
+        fp.set("source", source)
+        fp.set("feed_type", "slice")
+        feed_params.addSubSection(name, fp)
+
+    try:
+        feeds.FeedController(parameters = feed_params)
+    except feeds.FeedException:
+        pass
+    else:
+        assert False
+
+    # Check feeds whose source is a feed.
+    camera = test.makeNoneCamera(frame_bank_size = 8)
+    parameters = params.StormXMLObject()
+    parameters.addSubSection("camera1", camera.parameters)
+    feed_params = params.StormXMLObject()
+    for [name, source, x_end] in [["a", "camera1", 100], ["b", "a", None]]:
+        fp = params.StormXMLObject()
+        fp.set("source", source)
+        fp.set("feed_type", "slice")
+        if x_end is not None:
+            fp.set("x_end", x_end)
+        feed_params.addSubSection(name, fp)
+    parameters.addSubSection("feeds", feed_params)
+    feeds.checkParameters(parameters)
+
+    feed_params.get("b").set("x_start", 3)
+    try:
+        feeds.checkParameters(parameters)
+    except feeds.FeedException:
+        pass
+    else:
+        assert False
+
+
+
+def test_feeds_7(qapp):
+    """
+    Queued live batches are dropped when the camera is dropping live
+    frames, but not while filming.
+    """
+    [camera, feed] = makeFeed("average", frames_to_average = 2)
+
+    # Pretend the worker is busy so that the batches stay queued.
+    feed.busy = True
+    for i in range(3):
+        feed.queueEvent(["frames", [i], True])
+    assert (list(feed.events) == [["frames", [2], True]])
+
+    # Batches that the camera is not dropping are all kept.
+    feed.events.clear()
+    for i in range(3):
+        feed.queueEvent(["frames", [i], (i != 1)])
+    assert (len(feed.events) == 3)
+
+    # Nothing is dropped while filming.
+    feed.events.clear()
+    feed.setFilming(True)
+    for i in range(3):
+        feed.queueEvent(["frames", [i], True])
+    assert (len(feed.events) == 3)
+
+    # Batches are not moved past other events.
+    feed.events.clear()
+    feed.setFilming(False)
+    feed.queueEvent(["frames", [0], True])
+    feed.queueEvent(["stopped"])
+    feed.queueEvent(["frames", [1], True])
+    assert (len(feed.events) == 3)
+
+    feed.events.clear()
+    feed.busy = False
+
+
+if (__name__ == "__main__"):
+    app = QtWidgets.QApplication(sys.argv)
+    test_feeds_1(app)
+    test_feeds_2(app)
+    test_feeds_3(app)
+    test_feeds_4(app)
+    test_feeds_5(app)
+    test_feeds_6(app)
+    test_feeds_7(app)
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+"""
+Tests of the spot counter object finding.
+"""
+import numpy
+import pytest
+import sys
+
+from PyQt5 import QtCore, QtWidgets
+
+import storm_control.hal4000.camera.frame as frame
+import storm_control.hal4000.spotCounter.findSpots as findSpots
+import storm_control.hal4000.spotCounter.lmmObjectFinder as lmmObjectFinder
+
+
+def spotsFrame(image_x, image_y, n_spots, frame_number = 0):
+    """
+    Returns a frame with some bright pixels on a noisy background.
+    """
+    rng = numpy.random.default_rng(frame_number)
+    image = rng.poisson(100, size = (image_y, image_x)).astype(numpy.uint16)
+    for i in range(n_spots):
+        image[rng.integers(10, image_y - 10), rng.integers(10, image_x - 10)] += 500
+    return frame.Frame(image.ravel(), frame_number, image_x, image_y, "camera1")
+
+
+def analyzeFrames(backend, frames):
+    """
+    Analyze frames with a SpotCounter, returns a dictionary of the
+    localizations keyed by frame number.
+    """
+    spot_counter = findSpots.SpotCounter(backend = backend,
+                                         max_threads = 2,
+                                         max_size = 128 * 256)
+    results = {}
+    loop = QtCore.QEventLoop()
+    timer = QtCore.QTimer()
+    timer.setSingleShot(True)
+    timer.timeout.connect(loop.quit)
+
+    def handleImageProcessed(frame_analysis):
+        results[frame_analysis.getFrameNumber()] = frame_analysis.getLocalizations()
+        loop.quit()
+
+    spot_counter.imageProcessed.connect(handleImageProcessed)
+
+    # Analyze the frames one at a time so that none are dropped.
+    for a_frame in frames:
+        spot_counter.newFrameToAnalyze("camera1", a_frame, 100)
+        timer.start(20000)
+        loop.exec_()
+        timer.stop()
+
+    spot_counter.cleanUp()
+    assert (spot_counter.dropped == 0)
+    return results
+
+
+def test_find_spots_1():
+    """
+    The numpy object finder is used if the C library is not available.
+    """
+    lmmObjectFinder.initialize()
+    a_frame = spotsFrame(256, 128, 20)
+    [x, y, n] = lmmObjectFinder.findObjects(a_frame, 100)
+    lmmObjectFinder.cleanUp()
+
+    lmmoment = lmmObjectFinder.lmmoment
+    lmmObjectFinder.lmmoment = None
+    try:
+        [py_x, py_y, py_n] = lmmObjectFinder.findObjects(a_frame, 100)
+    finally:
+        lmmObjectFinder.lmmoment = lmmoment
+
+    assert (n == 20)
+    assert (py_n == n)
+    assert numpy.array_equal(py_x, x)
+    assert numpy.array_equal(py_y, y)
+
+
+@pytest.mark.skipif(sys.version_info < (3, 8), reason = "the processes backend requires Python 3.8")
+def test_find_spots_2(qapp):
+    """
+    The process pool backend gives the same results as the thread backend.
+    """
+    frames = []
+    for i in range(4):
+        frames.append(spotsFrame(256, 128, 10 + i, frame_number = i))
+
+    p_results = analyzeFrames("processes", frames)
+    t_results = analyzeFrames("threads", frames)
+
+    assert (len(p_results) == len(frames))
+    assert (len(t_results) == len(frames))
+    lmmObjectFinder.initialize()
+    for i, a_frame in enumerate(frames):
+        [x, y, n] = lmmObjectFinder.findObjects(a_frame, 100)
+        assert (n > 0)
+        for results in [p_results, t_results]:
+            assert numpy.array_equal(results[i][0], x[:n])
+            assert numpy.array_equal(results[i][1], y[:n])
+    lmmObjectFinder.cleanUp()
+
+
+if (__name__ == "__main__"):
+    test_find_spots_1()
+    test_find_spots_2(QtWidgets.QApplication(sys.argv))
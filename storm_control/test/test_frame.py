@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+"""
+Tests of the frame statistics.
+"""
+import numpy
+import threading
+
+import storm_control.hal4000.camera.frame as frame
+import storm_control.hal4000.spotCounter.findSpots as findSpots
+
+
+def makeFrame(image):
+    return frame.Frame(image.ravel(), 0, image.shape[1], image.shape[0], "camera1")
+
+
+def test_frame_stats_1():
+    """
+    Check the statistics against numpy.
+    """
+    numpy.random.seed(1)
+    image = numpy.random.randint(100, 60000, size = (64, 48)).astype(numpy.uint16)
+    a_frame = makeFrame(image)
+    stats = a_frame.getStats()
+    assert (a_frame.getStats() is stats)
+
+    assert (stats.getMin() == numpy.min(image))
+    assert (stats.getMax() == numpy.max(image))
+    assert (stats.getMean() == numpy.mean(image.astype(numpy.int32)))
+    assert (stats.getSaturated(50000) == numpy.count_nonzero(image >= 50000))
+    assert (stats.getSaturated(65535) == 0)
+
+    [counts, edges] = numpy.histogram(image, bins = 64, range = (0, 65536))
+    assert numpy.array_equal(stats.getHistogram(64), counts)
+    assert (numpy.sum(stats.getHistogram()) == image.size)
+
+
+def test_frame_stats_2():
+    """
+    Check that statistics are only computed once.
+    """
+    a_frame = makeFrame(numpy.ones((16, 16), dtype = numpy.uint16))
+    stats = a_frame.getStats()
+
+    calls = []
+    def gradient():
+        calls.append(1)
+        return 1.5
+
+    threads = []
+    for i in range(4):
+        threads.append(threading.Thread(target = lambda : stats.getValue("gradient", gradient)))
+        threads[-1].start()
+    for thread in threads:
+        thread.join()
+    assert (stats.getValue("gradient", gradient) == 1.5)
+    assert (len(calls) == 1)
+
+    # Values that are set by another module (like the display) are not re-computed.
+    stats.setMinMax(0, 10)
+    assert (stats.getMinMax() == [0, 10])
+
+
+def test_frame_stats_3():
+    """
+    The spot counter does not analyze frames whose range is less than the threshold.
+    """
+    image = numpy.zeros((64, 64), dtype = numpy.uint16) + 100
+    image[20,20] = 150
+    a_frame = makeFrame(image)
+
+    analysis = findSpots.FrameAnalysis(camera_name = "camera1",
+                                       frame = a_frame,
+                                       threshold = 100)
+    analysis.analyzeImage()
+    assert (analysis.getCounts() == 0)
+    assert (len(analysis.getLocalizations()[0]) == 0)
+    assert (a_frame.getStats().getMinMax() == [100, 150])
+
+
+if (__name__ == "__main__"):
+    test_frame_stats_1()
+    test_frame_stats_2()
+    test_frame_stats_3()
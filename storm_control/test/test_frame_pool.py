@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+"""
+Tests of the camera frame buffer pool.
+"""
+import numpy
+
+import storm_control.hal4000.camera.framePool as framePool
+
+
+def test_frame_pool_1():
+    """
+    Check that buffers are re-used once they are released.
+    """
+    pool = framePool.FramePool(n_buffers = 2)
+    pool.setFrameSize(2 * 64 * 64)
+
+    b1 = pool.getBuffer()
+    assert (b1.size == 64 * 64)
+    assert (b1.dtype == numpy.uint16)
+    assert (pool.getStats()["in use"] == 1)
+
+    b1 = None
+    assert (pool.getStats()["in use"] == 0)
+
+    for i in range(5):
+        b1 = pool.getBuffer()
+        b1 = None
+
+    stats = pool.getStats()
+    assert (stats["buffers"] == 2)
+    assert (stats["misses"] == 0)
+
+
+def test_frame_pool_2():
+    """
+    Check that buffers that are still in use are not re-used.
+    """
+    pool = framePool.FramePool(n_buffers = 2)
+    pool.setFrameSize(2 * 32 * 32)
+
+    b1 = pool.getBuffer()
+    b1[:] = 1
+
+    # A view of the buffer should also keep it in use.
+    b1 = b1.reshape((32, 32))[2:5,:]
+    b2 = pool.getBuffer()
+    b2[:] = 2
+    b3 = pool.getBuffer()
+    b3[:] = 3
+
+    assert numpy.all(b1 == 1)
+    assert numpy.all(b2 == 2)
+
+    stats = pool.getStats()
+    assert (stats["buffers"] == 3)
+    assert (stats["in use"] == 3)
+    assert (stats["misses"] == 1)
+
+
+def test_frame_pool_3():
+    """
+    Check that the pool is re-allocated when the frame size changes.
+    """
+    pool = framePool.FramePool(n_buffers = 2)
+    pool.setFrameSize(2 * 32 * 32)
+    b1 = pool.getBuffer()
+
+    pool.setFrameSize(2 * 64 * 32)
+    b2 = pool.getBuffer()
+    assert (b1.size == 32 * 32)
+    assert (b2.size == 64 * 32)
+    assert (pool.getStats()["in use"] == 1)
+
+
+if (__name__ == "__main__"):
+    test_frame_pool_1()
+    test_frame_pool_2()
+    test_frame_pool_3()
@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+"""
+Test of HAL's frame path benchmark.
+"""
+import os
+
+import storm_control.test as test
+
+import storm_control.hal4000.testing.benchmark as benchmark
+
+
+def test_hal_benchmark_1():
+
+    results = benchmark.runBenchmark(directory = test.dataDirectory(),
+                                     frame_rate = 100.0,
+                                     frames = 30,
+                                     parameters_file = test.halXmlFilePathAndName("feed_examples.xml"),
+                                     results_file = os.path.join(test.dataDirectory(), "benchmark.json"),
+                                     writer_queue_size = 10)
+
+    # Check that we got all of the frames and that the writer did not drop any.
+    assert(results["frames"]["camera"] == 30)
+    assert(results["dropped"]["camera"] == 0)
+    assert(results["dropped"]["writers"] == 0)
+
+    # Check that all of the stages were measured.
+    for stage in ["camera1", "display", "spot counter"]:
+        assert(results["latency_ms"][stage]["n"] > 0)
+    assert(len([x for x in results["latency_ms"] if x.startswith("feed ")]) > 0)
+    assert(results["latency_ms"]["writer benchmark.dax"]["n"] == 30)
+
+    # Check that the display rendered some frames.
+    assert(results["display"]["rendered"] > 0)
+    assert(results["display"]["rendered"] + results["display"]["skipped"] <= 30)
+
+    
+if (__name__ == "__main__"):
+    test_hal_benchmark_1()
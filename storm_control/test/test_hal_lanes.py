@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+"""
+Test of HalModule worker lanes.
+"""
+import sys
+import threading
+
+from PyQt5 import QtCore, QtWidgets
+
+import storm_control.hal4000.halLib.halMessage as halMessage
+import storm_control.hal4000.halLib.halModule as halModule
+
+
+class LanesModule(halModule.HalModule):
+    """
+    Messages are put in the lane given by the 'lane' field of their data.
+    """
+    def __init__(self, **kwds):
+        super().__init__(**kwds)
+        self.events = []
+        self.lock = threading.Lock()
+        self.release = threading.Event()
+
+    def getLane(self, message):
+        return message.getData()["lane"]
+
+    def processMessage(self, message):
+        name = message.getData()["name"]
+        self.addEvent("process " + name)
+        if message.getData()["block"]:
+            halModule.runWorkerTask(self, message, lambda : self.blockingTask(name))
+        else:
+            halModule.runWorkerTask(self, message, lambda : self.addEvent("task " + name))
+
+    def addEvent(self, event):
+        with self.lock:
+            self.events.append(event)
+
+    def blockingTask(self, name):
+        # Wait until all the messages in the other lane are done.
+        assert self.release.wait(5.0)
+        self.addEvent("task " + name)
+
+
+def runMessages(module, messages, release_after):
+    """
+    Send the messages to module and wait for them to be processed.
+    """
+    processed = []
+    def handleProcessed(message):
+        processed.append(message.getData()["name"])
+        if (message.getData()["name"] == release_after):
+            module.release.set()
+        if (len(processed) == len(messages)):
+            loop.quit()
+
+    loop = QtCore.QEventLoop()
+    for message in messages:
+        message.processed.connect(handleProcessed)
+        message.incRefCount()
+        module.handleMessage(message)
+
+    QtCore.QTimer.singleShot(10000, loop.quit)
+    loop.exec_()
+    return processed
+
+
+def test_hal_lanes_1(qapp):
+    """
+    A blocked worker in one lane should not stop the other lane, and
+    messages should stay in order within a lane.
+    """
+    max_threads = halModule.threadpool.maxThreadCount()
+    halModule.threadpool.setMaxThreadCount(max(2, max_threads))
+    try:
+        module = LanesModule(module_name = "lanes")
+        messages = []
+        for [name, lane, block] in [["a1", "a", True],
+                                    ["b1", "b", False],
+                                    ["a2", "a", False],
+                                    ["b2", "b", False]]:
+            messages.append(halMessage.HalMessage(m_type = "lanes",
+                                                  source = module,
+                                                  data = {"name" : name,
+                                                          "lane" : lane,
+                                                          "block" : block}))
+        processed = runMessages(module, messages, "b2")
+    finally:
+        halModule.threadpool.setMaxThreadCount(max_threads)
+
+    # Lane 'b' finished while lane 'a' was blocked.
+    assert (processed == ["b1", "b2", "a1", "a2"])
+
+    # Order within a lane.
+    events = module.events
+    for lane in ["a", "b"]:
+        lane_events = list(filter(lambda x: (x[-2] == lane), events))
+        assert (lane_events == ["process " + lane + "1", "task " + lane + "1",
+                                "process " + lane + "2", "task " + lane + "2"])
+
+    # 'a2' was not processed until the worker for 'a1' finished.
+    assert (events.index("process a2") > events.index("task a1"))
+    assert (len(module.workers) == 0)
+
+
+def test_hal_lanes_2(qapp):
+    """
+    The default is a single lane, so a running worker blocks the module.
+    """
+    module = LanesModule(module_name = "one_lane")
+    module.getLane = lambda message : None
+    module.release.set()
+
+    messages = []
+    for name in ["a1", "b1", "a2"]:
+        messages.append(halMessage.HalMessage(m_type = "lanes",
+                                              source = module,
+                                              data = {"name" : name,
+                                                      "lane" : None,
+                                                      "block" : (name == "a1")}))
+    processed = runMessages(module, messages, None)
+
+    assert (processed == ["a1", "b1", "a2"])
+    assert (module.events == ["process a1", "task a1",
+                              "process b1", "task b1",
+                              "process a2", "task a2"])
+
+
+if (__name__ == "__main__"):
+    app = QtWidgets.QApplication(sys.argv)
+    test_hal_lanes_1(app)
+    test_hal_lanes_2(app)
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+"""
+Test HAL's message timing metrics.
+"""
+import storm_control.hal4000.halLib.halMetrics as halMetrics
+
+from storm_control.test.hal.standardHalTest import halTest
+
+import storm_control.test.hal.metrics_tests as metricsTests
+
+
+def test_hal_metrics_1():
+    """
+    Test histogram statistics.
+    """
+    hist = halMetrics.Histogram()
+    for i in range(100):
+        hist.add(1.0 + 0.01 * i)
+    hist.add(1000.0)
+
+    summary = hist.getSummary()
+    assert(summary["n"] == 101)
+    assert(summary["max"] == 1000.0)
+    assert(summary["p50"] >= 1.0) and (summary["p50"] <= 2.56)
+    assert(summary["p99"] <= 2.56)
+    assert(abs(summary["mean"] - summary["total"]/101.0) < 1.0e-6)
+
+
+def test_hal_metrics_2():
+    """
+    Test getting the metrics using TCP.
+    """
+    halTest(config_xml = "none_tcp_config.xml",
+            class_name = "GetMessageMetrics1",
+            test_module = "storm_control.test.hal.metrics_tests")
+
+    # All the metrics.
+    [error, metrics] = metricsTests.metrics["all"]
+    assert not error
+    assert(metrics["core"]["configure1"]["queue"]["n"] == 1)
+    assert(metrics["core"]["configure1"]["process"]["n"] == 1)
+    for name in ["film", "stage", "testing"]:
+        assert(metrics[name]["configure1"]["process"]["n"] == 1)
+        assert(metrics[name]["configure1"]["queue"]["n"] == 1)
+
+    # The camera is started by a worker.
+    assert(metrics["camera1"]["start camera"]["worker"]["n"] > 0)
+
+    # The metrics for a single module.
+    [error, metrics] = metricsTests.metrics["stage"]
+    assert not error
+    assert(list(metrics.keys()) == ["stage"])
+
+    # Test mode.
+    [error, metrics] = metricsTests.metrics["test"]
+    assert not error
+    assert(metrics is None)
+
+    
+if (__name__ == "__main__"):
+    test_hal_metrics_1()
+    test_hal_metrics_2()
+    
@@ -5,6 +5,13 @@ Test parameter file IO.
 
 from storm_control.test.hal.standardHalTest import halTest
 
+import storm_control.sc_library.parameters as params
+
+import storm_control.hal4000.halLib.halMessage as halMessage
+import storm_control.hal4000.settings.settings as settings
+
+import storm_control.test.hal.param_tests as paramTests
+
 def test_hal_params_1():
     halTest(config_xml = "none_classic_config.xml",
             class_name = "ParamTest1",
@@ -33,3 +40,44 @@ def test_hal_params_5():
     halTest(config_xml = "none_classic_config.xml",
             class_name = "ParamTest5",
             test_module = "storm_control.test.hal.param_tests")
+
+
+def test_hal_params_6():
+    halTest(config_xml = "none_classic_config.xml",
+            class_name = "ParamTest6",
+            test_module = "storm_control.test.hal.param_tests")
+
+    changes = paramTests.changes
+    assert (len(changes) == 3)
+
+    # Only the camera ROI (and the display) change.
+    for change in changes:
+        assert ("y_end" in change["camera1"])
+        for section in ["film", "focuslock", "illumination", "mosaic", "stage"]:
+            assert not (section in change)
+
+
+def test_hal_params_7():
+    """
+    Check that settings.parametersChanged() notices parameters that a
+    module changed itself after they were applied.
+    """
+    p = params.StormXMLObject()
+    p.addSubSection("film").add(params.ParameterString(name = "filename", value = "movie"))
+    current = p.get("film").copy()
+    message = halMessage.HalMessage(m_type = "new parameters",
+                                    data = {"changes" : {},
+                                            "is_edit" : False,
+                                            "parameters" : p.copy()})
+
+    assert not settings.parametersChanged(message, "film", current)
+    assert not settings.parametersChanged(message, "stage", current)
+
+    current.set("filename", "test")
+    assert settings.parametersChanged(message, "film", current)
+
+    # The difference is not known.
+    message = halMessage.HalMessage(m_type = "new parameters",
+                                    data = {"is_edit" : False,
+                                            "parameters" : p.copy()})
+    assert settings.parametersChanged(message, "stage", current)
@@ -0,0 +1,36 @@
+#!/usr/bin/env python
+"""
+Test routing of messages to the modules.
+"""
+from storm_control.test.hal.standardHalTest import halTest
+
+import storm_control.test.hal.routing_tests as routingTests
+
+
+def test_hal_routing_1():
+
+    halTest(config_xml = "none_tcp_config.xml",
+            class_name = "MessageRouting1",
+            test_module = "storm_control.test.hal.routing_tests")
+
+    # Modules that did not declare what they handle get every message.
+    names = routingTests.routing["start"]
+    for name in ["film", "hal", "testing"]:
+        assert(name in names)
+
+    # Modules that declared the messages that they handle.
+    assert("stage" in names)
+    for name in ["mosaic", "none_stage", "none_wheel1"]:
+        assert(not name in names)
+
+    # Check the fan out statistics.
+    fan_out = routingTests.routing["fan_out"]
+    for m_type in ["configure1", "configure2", "configure3"]:
+        assert(fan_out[m_type]["messages"] == 1)
+        assert((fan_out[m_type]["sent"] + fan_out[m_type]["skipped"]) == routingTests.routing["n_modules"])
+    assert(fan_out["configure2"]["skipped"] > 0)
+
+
+if (__name__ == "__main__"):
+    test_hal_routing_1()
+    
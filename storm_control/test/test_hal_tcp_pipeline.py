@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+"""
+Test sending several TCP messages without waiting for the responses.
+"""
+import sys
+
+from PyQt5 import QtCore, QtWidgets
+
+import storm_control.sc_library.tcpClient as tcpClient
+import storm_control.sc_library.tcpMessage as tcpMessage
+import storm_control.sc_library.tcpServer as tcpServer
+
+import storm_control.hal4000.tcpControl.tcpControl as tcpControl
+
+from storm_control.test.hal.standardHalTest import halTest
+
+import storm_control.test.hal.pipeline_tests as pipelineTests
+
+
+def test_tcp_framing(qapp):
+    """
+    Test that messages that arrive together are handled separately, and
+    that a message that arrives in pieces is handled once it is complete.
+    """
+    server = tcpServer.TCPServer(port = 9510, server_name = "Test")
+    client = tcpClient.TCPClient(port = 9510, server_name = "Test")
+
+    received = []
+    loop = QtCore.QEventLoop()
+    def handleMessageReceived(message):
+        received.append(message)
+        if (len(received) == 3):
+            loop.quit()
+
+    server.messageReceived.connect(handleMessageReceived)
+    try:
+        assert client.startCommunication()
+
+        messages = []
+        for i in range(3):
+            messages.append(tcpMessage.TCPMessage(message_type = "Test",
+                                                  message_data = {"index" : i}))
+
+        # Two messages in a single write, then one in two writes.
+        data = (messages[0].toJSON() + "\n" + messages[1].toJSON() + "\n").encode()
+        client.socket.write(data)
+        client.socket.flush()
+        
+        data = (messages[2].toJSON() + "\n").encode()
+        client.socket.write(data[:10])
+        client.socket.flush()
+        QtCore.QTimer.singleShot(100, lambda : client.socket.write(data[10:]))
+
+        QtCore.QTimer.singleShot(5000, loop.quit)
+        loop.exec_()
+    finally:
+        client.close()
+        server.close()
+
+    assert (len(received) == 3)
+    for i in range(3):
+        assert (received[i].getID() == messages[i].getID())
+        assert (received[i].getData("index") == i)
+
+
+def test_tcp_lost_connection(qapp):
+    """
+    Test that an action that is in progress when the client disconnects
+    finishes without a response, and that messages from the next client
+    wait for it.
+    """
+    server = tcpServer.TCPServer(port = 9512, server_name = "Test")
+    controller = tcpControl.Controller(server = server, verbose = False)
+
+    actions = []
+    responses = []
+    controller.controlAction.connect(actions.append)
+    controller.sendMessage = responses.append
+    try:
+        controller.handleMessageReceived(tcpMessage.TCPMessage(message_type = "Check Focus Lock"))
+        assert (len(actions) == 1)
+
+        # The client disconnects and a new client sends a message.
+        controller.handleLostConnection()
+        controller.handleMessageReceived(tcpMessage.TCPMessage(message_type = "Find Sum"))
+        assert (len(actions) == 1)
+
+        # The first action finishes, the second is started.
+        controller.actionDone(actions[0])
+        assert (len(responses) == 0)
+        assert (len(actions) == 2)
+
+        # The second action gets a response.
+        controller.actionDone(actions[1])
+        assert (len(responses) == 1)
+        assert responses[0].isType("Find Sum")
+    finally:
+        server.close()
+
+
+def test_hal_tcp_pipeline():
+    """
+    Test that HAL responds to all of the messages, in order.
+    """
+    halTest(config_xml = "none_tcp_config.xml",
+            class_name = "Pipeline1",
+            test_module = "storm_control.test.hal.pipeline_tests")
+
+    responses = pipelineTests.responses
+    names = ["move", "position", "move test", "parameters test", "no such message", "metrics"]
+    assert (sorted(responses.keys()) == sorted(names))
+
+    # Responses are in order and have the right type.
+    for i, name in enumerate(names):
+        assert (responses[name]["order"] == i)
+    assert (responses["move"]["type"] == "Move Stage")
+    assert (responses["metrics"]["type"] == "Get Message Metrics")
+    
+    # The stage moved before we asked for the position.
+    assert not responses["position"]["error"]
+    assert (responses["position"]["response"]["stage_x"] == 10.0)
+    assert (responses["position"]["response"]["stage_y"] == 10.0)
+
+    assert (responses["move test"]["response"]["duration"] == 1)
+    assert not responses["parameters test"]["error"]
+    assert responses["no such message"]["error"]
+    assert not responses["metrics"]["error"]
+    assert ("stage" in responses["metrics"]["response"]["metrics"])
+
+    
+if (__name__ == "__main__"):
+    app = QtWidgets.QApplication(sys.argv)
+    test_tcp_framing(app)
+    test_tcp_lost_connection(app)
+    app = None
+    test_hal_tcp_pipeline()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+"""
+Test getting frames from HAL as binary data using TCP.
+"""
+import numpy
+import sys
+
+from PyQt5 import QtCore, QtWidgets
+
+import storm_control.sc_library.tcpClient as tcpClient
+import storm_control.sc_library.tcpMessage as tcpMessage
+import storm_control.sc_library.tcpServer as tcpServer
+
+from storm_control.test.hal.standardHalTest import halTest
+
+import storm_control.test.hal.snapshot_tests as snapshotTests
+
+
+def test_tcp_binary(qapp):
+    """
+    Test sending messages with binary data, including binary data
+    that arrives in pieces.
+    """
+    server = tcpServer.TCPServer(port = 9511, server_name = "Test")
+    client = tcpClient.TCPClient(port = 9511, server_name = "Test")
+
+    received = []
+    loop = QtCore.QEventLoop()
+    def handleMessageReceived(message):
+        received.append(message)
+        if (len(received) == 3):
+            loop.quit()
+
+    server.messageReceived.connect(handleMessageReceived)
+    try:
+        assert client.startCommunication()
+
+        image = numpy.arange(512*256, dtype = numpy.uint16).reshape(512, 256)
+        messages = []
+        for i in range(3):
+            message = tcpMessage.TCPMessage(message_type = "Test",
+                                            message_data = {"index" : i})
+            if (i != 1):
+                message.setBinaryData((image + i).tobytes())
+            messages.append(message)
+
+        # Send the first two normally.
+        client.sendMessage(messages[0])
+        client.sendMessage(messages[1])
+
+        # Send the last in pieces.
+        data = (messages[2].toJSON() + "\n").encode() + messages[2].getBinaryData()
+        for i in range(4):
+            QtCore.QTimer.singleShot(20 * i, lambda j = i : client.socket.write(data[j*len(data)//4:(j+1)*len(data)//4]))
+
+        QtCore.QTimer.singleShot(5000, loop.quit)
+        loop.exec_()
+    finally:
+        client.close()
+        server.close()
+
+    assert (len(received) == 3)
+    for i in range(3):
+        assert (received[i].getID() == messages[i].getID())
+        if (i == 1):
+            assert (received[i].getBinaryData() is None)
+        else:
+            data = numpy.frombuffer(received[i].getBinaryData(), dtype = numpy.uint16).reshape(512, 256)
+            assert numpy.array_equal(data, image + i)
+
+
+def test_tcp_binary_2(qapp):
+    """
+    Test that binary data which is cut off when the client disconnects
+    is discarded, and does not swallow messages from the next client.
+    """
+    server = tcpServer.TCPServer(port = 9513, server_name = "Test")
+    client1 = tcpClient.TCPClient(port = 9513, server_name = "Test")
+    client2 = tcpClient.TCPClient(port = 9513, server_name = "Test")
+
+    received = []
+    loop = QtCore.QEventLoop()
+    def handleMessageReceived(message):
+        received.append(message)
+        loop.quit()
+
+    server.comLostConnection.connect(loop.quit)
+    server.messageReceived.connect(handleMessageReceived)
+    try:
+        assert client1.startCommunication()
+        
+        # Only send some of the binary data, then disconnect.
+        message = tcpMessage.TCPMessage(message_type = "Test")
+        message.setBinaryData(bytes(1000))
+        data = (message.toJSON() + "\n").encode() + message.getBinaryData()
+        client1.socket.write(data[:-500])
+        client1.socket.flush()
+        client1.stopCommunication()
+
+        QtCore.QTimer.singleShot(5000, loop.quit)
+        loop.exec_()
+        assert not server.isConnected()
+        
+        assert client2.startCommunication()
+        client2.sendMessage(tcpMessage.TCPMessage(message_type = "Test",
+                                                  message_data = {"index" : 2}))
+        QtCore.QTimer.singleShot(5000, loop.quit)
+        loop.exec_()
+    finally:
+        client1.close()
+        client2.close()
+        server.close()
+
+    assert (len(received) == 1)
+    assert (received[0].getData("index") == 2)
+    assert (received[0].getBinaryData() is None)
+
+    
+def test_hal_tcp_snapshot():
+    """
+    Test the 'Get Snapshot' message.
+    """
+    halTest(config_xml = "none_tcp_config.xml",
+            class_name = "GetSnapshot1",
+            test_module = "storm_control.test.hal.snapshot_tests")
+
+    responses = snapshotTests.responses
+
+    # A frame.
+    message = responses["camera1"]
+    assert not message.hasError()
+    shape = message.getResponse("shape")
+    data = numpy.frombuffer(message.getBinaryData(), dtype = numpy.dtype(message.getResponse("dtype")))
+    assert (data.size == shape[0] * shape[1])
+    assert (message.getResponse("camera") == "camera1")
+    assert (message.getResponse("stage_x") == 10.0)
+    assert (message.getResponse("stage_y") == 5.0)
+    assert (message.getResponse("objective") == "100x")
+    assert (message.getResponse("flip_horizontal") == False)
+    assert (message.getResponse("display_min") == 0)
+    assert (message.getResponse("display_max") == 300)
+
+    # Test mode.
+    message = responses["test"]
+    assert not message.hasError()
+    assert (message.getResponse("shape") == shape)
+    assert (message.getBinaryData() is None)
+
+    # No such camera.
+    assert responses["no camera"].hasError()
+
+    
+if (__name__ == "__main__"):
+    app = QtWidgets.QApplication(sys.argv)
+    test_tcp_binary(app)
+    test_tcp_binary_2(app)
+    app = None
+    test_hal_tcp_snapshot()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+"""
+Test validating a sequence of TCP messages with a single TCP message.
+"""
+from storm_control.test.hal.standardHalTest import halTest
+
+import storm_control.test.hal.validate_tests as validateTests
+
+
+def test_hal_tcp_validate_1():
+    halTest(config_xml = "none_tcp_config.xml",
+            class_name = "ValidateSequence1",
+            test_module = "storm_control.test.hal.validate_tests")
+
+    responses = validateTests.responses
+    names = ["parameters", "movie parameters", "movie", "move",
+             "no parameters", "bad length", "no such message", "position"]
+    assert (sorted(responses.keys()) == sorted(names))
+
+    # Responses are in order, and the messages in the sequence were tested.
+    for i, name in enumerate(names):
+        assert (responses[name]["order"] == i)
+        assert (responses[name]["test"] == (name != "position"))
+
+    assert not responses["parameters"]["error"]
+    for name in ["movie parameters", "movie"]:
+        assert not responses[name]["error"]
+        assert (responses[name]["response"]["disk_usage"] == 6.25)
+        assert (responses[name]["response"]["duration"] == 1.0)
+    assert (responses["move"]["response"]["duration"] == 1)
+    
+    for name in ["no parameters", "bad length", "no such message"]:
+        assert responses[name]["error"]
+
+    # The stage did not actually move.
+    assert not responses["position"]["error"]
+    assert (responses["position"]["response"]["stage_x"] == 0.0)
+
+    
+def test_hal_tcp_validate_2():
+    validateTests.responses.clear()
+    halTest(config_xml = "none_tcp_config.xml",
+            class_name = "ValidateSequence2",
+            test_module = "storm_control.test.hal.validate_tests")
+
+    responses = validateTests.responses
+    assert not responses["empty"]["error"]
+    assert (responses["empty"]["response"]["results"] == [])
+
+    
+if (__name__ == "__main__"):
+    test_hal_tcp_validate_1()
+    test_hal_tcp_validate_2()
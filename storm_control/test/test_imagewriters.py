@@ -0,0 +1,251 @@
+#!/usr/bin/env python
+"""
+Tests of the image writers.
+"""
+import h5py
+import numpy
+import os
+import pytest
+import tifffile
+
+import storm_control.sc_library.parameters as params
+
+import storm_control.hal4000.camera.cameraFunctionality as cameraFunctionality
+import storm_control.hal4000.camera.frame as frame
+import storm_control.hal4000.film.filmSettings as filmSettings
+import storm_control.hal4000.halLib.imagewriters as imagewriters
+import storm_control.test as test
+
+
+def makeCameraFunctionality(x_pixels, y_pixels):
+    p = params.StormXMLObject()
+    p.add(params.ParameterInt(name = "bytes_per_frame", value = 2 * x_pixels * y_pixels))
+    p.add(params.ParameterString(name = "extension", value = ""))
+    p.add(params.ParameterInt(name = "x_pixels", value = x_pixels))
+    p.add(params.ParameterInt(name = "y_pixels", value = y_pixels))
+    return cameraFunctionality.CameraFunctionality(camera_name = "camera1",
+                                                   parameters = p)
+
+def makeFrames(x_pixels, y_pixels, n_frames):
+    frames = []
+    for i in range(n_frames):
+        np_data = numpy.random.randint(1000, size = x_pixels * y_pixels).astype(numpy.uint16)
+        frames.append(frame.Frame(np_data, i, x_pixels, y_pixels, "camera1"))
+    return frames
+
+def writeMovie(basename, frames, queue_size, dax_block_size = 0, film_length = 0, filetype = ".dax", **kwds):
+    cam_fn = makeCameraFunctionality(frames[0].image_x, frames[0].image_y)
+    film_settings = filmSettings.FilmSettings(basename = basename,
+                                              filetype = filetype,
+                                              film_length = film_length)
+    writer = imagewriters.createFileWriter(cam_fn,
+                                           film_settings,
+                                           dax_block_size = dax_block_size,
+                                           queue_size = queue_size,
+                                           **kwds)
+    for i in range(0, len(frames), 4):
+        cam_fn.emitFrames(frames[i:i+4])
+    cam_fn.stopped.emit()
+    writer.closeWriter()
+    return writer
+
+
+def test_threaded_writer_1():
+    """
+    Check that the threaded writer saves all the frames in order.
+    """
+    [x_pixels, y_pixels] = [64, 32]
+    frames = makeFrames(x_pixels, y_pixels, 20)
+    basename = os.path.join(test.dataDirectory(), "test_tw_1")
+    writer = writeMovie(basename, frames, 50)
+
+    movie = numpy.fromfile(basename + ".dax", dtype = numpy.uint16)
+    movie = movie.reshape((len(frames), x_pixels * y_pixels))
+    for i, aframe in enumerate(frames):
+        assert numpy.array_equal(movie[i], aframe.getData())
+
+    stats = writer.getStats()
+    assert (stats["dropped"] == 0)
+    assert (stats["queued"] == 0)
+    assert (stats["written"] == len(frames))
+
+
+def test_threaded_writer_2():
+    """
+    Check that the threaded writer and the normal writer give the same result.
+    """
+    [x_pixels, y_pixels] = [32, 64]
+    frames = makeFrames(x_pixels, y_pixels, 10)
+    basename1 = os.path.join(test.dataDirectory(), "test_tw_2a")
+    basename2 = os.path.join(test.dataDirectory(), "test_tw_2b")
+    writeMovie(basename1, frames, 0)
+    writeMovie(basename2, frames, 10)
+
+    movie1 = numpy.fromfile(basename1 + ".dax", dtype = numpy.uint16)
+    movie2 = numpy.fromfile(basename2 + ".dax", dtype = numpy.uint16)
+    assert numpy.array_equal(movie1, movie2)
+
+    with open(basename2 + ".inf") as fp:
+        assert ("number of frames = 10\n" in fp.readlines())
+
+
+class FailingDaxFile(imagewriters.DaxFile):
+    """
+    A writer whose writeFrame() always fails.
+    """
+    def writeFrame(self, np_data):
+        raise IOError("Disk full")
+
+
+def test_threaded_writer_3():
+    """
+    Check that the file is closed if the writer thread fails.
+    """
+    [x_pixels, y_pixels] = [32, 32]
+    frames = makeFrames(x_pixels, y_pixels, 5)
+    cam_fn = makeCameraFunctionality(x_pixels, y_pixels)
+    film_settings = filmSettings.FilmSettings(basename = os.path.join(test.dataDirectory(), "test_tw_3"),
+                                              filetype = ".dax")
+    writer = FailingDaxFile(camera_functionality = cam_fn,
+                            film_settings = film_settings,
+                            queue_size = 10)
+    cam_fn.emitFrames(frames)
+    cam_fn.stopped.emit()
+    with pytest.raises(imagewriters.ImageWriterException):
+        writer.closeWriter()
+    assert writer.fp.closed
+
+    
+def test_block_dax_1():
+    """
+    Check that the block writer gives the same result as the normal writer.
+    """
+    [x_pixels, y_pixels] = [64, 64]
+    frames = makeFrames(x_pixels, y_pixels, 11)
+    basename1 = os.path.join(test.dataDirectory(), "test_bd_1a")
+    basename2 = os.path.join(test.dataDirectory(), "test_bd_1b")
+    writeMovie(basename1, frames, 0)
+
+    # 0.02MB is a block of 3 frames, so the last block is not full.
+    writeMovie(basename2, frames, 0, dax_block_size = 0.02)
+    
+    movie1 = numpy.fromfile(basename1 + ".dax", dtype = numpy.uint16)
+    movie2 = numpy.fromfile(basename2 + ".dax", dtype = numpy.uint16)
+    assert numpy.array_equal(movie1, movie2)
+
+
+def test_block_dax_2():
+    """
+    Check that a pre-allocated film is truncated if it stops early.
+    """
+    [x_pixels, y_pixels] = [32, 32]
+    frames = makeFrames(x_pixels, y_pixels, 5)
+    basename = os.path.join(test.dataDirectory(), "test_bd_2")
+    writeMovie(basename, frames, 0, dax_block_size = 0.01, film_length = 20)
+
+    assert (os.path.getsize(basename + ".dax") == 2 * x_pixels * y_pixels * len(frames))
+    movie = numpy.fromfile(basename + ".dax", dtype = numpy.uint16)
+    movie = movie.reshape((len(frames), x_pixels * y_pixels))
+    for i, aframe in enumerate(frames):
+        assert numpy.array_equal(movie[i], aframe.getData())
+
+    with open(basename + ".inf") as fp:
+        assert ("number of frames = 5\n" in fp.readlines())
+
+
+class MetadataTest(object):
+    """
+    Stand-in for film.frameMetadata.FrameMetadata.
+    """
+    def getMetadata(self, frame_number):
+        return {"illumination_color" : [[-1, -1, -1], [255, 0, 0]][frame_number % 2],
+                "lock_offset" : 0.1 * frame_number,
+                "stage_x" : float(frame_number),
+                "stage_y" : 2.0,
+                "stage_z" : 50.0}
+
+    
+def test_hdf5_1():
+    """
+    Check that the HDF5 writer saves all the frames and the metadata.
+    """
+    [x_pixels, y_pixels] = [64, 32]
+    frames = makeFrames(x_pixels, y_pixels, 11)
+    basename = os.path.join(test.dataDirectory(), "test_hdf5_1")
+    writeMovie(basename, frames, 0,
+               filetype = ".hdf5",
+               frame_metadata = MetadataTest(),
+               hdf5_chunk_frames = 4)
+
+    with h5py.File(basename + ".hdf5", "r") as h5:
+        movie = h5["movie"]
+        assert (movie.shape == (len(frames), y_pixels, x_pixels))
+        assert (movie.chunks == (4, y_pixels, x_pixels))
+        for i, aframe in enumerate(frames):
+            assert numpy.array_equal(movie[i].ravel(), aframe.getData())
+
+        fm = h5["frame_metadata"]
+        assert numpy.allclose(fm["stage_x"][()], numpy.arange(len(frames)))
+        assert numpy.allclose(fm["lock_offset"][()], 0.1 * numpy.arange(len(frames)))
+        assert (fm["illumination_color"].shape == (len(frames), 3))
+        assert numpy.array_equal(fm["illumination_color"][1], [255, 0, 0])
+
+
+def test_hdf5_2():
+    """
+    Check that the HDF5 writer works with a writer thread and compresses.
+    """
+    [x_pixels, y_pixels] = [64, 64]
+    frames = []
+    for i in range(10):
+        np_data = numpy.zeros(x_pixels * y_pixels, dtype = numpy.uint16) + 100
+        np_data[i*10:i*10+5] = 1000
+        frames.append(frame.Frame(np_data, i, x_pixels, y_pixels, "camera1"))
+        
+    basename = os.path.join(test.dataDirectory(), "test_hdf5_2")
+    writeMovie(basename, frames, 10,
+               filetype = ".hdf5",
+               hdf5_compression = "lzf")
+
+    with h5py.File(basename + ".hdf5", "r") as h5:
+        movie = h5["movie"]
+        for i, aframe in enumerate(frames):
+            assert numpy.array_equal(movie[i].ravel(), aframe.getData())
+        assert (movie.id.get_storage_size() < movie.nbytes)
+        assert not ("frame_metadata" in h5)
+
+
+
+def test_tif_1():
+    """
+    Check that compressed and uncompressed tifs contain the same frames.
+    """
+    [x_pixels, y_pixels] = [64, 32]
+    frames = makeFrames(x_pixels, y_pixels, 12)
+    for i, [filetype, queue_size, compression] in enumerate([[".tif", 0, "none"],
+                                                             [".tif", 0, "zlib"],
+                                                             [".big.tif", 0, "zlib"],
+                                                             [".tif", 20, "zlib"]]):
+        basename = os.path.join(test.dataDirectory(), "test_tif_1_" + str(i))
+        writeMovie(basename, frames, queue_size,
+                   filetype = filetype,
+                   tiff_compression = compression,
+                   tiff_compression_workers = 3)
+
+        with tifffile.TiffFile(basename + filetype) as tf:
+            assert (len(tf.pages) == len(frames))
+            for page, aframe in zip(tf.pages, frames):
+                assert numpy.array_equal(page.asarray().ravel(), aframe.getData())
+                if (compression == "zlib"):
+                    assert (page.compression == tifffile.COMPRESSION.ADOBE_DEFLATE)
+
+        
+if (__name__ == "__main__"):
+    test_threaded_writer_1()
+    test_threaded_writer_2()
+    test_threaded_writer_3()
+    test_block_dax_1()
+    test_block_dax_2()
+    test_hdf5_1()
+    test_hdf5_2()
+    test_tif_1()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+"""
+Tests of parsing HAL log files for message timing.
+"""
+import numpy
+import os
+
+import storm_control.sc_library.log_timing as logTiming
+
+import storm_control.test as test
+
+
+def logLine(time, text):
+    return time + ":hal4000:INFO:message:\n" + time + ":hal4000:INFO:  " + text + "\n"
+
+def writeLogs(basename):
+    """
+    Two log files with three messages, one of which is split
+    across the files and one of which is never processed.
+    """
+    for ext in [".out.1", ".out", ".timing.npz"]:
+        if os.path.exists(basename + ext):
+            os.remove(basename + ext)
+
+    with open(basename + ".out.1", "w") as fp:
+        fp.write(logLine("2018-04-30 23:59:59,000", "queued,1,film,start film"))
+        fp.write(logLine("2018-04-30 23:59:59,500", "sent,1,film,start film"))
+        fp.write(logLine("2018-04-30 23:59:59,600", "handled by,1,camera1,start film"))
+        fp.write(logLine("2018-04-30 23:59:59,700", "worker done,1,film,start film"))
+        fp.write(logLine("2018-04-30 23:59:59,750", "worker done,1,film,start film"))
+        fp.write(logLine("2018-04-30 23:59:59,900", "processed,1,film,start film"))
+        fp.write(logLine("2018-04-30 23:59:59,950", "queued,2,hal,noop"))
+
+    with open(basename + ".out", "w") as fp:
+        fp.write("not a log line\n")
+        fp.write(logLine("2018-05-01 00:00:00,050", "sent,2,hal,noop"))
+        fp.write(logLine("2018-05-01 00:00:00,100", "handled by,2,camera1,noop"))
+        fp.write(logLine("2018-05-01 00:00:00,150", "handled by,2,film,noop"))
+        fp.write(logLine("2018-05-01 00:00:01,050", "processed,2,hal,noop"))
+        fp.write(logLine("2018-05-01 00:00:02,000", "queued,3,film,stop film"))
+        fp.write(logLine("2018-05-01 00:00:02,000", "worker started 60000,3,film,stop film"))
+
+
+def test_log_timing_1():
+    """
+    Test parsing, including reading in small chunks.
+    """
+    basename = os.path.join(test.dataDirectory(), "log_timing_1")
+    writeLogs(basename)
+
+    for chunk_size in [100, 16 * 1024 * 1024]:
+        logTiming.chunk_size = chunk_size
+        messages = logTiming.logTiming(basename, ignore_incomplete = False)
+
+        assert(messages["m_id"].tolist() == [1, 2, 3])
+        assert(messages["m_type"].tolist() == ["start film", "noop", "stop film"])
+        assert(messages["source"].tolist() == ["film", "hal", "film"])
+        assert(messages["n_workers"].tolist() == [2, 0, 0])
+        assert numpy.allclose(messages["created_time"], [0.0, 0.95, 3.0])
+        assert numpy.allclose(messages["queued_time"][:2], [0.5, 0.1])
+        assert numpy.allclose(messages["processing_time"][:2], [0.4, 1.0])
+        assert numpy.isnan(messages["processing_time"][2])
+        assert(messages.getHandledBy() == {"camera1" : 2, "film" : 1})
+
+        messages = logTiming.logTiming(basename)
+        assert(len(messages) == 2)
+        assert(abs(logTiming.processingTime(messages) - 1.4) < 1.0e-6)
+        assert(abs(logTiming.queuedTime(messages) - 0.6) < 1.0e-6)
+
+
+def test_log_timing_2():
+    """
+    Test grouping.
+    """
+    basename = os.path.join(test.dataDirectory(), "log_timing_2")
+    writeLogs(basename)
+
+    messages = logTiming.logTiming(basename, ignore_incomplete = False)
+    groups = logTiming.groupBySource(messages)
+    assert(sorted(groups) == ["film", "hal"])
+    assert(groups["film"]["m_id"].tolist() == [1, 3])
+    assert(groups["hal"].getHandledBy() == {"camera1" : 1, "film" : 1})
+
+    groups = logTiming.groupByMsgType(groups["film"])
+    assert(sorted(groups) == ["start film", "stop film"])
+    assert(abs(logTiming.processingTime(groups) - 0.4) < 1.0e-6)
+
+
+def test_log_timing_3():
+    """
+    Test the cache.
+    """
+    basename = os.path.join(test.dataDirectory(), "log_timing_3")
+    writeLogs(basename)
+
+    m1 = logTiming.logTiming(basename, use_cache = True)
+    assert os.path.exists(basename + ".timing.npz")
+
+    # Check that the cache is used.
+    parse_logs = logTiming.parseLogs
+    try:
+        logTiming.parseLogs = None
+        m2 = logTiming.logTiming(basename, use_cache = True)
+    finally:
+        logTiming.parseLogs = parse_logs
+
+    for column in logTiming.Messages.columns:
+        assert numpy.array_equal(m1[column], m2[column])
+    assert(m1.getHandledBy() == m2.getHandledBy())
+
+    # Check that the cache is not used if the log files change.
+    with open(basename + ".out", "a") as fp:
+        fp.write(logLine("2018-05-01 00:00:03,000", "sent,3,film,stop film"))
+        fp.write(logLine("2018-05-01 00:00:03,500", "processed,3,film,stop film"))
+
+    m3 = logTiming.logTiming(basename, use_cache = True)
+    assert(len(m3) == 3)
+    
+    
+if (__name__ == "__main__"):
+    test_log_timing_1()
+    test_log_timing_2()
+    test_log_timing_3()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+"""
+Tests of the emulated camera.
+"""
+import numpy
+
+import storm_control.test as test
+
+import storm_control.hal4000.camera.noneCameraControl as noneCameraControl
+
+
+def test_none_camera_1():
+    """
+    Check that the test pattern is what we expect.
+    """
+    camera = test.makeNoneCamera()
+
+    [size_x, size_y] = camera.fake_frame_size
+    expected = numpy.zeros(size_x * size_y, dtype = numpy.uint16)
+    for i in range(size_x):
+        expected[i::size_x] = i % 128 + numpy.arange(size_y) % 128
+    assert numpy.array_equal(camera.fake_frame, expected)
+    assert (camera.frame_bank is None)
+
+
+def test_none_camera_2():
+    """
+    Check the test pattern frame bank.
+    """
+    camera = test.makeNoneCamera(frame_bank_size = 4, min_exposure_time = 0.001)
+    assert (len(camera.frame_bank) == 4)
+
+    # Check that we can use short exposure times.
+    new_parameters = camera.parameters.copy()
+    new_parameters.setv("exposure_time", 0.002)
+    camera.newParameters(new_parameters)
+    assert (camera.parameters.get("fps") == 500.0)
+
+    frames = []
+    for i in range(5):
+        frames.append(camera.makeFrame())
+
+    assert numpy.array_equal(frames[1].getData(), numpy.roll(camera.fake_frame, 1))
+
+    # Frames come from the bank without copying.
+    assert (frames[4].getData() is frames[0].getData())
+    assert not frames[0].getData().flags.writeable
+
+
+def test_none_camera_3():
+    """
+    Check the blinking emitters frame bank.
+    """
+    frames = noneCameraControl.blinkingFrames(20, 64, 32,
+                                              background = 10.0,
+                                              n_emitters = 20,
+                                              on_probability = 0.5,
+                                              off_probability = 0.5)
+    assert (len(frames) == 20)
+    assert (frames[0].dtype == numpy.uint16)
+    assert (frames[0].size == 64 * 32)
+
+    # Background is close to the expected value and there are some emitters.
+    stack = numpy.array(frames)
+    assert (abs(numpy.median(stack) - 10.0) < 2.0)
+    assert (numpy.max(stack) > 50)
+
+    # The emitters change from frame to frame.
+    assert not numpy.array_equal(frames[0], frames[1])
@@ -2,6 +2,8 @@
 """
 Tests of the parameters object functionality.
 """
+import os
+import time
 
 import storm_control.test as test
 
@@ -155,6 +157,235 @@ def test_parameters_8():
 
     assert(s1.getSortedAttrs() == ['dd', 'bb', 'aa', 'cc'])
 
+def test_parameters_9():
+    """
+    Test that copies are copy-on-write.
+    """
+    p1 = params.parameters(test.xmlFilePathAndName("test_parameters.xml"), recurse = True)
+    p2 = p1.copy()
+
+    # Nothing is copied until one of them changes.
+    assert (p1.parameters is p2.parameters)
+
+    # Changes in either one are not visible in the other.
+    p2.set("camera1.flip_horizontal", True)
+    p1.set("camera1.exposure_time", 0.1)
+    p1.add("new_param", "foo")
+    assert (p1.get("camera1.flip_horizontal") == False)
+    assert (p2.get("camera1.exposure_time") == 0.01)
+    assert not p2.has("new_param")
+
+    # Copies of copies.
+    p3 = p2.copy()
+    p3.getp("camera1.flip_horizontal").setv(False)
+    p3.delete("camera1.exposure_time")
+    assert (p2.get("camera1.flip_horizontal") == True)
+    assert p2.has("camera1.exposure_time")
+    assert p1.has("camera1.exposure_time")
+
+    # Sub-sections from get() can be changed without changing the copy.
+    p4 = p1.copy()
+    p4.get("camera1").set("exposure_time", 1.0)
+    assert (p1.get("camera1.exposure_time") == 0.1)
+
+    # Sections that were not changed are still shared.
+    assert (p1.get("camera1").parameters is not p2.get("camera1").parameters)
+    assert (p1.get("display00").parameters is p2.get("display00").parameters)
+
+
+def test_parameters_10():
+    """
+    Test that difference() does not un-share copies.
+    """
+    p1 = params.parameters(test.xmlFilePathAndName("test_parameters.xml"), recurse = True)
+    p2 = p1.copy()
+    assert (len(params.difference(p1, p2)) == 0)
+    assert (p1.parameters is p2.parameters)
+
+    p2.set("camera1.flip_horizontal", True)
+    assert (params.difference(p1, p2) == ["camera1.flip_horizontal"])
+    assert (p1.parameters["display00"] is p2.parameters["display00"])
+
+
+def test_parameters_11():
+    """
+    Test that copyParameters() only changes the parameters that are different.
+    """
+    p1 = params.parameters(test.xmlFilePathAndName("test_parameters.xml"), recurse = True)
+    p2 = p1.copy()
+    p2.set("camera1.flip_horizontal", True)
+    
+    [p3, ur] = params.copyParameters(p1, p2)
+    assert (len(ur) == 0)
+    assert (params.difference(p3, p2) == [])
+    assert (params.difference(p1, p3) == ["camera1.flip_horizontal"])
+    assert (p1.get("camera1.flip_horizontal") == False)
+
+
+def test_parameters_12():
+    """
+    Test differenceBySection().
+    """
+    p1 = params.parameters(test.xmlFilePathAndName("test_parameters.xml"), recurse = True)
+    p2 = p1.copy()
+    assert (params.differenceBySection(p1, p2) == {})
+    
+    p2.set("test_param", "bar")
+    p2.set("display00.camera1.display_max", 200)
+    p2.addSubSection("camera2").add("foo", "bar")
+
+    assert (params.differenceBySection(p1, p2) == {"" : ["test_param"],
+                                                   "display00" : ["camera1.display_max"]})
+    assert (params.differenceBySection(p2, p1) == {"" : ["test_param"],
+                                                   "camera2" : ["foo"],
+                                                   "display00" : ["camera1.display_max"]})
+
+
+def test_parameters_13():
+    """
+    Test the parsed XML file cache.
+    """
+    p_file = os.path.join(test.dataDirectory(), "test_parameters_13.xml")
+    p1 = params.parameters(test.xmlFilePathAndName("test_parameters.xml"),
+                           recurse = True,
+                           add_filename_param = False)
+    p1.saveToFile(p_file)
+
+    # Changing what we got from the cache should not change the cache.
+    p2 = params.parameters(p_file, recurse = True)
+    p2.set("camera1.exposure_time", 0.5)
+    p2.get("camera1").add("new_param", 1)
+    p3 = params.parameters(p_file, recurse = True)
+    assert (p3.get("camera1.exposure_time") == 0.01)
+    assert not p3.has("camera1.new_param")
+
+    # Changing the file should invalidate the cache.
+    p2.saveToFile(p_file)
+    p4 = params.parameters(p_file, recurse = True)
+    assert (p4.get("camera1.exposure_time") == 0.5)
+
+    # But only changing the modification time should not.
+    os.utime(p_file, ns = (0, 0))
+    p5 = params.parameters(p_file, recurse = True)
+    assert (p5.get("camera1.exposure_time") == 0.5)
+
+    os.remove(p_file)
+
+
+def test_parameters_17():
+    """
+    Test that the cache notices a file that was re-written without
+    changing its size or modification time.
+    """
+    p_file = os.path.join(test.dataDirectory(), "test_parameters_17.xml")
+    p1 = params.StormXMLObject()
+    p1.add(params.ParameterString(name = "value", value = "aaaa"))
+    p1.saveToFile(p_file)
+    stat = os.stat(p_file)
+
+    p2 = params.parameters(p_file)
+    assert (p2.get("value") == "aaaa")
+
+    p1.set("value", "bbbb")
+    p1.saveToFile(p_file)
+    os.utime(p_file, ns = (stat.st_atime_ns, stat.st_mtime_ns))
+    assert (os.stat(p_file).st_size == stat.st_size)
+
+    p3 = params.parameters(p_file)
+    assert (p3.get("value") == "bbbb")
+
+    os.remove(p_file)
+
+
+def test_parameters_14():
+    """
+    Micro-benchmark of loading a configuration file with and without
+    the cache.
+    """
+    c_file = test.halXmlFilePathAndName("none_classic_config.xml")
+    
+    def load(clear):
+        for i in range(20):
+            if clear:
+                params.clearCache()
+            params.config(c_file)
+
+    def timeIt(fn, *args, reps = 5):
+        best = None
+        for i in range(reps):
+            start_time = time.perf_counter()
+            fn(*args)
+            elapsed = time.perf_counter() - start_time
+            if (best is None) or (elapsed < best):
+                best = elapsed
+        return best
+
+    t_parse = timeIt(load, True)
+    t_cache = timeIt(load, False)
+    print("parse: {0:.3f}ms, cache: {1:.3f}ms".format(1000.0 * t_parse/20, 1000.0 * t_cache/20))
+    assert (t_cache < t_parse)
+
+
+def test_parameters_15():
+    """
+    Test that copies are not changed through objects that were
+    handed out before the copy.
+    """
+    s1 = params.StormXMLObject()
+    s1.add("x", 1)
+    p1 = params.StormXMLObject()
+    p1.addSubSection("camera1", svalue = s1)
+    p1.add("y", 2)
+    yp = p1.getp("y")
+    xp = p1.getp("camera1.x")
+
+    p2 = p1.copy()
+    s1.set("x", 5)
+    yp.setv(3)
+    assert (p1.get("camera1.x") == 5)
+    assert (p1.get("y") == 3)
+    assert (p2.get("camera1.x") == 1)
+    assert (p2.get("y") == 2)
+
+    # The handed out objects are still part of the original.
+    xp.setv(6)
+    p3 = p1.copy()
+    assert (p1.get("camera1.x") == 6)
+    assert (p3.get("camera1.x") == 6)
+    xp.setv(7)
+    assert (p3.get("camera1.x") == 6)
+    assert (params.difference(p1, p3) == ["camera1.x"])
+
+
+def test_parameters_16():
+    """
+    Test that changing a value from get() in place does not change
+    the copies.
+    """
+    p1 = params.StormXMLObject()
+    p1.add(params.ParameterCustom(name = "default_power", value = [1.0, 1.0]))
+    p1.addSubSection("camera1").add("roi", [0, 10])
+
+    p2 = p1.copy()
+    p1.get("default_power")[0] = 0.5
+    p1.get("camera1.roi")[1] = 20
+    assert (p1.get("default_power") == [0.5, 1.0])
+    assert (p1.get("camera1.roi") == [0, 20])
+    assert (p2.get("default_power") == [1.0, 1.0])
+    assert (p2.get("camera1.roi") == [0, 10])
+
+    # And the other way.
+    p3 = p2.copy()
+    p3.get("default_power")[1] = 0.2
+    assert (p2.get("default_power") == [1.0, 1.0])
+    assert (p3.get("default_power") == [1.0, 0.2])
+
+    # Values that can't be changed in place are still shared.
+    p4 = params.parameters(test.xmlFilePathAndName("test_parameters.xml"), recurse = True)
+    p5 = p4.copy()
+    assert (p4.get("camera1.flip_horizontal") == False)
+    assert (p4.parameters is p5.parameters)
+
         
 if (__name__ == "__main__"):
     test_parameters_1()
@@ -165,3 +396,12 @@ if (__name__ == "__main__"):
     test_parameters_6()
     test_parameters_7()
     test_parameters_8()
+    test_parameters_9()
+    test_parameters_10()
+    test_parameters_11()
+    test_parameters_12()
+    test_parameters_13()
+    test_parameters_14()
+    test_parameters_15()
+    test_parameters_16()
+    test_parameters_17()